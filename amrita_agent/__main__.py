@@ -1,4 +1,15 @@
+import sys
+
+
 def entry():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from .batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from .server import main as serve_main
+
+        sys.exit(serve_main(sys.argv[2:]))
     from . import main  # noqa
 
 
@@ -1,13 +1,23 @@
+import asyncio
+from pathlib import Path
+
 from amrita_core import logger
+from amrita_core.types import ImageContent
 import flet as ft
 
-from .components.chat_area import ChatArea
-from .components.history_area import HistoryArea
-from .components.settings_area import SettingsArea
+from .components.chat_area import ChatArea, MessageBubble
+from .components.chat_views import ChatViewCache, ChatViewState
 from .components.sidebar import Sidebar
-from .config import AgentConfig
 from .constants import ColorsEnum
+from .utils.agent import AgentTurn, prewarm_preset, resolve_preset, resolve_session
 from .utils.alert import AlertDialog
+from .utils.chat import DataManager, Memory
+from .utils.images import ImagePipeline, image_content
+from .utils.prefetch import SessionPrefetcher
+from .utils.scheduler import TurnScheduler
+from .utils.tracing import span, traced
+
+WARM_UP_DELAY = 0.5  # 首帧绘制后等待多久开始预热次要视图（秒）
 
 
 class AppView(ft.Container):
@@ -20,6 +30,8 @@ class AppView(ft.Container):
 
         self.sidebar = Sidebar(
             on_nav_select=self._on_nav_select,
+            on_session_select=self._on_session_select,
+            on_session_hover=self._on_session_hover,
         )
         self.delete_alert = AlertDialog(
             title="删除对话",
@@ -33,8 +45,11 @@ class AppView(ft.Container):
             input_field=True,
         )
         self.chat_area = ChatArea(self.edit_alert)
-        self.history_area = HistoryArea()
-        self.settings_area = SettingsArea()
+        self.current_session: Memory | None = None
+        # 最近打开的会话视图，切换时直接换入而不重新构建
+        self.chat_views = ChatViewCache()
+        # 次要视图在首次导航或空闲预热时才构建
+        self._views: dict[str, ft.Control] = {"chat": self.chat_area}
 
         self.main_content = ft.AnimatedSwitcher(
             content=self.chat_area,
@@ -65,34 +80,119 @@ class AppView(ft.Container):
             expand=True,
         )
 
-        self.history_area.delete_alert = self.delete_alert
-        self.history_area.edit_alert = self.edit_alert
+    def _build_history(self) -> ft.Control:
+        from .components.history_area import HistoryArea
+
+        history_area = HistoryArea()
+        history_area.delete_alert = self.delete_alert
+        history_area.edit_alert = self.edit_alert
+        return history_area
+
+    def _build_settings(self) -> ft.Control:
+        from .components.settings_area import SettingsArea
+
+        return SettingsArea()
+
+    def _build_performance(self) -> ft.Control:
+        from .components.performance_area import PerformanceArea
+
+        return PerformanceArea()
+
+    def get_view(self, nav_key: str) -> ft.Control:
+        """获取视图，未构建时立即构建"""
+        if nav_key not in self._views:
+            builder = {
+                "history": self._build_history,
+                "settings": self._build_settings,
+                "performance": self._build_performance,
+            }[nav_key]
+            self._views[nav_key] = builder()
+        return self._views[nav_key]
+
+    @property
+    def history_area(self) -> ft.Control:
+        return self.get_view("history")
+
+    @property
+    def settings_area(self) -> ft.Control:
+        return self.get_view("settings")
+
+    async def warm_up(self):
+        """在首帧绘制后的空闲时间里预热当前预设的连接，并逐个构建尚未构建的视图"""
+        assert self.page is not None
+        self.page.run_task(prewarm_preset, self.chat_area.get_selected_preset())
+        await asyncio.sleep(WARM_UP_DELAY)
+        for nav_key in ("history", "settings"):
+            if nav_key not in self._views:
+                self.get_view(nav_key)
+            await asyncio.sleep(0)
+        await SessionPrefetcher().prefetch_recent()
 
+    @traced("ui.navigate")
     def _on_nav_select(self, nav_key):
-        if nav_key == "chat":
-            self._show_chat()
-        elif nav_key == "history":
-            self._show_history()
-        elif nav_key == "settings":
-            self._show_settings()
+        if nav_key == "chat" and self.chat_area.view.session_id is not None:
+            # 新建对话：换入空白视图，原会话的草稿保留在其缓存的视图中
+            self.current_session = None
+            self.chat_area.switch_view(ChatViewState(None, "新的对话"))
+        if nav_key in ("chat", "history", "settings", "performance"):
+            # 新对话尚无会话，其他页面不显示会话，此时都没有前台会话
+            self._set_foreground(None)
+            self._transition_content(self.get_view(nav_key))
 
-    def _show_chat(self):
-        self._transition_content(self.chat_area)
+    def _set_foreground(self, session_id: str | None):
+        """设置调度器的前台会话，调度器只在页面的事件循环上操作"""
+        assert self.page is not None
+        self.page.run_task(self._apply_foreground, session_id)
 
-    def _show_history(self):
-        self._transition_content(self.history_area)
+    async def _apply_foreground(self, session_id: str | None):
+        TurnScheduler().set_foreground(session_id)
 
-    def _show_settings(self):
-        self._transition_content(self.settings_area)
+    def _on_session_hover(self, session_id: str, entered: bool):
+        """悬停时在后台预取会话，移开时取消未完成的预取"""
+        assert self.page is not None
+        self.page.run_task(
+            self._prefetch_session if entered else self._cancel_prefetch, session_id
+        )
+
+    async def _prefetch_session(self, session_id: str):
+        SessionPrefetcher().prefetch(session_id)
+
+    async def _cancel_prefetch(self, session_id: str):
+        SessionPrefetcher().cancel(session_id)
+
+    @traced("ui.open_session")
+    def _on_session_select(self, session_id: str):
+        try:
+            memory = DataManager().get_memory_by_session_id(session_id)
+        except KeyError:
+            return
+        view = self.chat_views.get(session_id)
+        if view is None:
+            # 未缓存或已被淘汰时由预渲染结果重新构建
+            prefetcher = SessionPrefetcher()
+            messages = prefetcher.get(memory)
+            if messages is None:
+                messages = prefetcher.render(memory)
+            view = self.chat_area.build_view(session_id, memory.name, messages)
+        else:
+            view.title = memory.name
+        self.chat_views.put(view)
+        self.current_session = memory
+        self.chat_area.switch_view(view)
+        self._set_foreground(session_id)
+        if self.main_content.content is not self.chat_area:
+            self._transition_content(self.chat_area)
 
     def _transition_content(self, new_content):
         """带动画的内容切换"""
-        self.main_content.opacity = 0
-        self.main_content.update()
-        self.main_content.content = new_content
-        self.main_content.opacity = 1
-        self.main_content.update()
+        with span("ui.update"):
+            self.main_content.opacity = 0
+            self.main_content.update()
+            self.main_content.content = new_content
+            self.main_content.opacity = 1
+            self.main_content.update()
 
+    @traced("ui.send_message")
     def _on_send_message(self, e):
         message = self.chat_area.get_input_value()
         if not message or not message.strip():
@@ -103,12 +203,88 @@ class AppView(ft.Container):
             logger.info("No preset selected")
             return
 
-        self.chat_area.add_message(message, is_user=True)
+        images = self.chat_area.take_images()
+        bubble = self.chat_area.add_message(message, is_user=True)
         self.chat_area.clear_input()
 
-        self._send_to_backend(message, preset)
+        self._send_to_backend(message, preset, images, bubble, self.chat_area.view)
+
+    def _on_preset_change(self, e):
+        assert self.page is not None
+        self.page.run_task(prewarm_preset, self.chat_area.get_selected_preset())
 
     def build(self):
         self.chat_area.send_button.on_click = self._on_send_message
-    def _send_to_backend(self, message: str, model: str):
-        pass
+        self.chat_area.model_selector.on_change = self._on_preset_change
+
+    def _send_to_backend(
+        self,
+        message: str,
+        model: str,
+        images: list[Path] | None = None,
+        bubble: MessageBubble | None = None,
+        view: ChatViewState | None = None,
+    ):
+        assert self.page is not None
+        # run_task 在调用方的上下文中创建任务，本轮对话会挂在 ui.send_message 之下
+        self.page.run_task(self._run_turn, message, model, images or [], bubble, view)
+
+    async def _attach_images(
+        self,
+        paths: list[Path],
+        bubble: MessageBubble | None,
+        view: ChatViewState,
+    ) -> list[ImageContent]:
+        """保存图片并在用户消息下显示缩略图，缩略图失败不影响本轮对话"""
+        pipeline = ImagePipeline()
+        digests = await asyncio.gather(*(pipeline.store(p) for p in paths))
+        if bubble is not None:
+            try:
+                thumbnails = await asyncio.gather(
+                    *(pipeline.thumbnail(d) for d in digests)
+                )
+                bubble.add_images(thumbnails)
+                # 已切换到其他会话时气泡不在页面上，切回时随视图一并显示
+                if view is self.chat_area.view and bubble.page is not None:
+                    bubble.update()
+            except Exception as e:
+                logger.opt(exception=e).warning("显示图片缩略图失败")
+        return [image_content(d) for d in digests]
+
+    async def _run_turn(
+        self,
+        message: str,
+        model: str,
+        images: list[Path] | None = None,
+        bubble: MessageBubble | None = None,
+        view: ChatViewState | None = None,
+    ):
+        """在调度器中执行一轮对话，正在显示的会话作为前台会话优先调度
+
+        回复添加到发送时的视图中，期间切换到其他会话也不会错位。
+        """
+        view = view or self.chat_area.view
+        try:
+            contents = await self._attach_images(images, bubble, view) if images else []
+            memory = self._session_for(view)
+            preset = resolve_preset(model)
+            scheduler = TurnScheduler()
+            if view is self.chat_area.view:
+                scheduler.set_foreground(memory.session_id)
+            async with scheduler.slot(memory.session_id, preset):
+                response = await AgentTurn(memory, message, preset, contents).run()
+        except Exception as e:
+            logger.opt(exception=e).error("对话失败")
+            response = f"对话失败：{e}"
+        self.chat_area.add_message(response, is_user=False, view=view)
+
+    def _session_for(self, view: ChatViewState) -> Memory:
+        """视图对应的会话，新对话在此时创建并加入视图缓存"""
+        if view.session_id is not None:
+            return DataManager().get_memory_by_session_id(view.session_id)
+        memory = resolve_session()
+        view.session_id, view.title = memory.session_id, memory.name
+        if view is self.chat_area.view:
+            self.current_session = memory
+        self.chat_views.put(view)
+        return memory
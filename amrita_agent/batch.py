@@ -0,0 +1,162 @@
+"""无界面批处理模式
+
+    amrita-agent batch [-i prompts.jsonl] [-o results.jsonl] [-c 4] [-p 预设]
+
+每行输入为一个 JSON 对象 `{"prompt": ..., "session": ..., "preset": ..., "id": ...}`，
+也可以是一行纯文本提示词。结果按完成顺序逐行写出为 JSONL。
+未指定 session 时每条提示词新建一个会话；同一会话内的提示词按输入顺序串行执行。
+会话通过 DataManager 正常保存。本模块不导入 flet。
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from contextlib import ExitStack
+from typing import Any, TextIO
+
+import amrita_core
+from amrita_core.logging import default_filter, default_format, logger_id
+
+from .utils.agent import (
+    AgentTurn,
+    bootstrap,
+    prewarm_preset,
+    resolve_preset,
+    resolve_session,
+)
+from .utils.connection_pool import ConnectionPool
+from .utils.mcp_pool import MCPServerPool
+from .utils.scheduler import Priority, TurnScheduler
+
+BATCH_CONCURRENCY = 4
+
+
+def parse_line(line: str) -> dict[str, Any] | None:
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        record = json.loads(line)
+        if not isinstance(record.get("prompt"), str):
+            raise ValueError("缺少字符串字段 `prompt`")
+        return record
+    return {"prompt": line}
+
+
+class BatchRunner:
+    def __init__(self, output: TextIO, concurrency: int, preset: str | None = None):
+        self.output = output
+        self.preset = preset
+        self.concurrency = concurrency
+        self.succeeded = 0
+        self.failed = 0
+        TurnScheduler().set_max_concurrency(concurrency)
+
+    def _write(self, result: dict[str, Any]):
+        self.output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.output.flush()
+        if result["error"] is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    async def run_one(self, index: int, record: dict[str, Any]):
+        result: dict[str, Any] = {"index": index, "id": record.get("id")}
+        start = time.perf_counter()
+        try:
+            memory = resolve_session(record.get("session"))
+            preset = resolve_preset(record.get("preset") or self.preset)
+            result.update(
+                session=memory.name, session_id=memory.session_id, preset=preset.name
+            )
+            async with TurnScheduler().slot(
+                memory.session_id, preset, Priority.BACKGROUND
+            ):
+                result["response"] = await AgentTurn(
+                    memory, record["prompt"], preset
+                ).run()
+            result["error"] = None
+        except Exception as e:
+            amrita_core.logger.opt(exception=e).error(f"第 {index} 条提示词处理失败")
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self._write(result)
+
+    async def run(self, source: TextIO):
+        # 限制已读入但未完成的提示词数量，避免一次性读入整个输入
+        pending = asyncio.Semaphore(self.concurrency * 2)
+        tasks: set[asyncio.Task[None]] = set()
+        index = 0
+        while line := await asyncio.to_thread(source.readline):
+            index += 1
+            try:
+                record = parse_line(line)
+            except ValueError as e:
+                self._write({"index": index, "id": None, "error": f"无效输入: {e}"})
+                continue
+            if record is None:
+                continue
+            await pending.acquire()
+            task = asyncio.create_task(self.run_one(index, record))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), pending.release()))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+
+async def run_batch(
+    source: TextIO, output: TextIO, concurrency: int, preset: str | None
+) -> int:
+    await bootstrap()
+    await prewarm_preset(preset)
+    runner = BatchRunner(output, concurrency, preset)
+    try:
+        await runner.run(source)
+    finally:
+        await ConnectionPool().aclose()
+        await MCPServerPool().aclose()
+    amrita_core.logger.info(
+        f"批处理完成：成功 {runner.succeeded}，失败 {runner.failed}"
+    )
+    return 1 if runner.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="amrita-agent batch")
+    parser.add_argument(
+        "-i", "--input", default="-", help="输入 JSONL 文件，默认 stdin"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="输出 JSONL 文件，默认 stdout"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="最大并发数"
+    )
+    parser.add_argument("-p", "--preset", help="默认预设名称")
+    args = parser.parse_args(argv)
+
+    if args.output == "-":
+        # 结果写入 stdout 时，将日志改为输出到 stderr
+        amrita_core.logger.remove(logger_id)
+        amrita_core.logger.add(
+            sys.stderr,
+            level=0,
+            diagnose=False,
+            filter=default_filter,
+            format=default_format,
+        )
+
+    with ExitStack() as stack:
+        source = (
+            sys.stdin
+            if args.input == "-"
+            else stack.enter_context(open(args.input, encoding="utf-8"))
+        )
+        output = (
+            sys.stdout
+            if args.output == "-"
+            else stack.enter_context(open(args.output, "w", encoding="utf-8"))
+        )
+        return asyncio.run(run_batch(source, output, args.concurrency, args.preset))
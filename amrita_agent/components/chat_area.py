@@ -1,160 +1,117 @@
-import html
-import re
-from html.parser import HTMLParser
-from typing import cast
+import time
+from collections.abc import Sequence
+from pathlib import Path
 
 import flet as ft
-import markdown
 from amrita_core import PresetManager
 
 from ..constants import MAIN_PADDING, ColorsEnum, FontSizesEnum
 from ..utils.alert import AlertDialog
-
-
-class MarkdownHTMLParser(HTMLParser):
-    """高级 HTML 解析器，将 HTML 转换为 Flet 控件"""
+from ..utils.attachments import is_large_input, preview
+from ..utils.markdown_spec import (
+    CodeSpec,
+    ControlSpec,
+    HTMLSpecParser,
+    ListSpec,
+    TableSpec,
+    TextSpec,
+    render_markdown,
+)
+from ..utils.metrics import RENDER_CONTROLS, RENDER_SECONDS
+from ..utils.prefetch import MessageView
+from ..utils.tracing import span, traced
+from .chat_views import ChatViewState
+from .code_block import CodeBlock
+from .table_block import TableBlock
+
+THUMBNAIL_DISPLAY_SIZE = 96  # 消息中图片缩略图的显示尺寸
+BUBBLE_CHROME_WEIGHT = 6  # 每条消息除内容外的外层控件数（行、按钮等）
+
+
+class MarkdownHTMLParser(HTMLSpecParser):
+    """旧的 Markdown → HTML → HTMLParser 渲染路径，输出 Flet 控件"""
 
     def __init__(self):
         super().__init__()
-        self.controls: list[ft.Control] = []
-        self.current_text = ""
-        self.current_bold = False
-        self.current_italic = False
-        self.current_code = False
-        self.current_list_items: list[str] = []
-        self.in_list = False
-        self.in_code_block = False
-        self.code_language = ""
-        self.code_content = ""
-
-    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
-        if tag == "strong" or tag == "b":
-            self.current_bold = True
-        elif tag == "em" or tag == "i":
-            self.current_italic = True
-        elif tag == "code":
-            self.current_code = True
-        elif tag == "pre":
-            self.in_code_block = True
-            # 获取代码语言
-            for attr, value in attrs:
-                if attr == "class":
-                    match = re.search(r"language-(\w+)", value or "")
-                    if match:
-                        self.code_language = match.group(1)
-        elif tag == "ul" or tag == "ol":
-            self.in_list = True
-        elif tag == "li":
-            pass  # 处理列表项在文本处理中
-        elif tag == "br":
-            self.current_text += "\n"
-
-    def handle_endtag(self, tag: str) -> None:
-        if tag == "strong" or tag == "b":
-            self.current_bold = False
-        elif tag == "em" or tag == "i":
-            self.current_italic = False
-        elif tag == "code":
-            self.current_code = False
-        elif tag == "pre":
-            self.in_code_block = False
-            if self.code_content.strip():
-                self._add_code_block(self.code_content, self.code_language)
-            self.code_content = ""
-            self.code_language = ""
-        elif tag == "p":
-            if self.current_text.strip():
-                self._add_text_control()
-        elif tag == "ul" or tag == "ol":
-            self.in_list = False
-            if self.current_list_items:
-                self._add_list_control()
-        elif tag == "li":
-            if self.current_text.strip():
-                self.current_list_items.append(self.current_text.strip())
-                self.current_text = ""
-
-    def handle_data(self, data: str) -> None:
-        if self.in_code_block:
-            self.code_content += data
-        else:
-            decoded_data = html.unescape(data)
-            self.current_text += decoded_data
-
-    def _add_text_control(self) -> None:
-        if not self.current_text.strip():
-            return
-
-        text = self.current_text.strip()
-        weight = ft.FontWeight.BOLD if self.current_bold else ft.FontWeight.NORMAL
-
-        text_control = ft.Text(
-            text,
-            color=ColorsEnum.text_primary.value,
-            size=FontSizesEnum.body.value,
-            selectable=True,
-            weight=weight,
-            italic=self.current_italic,
-        )
-
-        self.controls.append(text_control)
-        self.current_text = ""
+        self._controls: list[ft.Control] | None = None
+
+    def feed(self, data: str) -> None:
+        self._controls = None
+        super().feed(data)
+
+    @property
+    def controls(self) -> list[ft.Control]:
+        """由 specs 构建的控件，首次访问时构建"""
+        if self._controls is None:
+            self._controls = build_controls(self.specs)
+        return self._controls
+
+
+def _create_text(spec: TextSpec) -> ft.Control:
+    return ft.Text(
+        spec.text,
+        color=ColorsEnum.text_primary.value,
+        size=FontSizesEnum.title.value if spec.bold else FontSizesEnum.body.value,
+        selectable=True,
+        weight=ft.FontWeight.BOLD if spec.bold else ft.FontWeight.NORMAL,
+    )
 
-    def _add_code_block(self, code: str, language: str = "") -> None:
-        code_text = html.unescape(code).strip()
-        if not code_text:
-            return
 
-        # 创建代码块容器
-        code_container = ft.Container(
-            content=ft.Text(
-                code_text,
-                color=ColorsEnum.text_primary.value,
-                size=FontSizesEnum.body.value,
-                selectable=True,
-                font_family="Courier New",
-                no_wrap=False,
-            ),
-            bgcolor=ColorsEnum.bg_tertiary.value,
-            padding=12,
-            border_radius=ft.border_radius.all(6),
+def _create_list(spec: ListSpec) -> ft.Control:
+    list_controls = []
+    counters: dict[int, int] = {}
+    for depth, item in spec.items:
+        counters[depth] = counters.get(depth, 0) + 1
+        for deeper in [key for key in counters if key > depth]:
+            counters.pop(deeper)
+        marker = f"{counters[depth]}." if spec.ordered else "•"
+        item_row = ft.Row(
+            controls=[
+                ft.Text(marker, size=FontSizesEnum.body.value),
+                ft.Text(
+                    item,
+                    color=ColorsEnum.text_primary.value,
+                    size=FontSizesEnum.body.value,
+                    selectable=True,
+                    expand=True,
+                ),
+            ],
+            spacing=8,
         )
+        if depth:
+            item_row = ft.Container(
+                content=item_row, padding=ft.padding.only(left=18 * depth)
+            )
+        list_controls.append(item_row)
 
-        self.controls.append(code_container)
+    return ft.Column(
+        controls=list_controls,
+        spacing=4,
+    )
 
-    def _add_list_control(self) -> None:
-        if not self.current_list_items:
-            return
 
-        list_controls = []
-        for item in self.current_list_items:
-            item_row = ft.Row(
-                controls=[
-                    ft.Text("•", size=FontSizesEnum.body.value),
-                    ft.Text(
-                        item,
-                        color=ColorsEnum.text_primary.value,
-                        size=FontSizesEnum.body.value,
-                        selectable=True,
-                        expand=True,
-                    ),
-                ],
-                spacing=8,
+def build_controls(specs: list[ControlSpec]) -> list[ft.Control]:
+    """将 ControlSpec 构建为 Flet 控件"""
+    controls: list[ft.Control] = []
+    for spec in specs:
+        if isinstance(spec, TextSpec):
+            controls.append(_create_text(spec))
+        elif isinstance(spec, CodeSpec):
+            # 代码块先以纯文本显示，高亮在后台完成后替换
+            controls.append(CodeBlock(spec.code, spec.language))
+        elif isinstance(spec, ListSpec):
+            controls.append(_create_list(spec))
+        elif isinstance(spec, TableSpec):
+            # 行控件由 TableBlock 按需构建，这里只传入纯文本数据
+            controls.append(
+                TableBlock(list(spec.header), [list(row) for row in spec.rows])
             )
-            list_controls.append(item_row)
-
-        list_column = ft.Column(
-            controls=list_controls,
-            spacing=4,
-        )
+    return controls
 
-        self.controls.append(list_column)
-        self.current_list_items = []
 
+def _parse_legacy(text: str) -> MarkdownHTMLParser:
+    import markdown
 
-def markdown_to_flet_controls(text: str) -> list[ft.Control]:
-    """使用 HTMLParser 将 Markdown 完整渲染为 Flet 控件"""
-    # 转换 Markdown 为 HTML
     html_content = markdown.markdown(
         text,
         extensions=[
@@ -164,29 +121,65 @@ def markdown_to_flet_controls(text: str) -> list[ft.Control]:
             "sane_lists",
         ],
     )
-
-    # 使用自定义解析器解析 HTML
     parser = MarkdownHTMLParser()
     parser.feed(html_content)
+    parser.close()
+    return parser
+
+
+def markdown_to_specs_legacy(text: str) -> list[ControlSpec]:
+    """经 Markdown → HTML → HTMLParser 生成 ControlSpec（旧路径）"""
+    return _parse_legacy(text).specs
+
+
+def markdown_to_flet_controls_legacy(text: str) -> list[ft.Control]:
+    """经 Markdown → HTML → HTMLParser 生成 Flet 控件（旧路径）"""
+    return _parse_legacy(text).controls
+
+
+@traced("render.markdown")
+def markdown_to_flet_controls(text: str) -> list[ft.Control]:
+    """使用单遍渲染器将 Markdown 完整渲染为 Flet 控件"""
+    start = time.perf_counter()
+    specs = render_markdown(text)
 
     # 如果没有生成任何控件，返回原始文本
-    if not parser.controls:
-        parser.controls.append(
+    if not specs:
+        controls: list[ft.Control] = [
             ft.Text(
                 text,
                 color=ColorsEnum.text_primary.value,
                 size=FontSizesEnum.body.value,
                 selectable=True,
             )
-        )
-
-    return parser.controls
+        ]
+    else:
+        controls = build_controls(specs)
+    RENDER_SECONDS.observe(time.perf_counter() - start)
+    RENDER_CONTROLS.observe(len(controls))
+    return controls
+
+
+def _collapsed_controls(text: str) -> list[ft.Control]:
+    """大段输入只显示开头几行"""
+    lines = text.count("\n") + 1
+    return [
+        ft.Text(preview(text), selectable=True),
+        ft.Text(
+            f"已折叠：共 {len(text):,} 字符、{lines:,} 行，发送时作为附件分段保存",
+            size=FontSizesEnum.small.value,
+            color=ColorsEnum.text_secondary.value,
+            italic=True,
+        ),
+    ]
 
 
 class MessageBubble(ft.Container):
-    def __init__(self, text, is_user=True):
+    def __init__(self, text, is_user=True, specs: Sequence[ControlSpec] | None = None):
         super().__init__()
         self.is_user = is_user
+        # 折叠显示时保留全文，供复制与编辑使用
+        self.full_text: str | None = None
         self.padding = ft.padding.symmetric(horizontal=12, vertical=10)
         self.border_radius = ft.border_radius.all(12)
         self.bgcolor = (
@@ -194,9 +187,14 @@ class MessageBubble(ft.Container):
         )
         self.alignment = ft.alignment.center_left
 
-        # 使用 Markdown 渲染
-        if not is_user:
+        # 使用 Markdown 渲染，已预渲染时直接由 ControlSpec 构建
+        if not is_user and specs:
+            controls = build_controls(list(specs))
+        elif not is_user:
             controls = markdown_to_flet_controls(text)
+        elif is_large_input(text):
+            self.full_text = text
+            controls = _collapsed_controls(text)
         else:
             controls = [ft.Text(text)]
         self.content: ft.Column = ft.Column(
@@ -204,10 +202,29 @@ class MessageBubble(ft.Container):
             spacing=8,
         )
 
+    def add_images(self, paths: Sequence[Path]):
+        """在消息下方显示图片缩略图"""
+        self.content.controls.append(
+            ft.Row(
+                controls=[
+                    ft.Image(
+                        src=str(path),
+                        width=THUMBNAIL_DISPLAY_SIZE,
+                        height=THUMBNAIL_DISPLAY_SIZE,
+                        fit=ft.ImageFit.COVER,
+                        border_radius=ft.border_radius.all(8),
+                    )
+                    for path in paths
+                ],
+                wrap=True,
+            )
+        )
+
 
 class ChatArea(ft.Container):
     _last_bubble: MessageBubble
     _edit_alert: AlertDialog
+    view: ChatViewState  # 当前显示的会话视图
 
     def __init__(self, alert: AlertDialog):
         self._edit_alert = alert
@@ -216,11 +233,7 @@ class ChatArea(ft.Container):
         self.expand = True
         self.padding = MAIN_PADDING
 
-        self.messages_container = ft.Column(
-            spacing=12,
-            scroll=ft.ScrollMode.AUTO,
-            expand=True,
-        )
+        self.view = ChatViewState(None, "新的对话")
 
         self.model_selector = ft.Dropdown(
             label="预设",
@@ -244,6 +257,35 @@ class ChatArea(ft.Container):
             expand=True,
         )
 
+        # 待发送的图片，发送时由 take_images 取走
+        self.pending_images: list[Path] = []
+        self.file_picker = ft.FilePicker(on_result=self._on_files_picked)
+        self.attach_button = ft.IconButton(
+            icon="image",
+            icon_color=ColorsEnum.text_secondary.value,
+            tooltip="添加图片",
+            on_click=lambda e: self.file_picker.pick_files(
+                allow_multiple=True, file_type=ft.FilePickerFileType.IMAGE
+            ),
+        )
+        self.attachments_text = ft.Text(
+            "",
+            size=FontSizesEnum.small.value,
+            color=ColorsEnum.text_secondary.value,
+        )
+        self.attachments_row = ft.Row(
+            controls=[
+                self.attachments_text,
+                ft.IconButton(
+                    "close",
+                    icon_size=15,
+                    tooltip="移除图片",
+                    on_click=lambda e: self._set_pending_images([]),
+                ),
+            ],
+            visible=False,
+        )
+
         self.send_button = ft.IconButton(
             icon="send",
             icon_color=ColorsEnum.text_primary.value,
@@ -253,6 +295,7 @@ class ChatArea(ft.Container):
         input_row = ft.Row(
             controls=[
                 self.model_selector,
+                self.attach_button,
                 self.input_field,
                 self.send_button,
             ],
@@ -260,32 +303,112 @@ class ChatArea(ft.Container):
             vertical_alignment=ft.CrossAxisAlignment.END,
         )
 
+        self.title_text = ft.Text(
+            "新的对话",
+            size=FontSizesEnum.heading.value,
+            weight=ft.FontWeight.BOLD,
+            color=ColorsEnum.text_primary.value,
+        )
+
         self.content = ft.Column(
             controls=[
                 ft.Container(
-                    content=ft.Text(
-                        "新的对话",
-                        size=FontSizesEnum.heading.value,
-                        weight=ft.FontWeight.BOLD,
-                        color=ColorsEnum.text_primary.value,
-                    ),
+                    content=self.title_text,
                     padding=ft.padding.only(bottom=15),
                     border=ft.border.only(
                         bottom=ft.border.BorderSide(1, ColorsEnum.divider.value)
                     ),
                 ),
-                self.messages_container,
+                self.view.messages,
+                self.attachments_row,
                 input_row,
             ],
             spacing=12,
             expand=True,
         )
 
+    @property
+    def messages_container(self) -> ft.Column:
+        return self.view.messages
+
     def _get_models(self):
         return [i.name for i in PresetManager().get_all_presets()]
 
-    def add_message(self, text, is_user=True):
-        self._last_bubble = bubble = MessageBubble(text, is_user)
+    def did_mount(self):
+        assert self.page is not None
+        self.page.overlay.append(self.file_picker)
+        self.page.update()
+
+    def will_unmount(self):
+        assert self.page is not None
+        if self.file_picker in self.page.overlay:
+            self.page.overlay.remove(self.file_picker)
+
+    def _on_files_picked(self, e: ft.FilePickerResultEvent):
+        picked = [Path(f.path) for f in e.files or [] if f.path]
+        self._set_pending_images(self.pending_images + picked)
+
+    def _set_pending_images(self, paths: list[Path], update: bool = True):
+        self.pending_images = paths
+        self.attachments_text.value = f"已添加 {len(paths)} 张图片：" + ", ".join(
+            p.name for p in paths
+        )
+        self.attachments_row.visible = bool(paths)
+        if update:
+            self.update()
+
+    def take_images(self) -> list[Path]:
+        """取走待发送的图片"""
+        paths = self.pending_images
+        if paths:
+            self._set_pending_images([])
+        return paths
+
+    @traced("ui.build_view")
+    def build_view(
+        self, session_id: str, title: str, messages: Sequence[MessageView]
+    ) -> ChatViewState:
+        """构建会话视图的消息控件但不显示，messages 通常来自 SessionPrefetcher"""
+        view = ChatViewState(session_id, title)
+        for message in messages:
+            self.add_message(
+                message.text, message.is_user, message.specs, update=False, view=view
+            )
+        return view
+
+    @traced("ui.switch_view")
+    def switch_view(self, view: ChatViewState):
+        """换入另一个会话视图，当前的草稿与待发送图片保存在原视图中"""
+        if view is not self.view:
+            self.view.draft = self.input_field.value or ""
+            self.view.pending_images = self.pending_images
+            self.view = view
+            self.content.controls[1] = view.messages
+            self.input_field.value = view.draft
+            self._set_pending_images(view.pending_images, update=False)
+        self.title_text.value = view.title
+        if self.page is None:
+            # 聊天区不在页面上（如位于设置页），换回时随整棵控件树一并发送
+            return
+        with span("ui.update"):
+            self.update()
+            if view.at_bottom:
+                view.messages.scroll_to(offset=-1, duration=0)
+            else:
+                view.messages.scroll_to(offset=view.scroll_offset, duration=0)
+
+    @traced("ui.add_message")
+    def add_message(
+        self,
+        text,
+        is_user=True,
+        specs: Sequence[ControlSpec] | None = None,
+        update: bool = True,
+        view: ChatViewState | None = None,
+    ) -> MessageBubble:
+        """在 view（默认为当前视图）末尾添加消息，view 未显示时不更新界面"""
+        view = view or self.view
+        self._last_bubble = bubble = MessageBubble(text, is_user, specs)
 
         def copy_bubble(e):
             nonlocal bubble
@@ -423,17 +546,27 @@ class ChatArea(ft.Container):
             if is_user
             else ft.MainAxisAlignment.START,
         )
-        self.messages_container.controls.append(row)
-        self.messages_container.scroll_to(offset=-1, duration=200)
-        self.update()
+        view.messages.controls.append(row)
+        view.weight += len(self._last_bubble.content.controls) + BUBBLE_CHROME_WEIGHT
+        if update and view is self.view:
+            with span("ui.update"):
+                view.messages.scroll_to(offset=-1, duration=200)
+                self.update()
+        return self._last_bubble
 
     def _extract_text_from_bubble(self, bubble):
         """从气泡中提取文本内容"""
+        if bubble.full_text is not None:
+            return bubble.full_text
         texts = []
 
         def extract_from_controls(controls):
             for control in controls:
-                if isinstance(control, ft.Text):
+                if isinstance(control, CodeBlock):
+                    texts.append(control.code)
+                elif isinstance(control, TableBlock):
+                    texts.append(control.to_text())
+                elif isinstance(control, ft.Text):
                     texts.append(control.value)
                 elif hasattr(control, "controls") and control.controls:
                     extract_from_controls(control.controls)
@@ -450,11 +583,14 @@ class ChatArea(ft.Container):
     def _update_bubble_content(self, bubble: MessageBubble, new_text: str):
         """更新气泡的内容"""
         # 重新生成气泡的控件
-        new_controls = (
-            markdown_to_flet_controls(new_text)
-            if bubble.is_user
-            else [ft.Text(new_text)]
-        )
+        bubble.full_text = None
+        if bubble.is_user and is_large_input(new_text):
+            bubble.full_text = new_text
+            new_controls = _collapsed_controls(new_text)
+        elif bubble.is_user:
+            new_controls = markdown_to_flet_controls(new_text)
+        else:
+            new_controls = [ft.Text(new_text)]
 
         # 清空现有控件
         bubble.content.controls.clear()
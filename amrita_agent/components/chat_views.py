@@ -0,0 +1,83 @@
+"""会话聊天视图的 LRU 缓存
+
+每个会话的聊天视图（已构建的消息控件、滚动位置、未发送的草稿与图片）
+在切换会话时保留，切回时直接换入 ChatArea，无需重新构建控件。
+缓存按视图数与估算的控件数淘汰最久未使用的视图；被淘汰的会话再次打开时
+由 SessionPrefetcher 的预渲染结果重新构建。
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import flet as ft
+
+CHAT_VIEW_CACHE_SIZE = 6  # 最多保留的视图数
+CHAT_VIEW_CACHE_WEIGHT = 3000  # 所有视图估算的控件总数上限
+SCROLL_EVENT_INTERVAL = 100  # 记录滚动位置的事件间隔（毫秒）
+
+
+@dataclass(eq=False)
+class ChatViewState:
+    """一个会话的聊天视图，session_id 为 None 表示尚未保存的新对话"""
+
+    session_id: str | None
+    title: str
+    messages: ft.Column = field(init=False)
+    scroll_offset: float = 0.0
+    at_bottom: bool = True
+    draft: str = ""
+    pending_images: list[Path] = field(default_factory=list)
+    weight: int = 0  # 估算的控件数，用于淘汰
+
+    def __post_init__(self):
+        self.messages = ft.Column(
+            spacing=12,
+            scroll=ft.ScrollMode.AUTO,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=SCROLL_EVENT_INTERVAL,
+        )
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self.scroll_offset = e.pixels
+        self.at_bottom = e.pixels >= e.max_scroll_extent - 1
+
+
+class ChatViewCache:
+    _views: OrderedDict[str, ChatViewState]
+
+    def __init__(
+        self,
+        max_views: int = CHAT_VIEW_CACHE_SIZE,
+        max_weight: int = CHAT_VIEW_CACHE_WEIGHT,
+    ):
+        self.max_views = max_views
+        self.max_weight = max_weight
+        self._views = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    @property
+    def weight(self) -> int:
+        return sum(view.weight for view in self._views.values())
+
+    def get(self, session_id: str) -> ChatViewState | None:
+        view = self._views.get(session_id)
+        if view is not None:
+            self._views.move_to_end(session_id)
+        return view
+
+    def put(self, view: ChatViewState):
+        """加入或刷新视图，随后按数量与控件数淘汰，view 本身不会被淘汰"""
+        assert view.session_id is not None
+        self._views[view.session_id] = view
+        self._views.move_to_end(view.session_id)
+        while len(self._views) > 1 and (
+            len(self._views) > self.max_views or self.weight > self.max_weight
+        ):
+            self._views.popitem(last=False)
+
+    def discard(self, session_id: str):
+        self._views.pop(session_id, None)
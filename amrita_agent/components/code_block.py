@@ -0,0 +1,105 @@
+import flet as ft
+
+from ..constants import CodeColorsEnum, ColorsEnum, FontSizesEnum
+from ..utils.highlight import CodeHighlighter, TokenSpan
+
+CHUNK_LINES = 120  # 大代码块按此行数分片，逐片高亮
+LARGE_BLOCK_HEIGHT = 480  # 大代码块的可视高度
+LINE_HEIGHT = FontSizesEnum.body.value * 1.45  # 估算的单行像素高度
+
+
+class CodeBlock(ft.Container):
+    """代码块控件
+
+    先以纯文本显示，再在工作线程中高亮并替换为着色的 spans。
+    超过一个分片的大代码块放入固定高度的滚动区域，只高亮可见的分片。
+    """
+
+    def __init__(self, code: str, language: str = ""):
+        super().__init__()
+        self.code = code
+        self.language = language
+        self.bgcolor = ColorsEnum.bg_tertiary.value
+        self.padding = 12
+        self.border_radius = ft.border_radius.all(6)
+
+        lines = code.split("\n")
+        self._chunks = [
+            "\n".join(lines[i : i + CHUNK_LINES])
+            for i in range(0, len(lines), CHUNK_LINES)
+        ]
+        self._chunk_texts = [self._create_text(chunk) for chunk in self._chunks]
+        self._requested: set[int] = set()
+
+        if len(self._chunks) == 1:
+            self.content = self._chunk_texts[0]
+        else:
+            self.content = ft.Column(
+                controls=self._chunk_texts,
+                spacing=0,
+                height=LARGE_BLOCK_HEIGHT,
+                scroll=ft.ScrollMode.AUTO,
+                on_scroll=self._on_scroll,
+                on_scroll_interval=50,
+            )
+        self._highlight_visible(0)
+
+    @staticmethod
+    def _create_text(chunk: str) -> ft.Text:
+        return ft.Text(
+            chunk,
+            color=ColorsEnum.text_primary.value,
+            size=FontSizesEnum.body.value,
+            selectable=True,
+            font_family="Courier New",
+            no_wrap=False,
+        )
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self._highlight_visible(e.pixels)
+
+    def _highlight_visible(self, offset: float):
+        """高亮当前视口（及其下一屏）覆盖的分片"""
+        chunk_height = CHUNK_LINES * LINE_HEIGHT
+        first = max(int(offset // chunk_height), 0)
+        last = int((offset + LARGE_BLOCK_HEIGHT * 2) // chunk_height)
+        for index in range(first, min(last, len(self._chunks) - 1) + 1):
+            self._highlight_chunk(index)
+
+    def _highlight_chunk(self, index: int):
+        if index in self._requested:
+            return
+        self._requested.add(index)
+        CodeHighlighter().submit(
+            self.language,
+            self._chunks[index],
+            lambda spans: self._apply_spans(index, spans),
+        )
+
+    def _apply_spans(self, index: int, spans: list[TokenSpan]):
+        """将分词结果替换进对应分片的 Text
+
+        高亮在工作线程中完成时回调也在工作线程中，已挂载的控件转回页面的
+        事件循环修改；尚未挂载时直接替换，挂载时随控件树一并发送。
+        """
+        text = self._chunk_texts[index]
+        if text.page is None:
+            self._set_spans(text, spans)
+        else:
+            text.page.run_task(self._update_spans, text, spans)
+
+    async def _update_spans(self, text: ft.Text, spans: list[TokenSpan]):
+        self._set_spans(text, spans)
+        if text.page is not None:
+            text.update()
+
+    @staticmethod
+    def _set_spans(text: ft.Text, spans: list[TokenSpan]):
+        text.spans = [
+            ft.TextSpan(
+                value,
+                style=ft.TextStyle(color=CodeColorsEnum[kind].value),
+            )
+            for value, kind in spans
+        ]
+        text.value = None
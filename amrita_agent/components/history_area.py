@@ -156,9 +156,14 @@ class HistoryArea(ft.Container):
     def _load_history(self):
         self.history_list.controls.clear()
 
-        items = list(DataManager()._sessionid2memory.values())
-        items.sort(key=lambda x: x.last_update, reverse=True)
-        items = [(i.name, i.last_update.strftime("%Y-%m-%d %H:%M:%S")) for i in items]
+        snapshot = DataManager().snapshot()
+        items = [
+            (
+                snapshot.sessionid2name[i.session_id],
+                i.last_update.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+            for i in snapshot.memories()
+        ]
         if not items:
             self.history_list.controls.append(self.empty_state)
         else:
@@ -0,0 +1,195 @@
+import asyncio
+from concurrent.futures import Future
+from typing import Any
+
+import flet as ft
+
+from ..constants import MAIN_PADDING, ColorsEnum, FontSizesEnum
+from ..utils.metrics import MetricsRegistry
+from ..utils.tracing import Tracer
+
+PERFORMANCE_REFRESH_INTERVAL = 2.0  # 页面可见时自动刷新的间隔（秒）
+_HISTOGRAM_COLUMNS = ("count", "avg", "p50", "p95", "p99")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    return ", ".join(f"{k}={v}" for k, v in labels.items()) or "-"
+
+
+def _format_number(name: str, value: float) -> str:
+    if name.endswith("_seconds"):
+        return f"{value * 1000:.1f}ms"
+    if float(value).is_integer():
+        return f"{int(value)}"
+    return f"{value:.2f}"
+
+
+def _cell(text: str) -> ft.DataCell:
+    return ft.DataCell(
+        ft.Text(
+            text, size=FontSizesEnum.small.value, color=ColorsEnum.text_primary.value
+        )
+    )
+
+
+def _column(text: str) -> ft.DataColumn:
+    return ft.DataColumn(
+        ft.Text(
+            text,
+            size=FontSizesEnum.small.value,
+            color=ColorsEnum.text_secondary.value,
+            weight=ft.FontWeight.BOLD,
+        )
+    )
+
+
+class MetricCard(ft.Container):
+    def __init__(self, metric: dict[str, Any]):
+        super().__init__()
+        self.padding = ft.padding.symmetric(horizontal=12, vertical=10)
+        self.bgcolor = ColorsEnum.bg_tertiary.value
+        self.border_radius = ft.border_radius.all(8)
+
+        name = metric["name"]
+        if metric["type"] == "histogram":
+            columns = [_column("标签"), *(_column(c) for c in _HISTOGRAM_COLUMNS)]
+            rows = [
+                ft.DataRow(
+                    [
+                        _cell(_format_labels(series["labels"])),
+                        _cell(str(series["count"])),
+                        *(
+                            _cell(_format_number(name, series[c]))
+                            for c in _HISTOGRAM_COLUMNS[1:]
+                        ),
+                    ]
+                )
+                for series in metric["series"]
+            ]
+        else:
+            columns = [_column("标签"), _column("值")]
+            rows = [
+                ft.DataRow(
+                    [
+                        _cell(_format_labels(series["labels"])),
+                        _cell(_format_number(name, series["value"])),
+                    ]
+                )
+                for series in metric["series"]
+            ]
+
+        self.content = ft.Column(
+            controls=[
+                ft.Text(
+                    metric["help"],
+                    size=FontSizesEnum.body.value,
+                    color=ColorsEnum.text_primary.value,
+                    weight=ft.FontWeight.BOLD,
+                ),
+                ft.Text(
+                    f"{name} ({metric['type']})",
+                    size=FontSizesEnum.small.value,
+                    color=ColorsEnum.text_secondary.value,
+                ),
+                ft.DataTable(
+                    columns=columns,
+                    rows=rows,
+                    heading_row_height=32,
+                    data_row_min_height=28,
+                    data_row_max_height=28,
+                    column_spacing=24,
+                ),
+            ],
+            spacing=4,
+        )
+
+
+class PerformanceArea(ft.Container):
+    """展示指标注册表中的数据，页面可见时定时刷新"""
+
+    def __init__(self):
+        super().__init__()
+        self.bgcolor = ColorsEnum.bg_primary.value
+        self.expand = True
+        self.padding = MAIN_PADDING
+        self._auto_refresh_future: Future[None] | None = None
+
+        self.refresh_button = ft.IconButton(
+            icon="refresh",
+            icon_color=ColorsEnum.accent_primary.value,
+            on_click=lambda _: self.refresh(),
+        )
+        self.export_button = ft.TextButton(
+            "导出追踪",
+            icon="file_download",
+            on_click=self._on_export_trace,
+        )
+        self.export_text = ft.Text(
+            size=FontSizesEnum.small.value,
+            color=ColorsEnum.text_secondary.value,
+            selectable=True,
+        )
+        self.metrics_list = ft.Column(
+            spacing=10,
+            scroll=ft.ScrollMode.AUTO,
+            expand=True,
+        )
+        self.empty_state = ft.Text(
+            "暂无数据",
+            size=FontSizesEnum.body.value,
+            color=ColorsEnum.text_secondary.value,
+        )
+
+        self.content = ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[
+                        ft.Text(
+                            "性能",
+                            size=FontSizesEnum.heading.value,
+                            weight=ft.FontWeight.BOLD,
+                            color=ColorsEnum.text_primary.value,
+                        ),
+                        ft.Container(expand=True),
+                        self.export_button,
+                        self.refresh_button,
+                    ],
+                    spacing=10,
+                ),
+                self.export_text,
+                self.metrics_list,
+            ],
+            spacing=15,
+            expand=True,
+        )
+        self._load_metrics()
+
+    def _load_metrics(self):
+        metrics = [m for m in MetricsRegistry().snapshot() if m["series"]]
+        self.metrics_list.controls = [MetricCard(m) for m in metrics] or [
+            self.empty_state
+        ]
+
+    def _on_export_trace(self, e):
+        path = Tracer().export()
+        self.export_text.value = f"已导出到 {path}，可在 ui.perfetto.dev 中打开"
+        self.export_text.update()
+
+    def refresh(self):
+        self._load_metrics()
+        if self.page is not None:
+            self.metrics_list.update()
+
+    def did_mount(self):
+        assert self.page is not None
+        self._auto_refresh_future = self.page.run_task(self._auto_refresh)
+
+    def will_unmount(self):
+        if self._auto_refresh_future is not None:
+            self._auto_refresh_future.cancel()
+            self._auto_refresh_future = None
+
+    async def _auto_refresh(self):
+        while True:
+            await asyncio.sleep(PERFORMANCE_REFRESH_INTERVAL)
+            self.refresh()
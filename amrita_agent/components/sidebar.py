@@ -41,9 +41,17 @@ class Sidebar(ft.Container):
     edit_alert: AlertDialog
     delete_alert: AlertDialog
 
-    def __init__(self, on_nav_select: Callable[[Any], Any]):
+    def __init__(
+        self,
+        on_nav_select: Callable[[Any], Any],
+        on_session_select: Callable[[str], Any] | None = None,
+        on_session_hover: Callable[[str, bool], Any] | None = None,
+    ):
         super().__init__()
         self.on_nav_select = on_nav_select
+        # 参数为会话 ID；悬停回调的第二个参数表示鼠标进入还是离开
+        self.on_session_select = on_session_select
+        self.on_session_hover = on_session_hover
         self.is_collapsed = False
         self.width = SIDEBAR_WIDTH
         self.bgcolor = ColorsEnum.bg_secondary.value
@@ -133,6 +141,10 @@ class Sidebar(ft.Container):
             expand=True,
         )
 
+        self.performance_button = NavButton(
+            "性能", "speed", "performance", self.on_nav_select, self._on_button_hover
+        )
+
         self.settings_button = NavButton(
             "设置", "settings", "settings", self.on_nav_select, self._on_button_hover
         )
@@ -148,6 +160,7 @@ class Sidebar(ft.Container):
 
         self.footer_buttons = ft.Column(
             controls=[
+                self.performance_button,
                 self.settings_button,
                 self.collapse_button,
             ],
@@ -181,12 +194,11 @@ class Sidebar(ft.Container):
 
     def _create_recent_conversations(self):
         """创建最近对话列表"""
-        items = list(DataManager()._sessionid2memory.values())
-        items.sort(key=lambda x: x.last_update, reverse=True)
-        recent_chats: list[str] = [i.name for i in items]
-
         conversations = []
-        for chat in recent_chats:
+        snapshot = DataManager().snapshot()
+        for memory in snapshot.memories():
+            session_id = memory.session_id
+            chat = snapshot.sessionid2name[session_id]
             # 编辑按钮
             edit_btn = ft.IconButton(
                 icon="edit",
@@ -225,23 +237,24 @@ class Sidebar(ft.Container):
                 ),
                 padding=ft.padding.symmetric(horizontal=8, vertical=6),
                 border_radius=ft.border_radius.all(6),
-                on_hover=lambda e, btn=None: self._on_conv_hover(e, btn),
-                on_click=lambda _: self._on_conversation_click(chat),
+                on_hover=lambda e, sid=session_id: self._on_conv_hover(e, sid),
+                on_click=lambda _, sid=session_id: self._on_conversation_click(sid),
             )
             conversations.append(conv_btn)
 
         return conversations
 
-    def _on_conv_hover(self, e, btn):
-        if e.data == "true":
-            e.control.bgcolor = ColorsEnum.bg_tertiary.value
-        else:
-            e.control.bgcolor = None
+    def _on_conv_hover(self, e, session_id: str):
+        entered = e.data == "true"
+        e.control.bgcolor = ColorsEnum.bg_tertiary.value if entered else None
         e.control.update()
+        if self.on_session_hover:
+            self.on_session_hover(session_id, entered)
 
-    def _on_conversation_click(self, chat_title: str):
+    def _on_conversation_click(self, session_id: str):
         """点击对话时的处理"""
-        pass
+        if self.on_session_select:
+            self.on_session_select(session_id)
 
     def _on_edit_conversation(self, chat_title: str):
         """编辑对话时的处理"""
@@ -285,6 +298,10 @@ class Sidebar(ft.Container):
             self.history_button.padding = ft.padding.symmetric(
                 horizontal=12, vertical=12
             )
+            self.performance_button.text_control.visible = False
+            self.performance_button.padding = ft.padding.symmetric(
+                horizontal=12, vertical=12
+            )
             self.settings_button.text_control.visible = False
             self.settings_button.padding = ft.padding.symmetric(
                 horizontal=12, vertical=12
@@ -308,6 +325,10 @@ class Sidebar(ft.Container):
             self.history_button.padding = ft.padding.symmetric(
                 horizontal=15, vertical=12
             )
+            self.performance_button.text_control.visible = True
+            self.performance_button.padding = ft.padding.symmetric(
+                horizontal=15, vertical=12
+            )
             self.settings_button.text_control.visible = True
             self.settings_button.padding = ft.padding.symmetric(
                 horizontal=15, vertical=12
@@ -0,0 +1,128 @@
+import flet as ft
+
+from ..constants import ColorsEnum, FontSizesEnum
+
+TABLE_PAGE_ROWS = 50  # 每次按需构建的行数
+TABLE_ROW_CAP = 200  # 滚动时最多自动构建的行数，超过后需点击展开
+TABLE_VIEW_HEIGHT = 360
+ROW_HEIGHT = 34
+CELL_WIDTH = 160
+
+
+class TableBlock(ft.Container):
+    """Markdown 表格控件
+
+    行数据以纯文本保存，行控件只在滚动到附近时按页构建，并放入固定行高的
+    ListView 中由客户端虚拟化。自动构建的行数有上限，超出部分需要点击“展开”。
+    """
+
+    def __init__(self, header: list[str], rows: list[list[str]]):
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.bgcolor = ColorsEnum.bg_tertiary.value
+        self.padding = 8
+        self.border_radius = ft.border_radius.all(6)
+
+        self._columns = max([len(header), *(len(row) for row in rows)], default=0)
+        self._row_cap = TABLE_ROW_CAP
+        width = self._columns * CELL_WIDTH
+
+        self.list_view = ft.ListView(
+            controls=[],
+            item_extent=ROW_HEIGHT,
+            height=min(len(rows) * ROW_HEIGHT, TABLE_VIEW_HEIGHT),
+            width=width,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=100,
+            visible=bool(rows),  # 只有表头时不占位
+        )
+        # 有未构建的行时才由 _refresh_more_button 显示
+        self.more_button = ft.TextButton(visible=False, on_click=self._on_expand)
+
+        controls: list[ft.Control] = []
+        if header:
+            controls.append(self._create_row(header, bold=True))
+            controls.append(
+                ft.Container(height=1, width=width, bgcolor=ColorsEnum.divider.value)
+            )
+        controls.append(self.list_view)
+
+        self._build_rows(TABLE_PAGE_ROWS)
+        self.content = ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[ft.Column(controls=controls, spacing=0)],
+                    scroll=ft.ScrollMode.AUTO,
+                ),
+                self.more_button,
+            ],
+            spacing=4,
+        )
+
+    @property
+    def built_rows(self) -> int:
+        return len(self.list_view.controls)
+
+    def _create_row(self, cells: list[str], bold: bool = False) -> ft.Row:
+        cells = cells + [""] * (self._columns - len(cells))
+        return ft.Row(
+            controls=[
+                ft.Container(
+                    content=ft.Text(
+                        cell,
+                        color=ColorsEnum.text_primary.value,
+                        size=FontSizesEnum.small.value,
+                        weight=ft.FontWeight.BOLD if bold else ft.FontWeight.NORMAL,
+                        max_lines=2,
+                        overflow=ft.TextOverflow.ELLIPSIS,
+                        tooltip=cell if len(cell) > 20 else None,
+                    ),
+                    width=CELL_WIDTH,
+                    height=ROW_HEIGHT,
+                    padding=ft.padding.symmetric(horizontal=6),
+                    alignment=ft.alignment.center_left,
+                )
+                for cell in cells
+            ],
+            spacing=0,
+        )
+
+    def _build_rows(self, count: int) -> bool:
+        """在上限内追加构建 count 行，返回是否有新行"""
+        start = self.built_rows
+        end = min(start + count, len(self.rows), self._row_cap)
+        if end <= start:
+            return False
+        self.list_view.controls.extend(
+            self._create_row(row) for row in self.rows[start:end]
+        )
+        self._refresh_more_button()
+        return True
+
+    def _refresh_more_button(self):
+        # 上限以内的行由滚动自动构建，达到上限后才需要展开
+        remaining = len(self.rows) - self.built_rows
+        self.more_button.visible = remaining > 0 and self.built_rows >= self._row_cap
+        self.more_button.text = (
+            f"展开 {min(remaining, TABLE_ROW_CAP)} 行（剩余 {remaining} 行）"
+        )
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        # 接近底部时构建下一页
+        if e.pixels >= e.max_scroll_extent - ROW_HEIGHT * 5 and self._build_rows(
+            TABLE_PAGE_ROWS
+        ):
+            self.update()
+
+    def _on_expand(self, e):
+        """提高上限并构建到新的上限"""
+        self._row_cap += TABLE_ROW_CAP
+        self._build_rows(self._row_cap - self.built_rows)
+        self.update()
+
+    def to_text(self) -> str:
+        """以制表符分隔的纯文本形式导出表格"""
+        lines = ["\t".join(self.header)] if self.header else []
+        lines.extend("\t".join(row) for row in self.rows)
+        return "\n".join(lines)
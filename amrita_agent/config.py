@@ -1,15 +1,20 @@
+import asyncio
+import threading
+from collections.abc import Callable
 from typing import Any, Literal
 
 import tomli
 import tomli_w
-from amrita_core import set_config
+from amrita_core import logger, set_config
 from amrita_core.config import (
     AmritaConfig,
     BaseModel,
     FunctionConfig,
     LLMConfig,
 )
+from amrita_core.config import get_config as core_config
 from pydantic import Field
+from typing_extensions import Self
 
 from .constants import (
     CONFIG_DIR,
@@ -72,6 +77,13 @@ class AgentConfig(BaseModel):
         default=True,
         description="Whether to allow Agent to send intermediate messages to users in agent mode",
     )
+    agent_parallel_tool_calls: bool = Field(
+        default=True,
+        description="Whether to run the tool calls returned in one model step concurrently in agent mode",
+    )
+    agent_tool_timeout: int = Field(
+        default=60, description="Timeout for a single tool call (seconds)"
+    )
     agent_mcp_client_enable: bool = Field(
         default=False, description="Whether to enable MCP client"
     )
@@ -82,6 +94,24 @@ class AgentConfig(BaseModel):
         default=False,
         description="Whether to force at least one tool to be used per call",
     )
+    memory_retrieval_enable: bool = Field(
+        default=False,
+        description="Whether to recall relevant snippets from all past sessions into the context",
+    )
+    memory_retrieval_top_k: int = Field(
+        default=5, description="Maximum number of recalled snippets per message"
+    )
+    memory_retrieval_token_budget: int = Field(
+        default=800, description="Token budget for recalled snippets"
+    )
+    ui_prefetch_recent_sessions: int = Field(
+        default=3,
+        description="Number of most recent sessions to pre-render when idle (0 to disable)",
+    )
+    ui_prefetch_messages: int = Field(
+        default=30,
+        description="Number of latest messages pre-rendered and shown when opening a session",
+    )
     memory_length_limit: int = Field(
         default=50, description="Maximum number of messages in memory context"
     )
@@ -116,7 +146,39 @@ class AgentConfig(BaseModel):
     )
 
 
-_config: AgentConfig | None = None
+CONFIG_WATCH_INTERVAL = 2.0  # 检查配置文件是否被外部修改的间隔（秒）
+
+# 字段名 -> (旧值, 新值)
+ConfigDiff = dict[str, tuple[Any, Any]]
+ConfigListener = Callable[[AgentConfig, ConfigDiff], None]
+
+# AgentConfig 的字段分别属于 Core 配置的哪个部分
+_CORE_SECTIONS: dict[str, type[BaseModel]] = {
+    "function_config": FunctionConfig,
+    "llm": LLMConfig,
+}
+# 推送给 Core 时覆盖的字段：MCP 服务由 utils.mcp_pool 管理，不由 Core 启动
+_CORE_OVERRIDES: dict[str, dict[str, Any]] = {
+    "function_config": {"agent_mcp_client_enable": False},
+}
+
+
+def _core_section(section: str, config: AgentConfig) -> BaseModel:
+    model = _CORE_SECTIONS[section].model_validate(config, from_attributes=True)
+    if overrides := _CORE_OVERRIDES.get(section):
+        model = model.model_copy(update=overrides)
+    return model
+
+
+def diff_config(old: AgentConfig | None, new: AgentConfig) -> ConfigDiff:
+    """逐字段比较两份配置，old 为 None 时所有字段都视为变更"""
+    changes: ConfigDiff = {}
+    for name in type(new).model_fields:
+        before = getattr(old, name) if old is not None else None
+        after = getattr(new, name)
+        if old is None or before != after:
+            changes[name] = (before, after)
+    return changes
 
 
 # PLUGINS_DIR = CWD/"plugins"
@@ -126,42 +188,156 @@ def init_dir():
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def init_config():
-    global _config
-    init_dir()
-    if not CONFIG_PATH.exists():
-        _config = AgentConfig()
-        with open(CONFIG_PATH, "w", encoding="u8") as f:
-            f.write(tomli_w.dumps(_config.model_dump()))
-    if _config is None:
+class ConfigService:
+    """在内存中保存已校验的配置
+
+    仅在配置文件的 mtime 变化时重新读取；每次变更按字段比较，
+    只把受影响的部分推送给 Core，并通知订阅者。
+    """
+
+    _instance = None
+    _config: AgentConfig | None
+    _mtime_ns: int | None
+    _listeners: list[ConfigListener]
+    _lock: threading.RLock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._config = None
+            cls._mtime_ns = None
+            cls._listeners = []
+            cls._lock = threading.RLock()
+        return cls._instance
+
+    def _stat(self) -> int | None:
+        try:
+            return CONFIG_PATH.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _write(self, config: AgentConfig):
+        tmp = CONFIG_PATH.with_suffix(".toml.tmp")
+        with open(tmp, "w", encoding="u8") as f:
+            f.write(tomli_w.dumps(config.model_dump()))
+        tmp.replace(CONFIG_PATH)
+        self._mtime_ns = self._stat()
+
+    def _read(self) -> AgentConfig:
+        if (mtime := self._stat()) is None:
+            init_dir()
+            config = AgentConfig()
+            self._write(config)
+            return config
         with open(CONFIG_PATH, "rb") as f:
-            _config = AgentConfig.model_validate(tomli.load(f))
+            config = AgentConfig.model_validate(tomli.load(f))
+        self._mtime_ns = mtime
+        return config
+
+    def get(self) -> AgentConfig:
+        if self._config is None:
+            with self._lock:
+                if self._config is None:
+                    self._config = self._read()
+        return self._config
+
+    def subscribe(self, listener: ConfigListener) -> Callable[[], None]:
+        """订阅配置变更，返回取消订阅的函数"""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def apply(self):
+        """将完整配置推送给 Core（启动时调用）"""
+        config = self.get()
+        set_config(
+            AmritaConfig(
+                **{
+                    section: _core_section(section, config)
+                    for section in _CORE_SECTIONS
+                },
+                cookie=COOKIE_CONFIG,
+            )
+        )
+
+    def _commit(self, config: AgentConfig) -> ConfigDiff:
+        """替换内存中的配置，并把变更推送给 Core 与订阅者（需持有锁）"""
+        changes = diff_config(self._config, config)
+        self._config = config
+        if not changes:
+            return changes
+        try:
+            core = core_config()
+        except RuntimeError:
+            # Core 尚未初始化，直接推送完整配置
+            self.apply()
+        else:
+            updates = {
+                section: _core_section(section, config)
+                for section, model in _CORE_SECTIONS.items()
+                if changes.keys() & model.model_fields.keys()
+            }
+            if updates:
+                set_config(core.model_copy(update=updates))
+        logger.info(f"配置已更新: {', '.join(changes)}")
+        for listener in list(self._listeners):
+            self._notify(listener, config, changes)
+        return changes
+
+    @staticmethod
+    def _notify(listener: ConfigListener, config: AgentConfig, changes: ConfigDiff):
+        try:
+            listener(config, changes)
+        except Exception as e:
+            logger.opt(exception=e).error("配置订阅者处理变更失败")
+
+    def update(self, config: AgentConfig) -> ConfigDiff:
+        """保存新配置；没有字段变化时不写文件"""
+        with self._lock:
+            self.get()
+            if not diff_config(self._config, config):
+                return {}
+            self._write(config)
+            return self._commit(config)
+
+    def reload(self) -> ConfigDiff:
+        """无条件从文件重新读取"""
+        with self._lock:
+            return self._commit(self._read())
+
+    def check_file(self) -> ConfigDiff:
+        """配置文件的 mtime 变化时重新读取"""
+        with self._lock:
+            if self._config is None or self._stat() == self._mtime_ns:
+                return {}
+            try:
+                return self.reload()
+            except (OSError, ValueError) as e:
+                logger.warning(f"配置文件无效，保留当前配置: {e}")
+                self._mtime_ns = self._stat()
+                return {}
+
+    async def watch(self, interval: float = CONFIG_WATCH_INTERVAL):
+        """定期检查配置文件是否被外部修改"""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.check_file)
+
+
+def init_config():
+    ConfigService().get()
 
 
 def get_config() -> AgentConfig:
-    global _config
-    init_config()
-    assert _config is not None
-    return _config
+    return ConfigService().get()
 
 
 def reload_config():
-    global _config
-    _config = None
-    init_config()
+    ConfigService().reload()
 
 
 def apply_config():
-    config: AgentConfig = get_config()
-    func_conf = FunctionConfig.model_validate(config, from_attributes=True)
-    llm_conf = LLMConfig.model_validate(config, from_attributes=True)
-    core_conf = AmritaConfig(
-        function_config=func_conf, llm=llm_conf, cookie=COOKIE_CONFIG
-    )
-    set_config(core_conf)
+    ConfigService().apply()
+
 
 def update_config(config: AgentConfig):
-    with open(CONFIG_PATH, "w", encoding="u8") as f:
-        f.write(tomli_w.dumps(config.model_dump()))
-    reload_config()
-    apply_config()
\ No newline at end of file
+    ConfigService().update(config)
@@ -11,6 +11,13 @@ CONFIG_PATH = CONFIG_DIR / "config.toml"
 DATA_DIR = CWD / "data"
 PRESETS_DIR = DATA_DIR / "presets"
 MEMORY_SESSIONS_DIR = DATA_DIR / "memory"
+RESPONSE_CACHE_DIR = DATA_DIR / "cache" / "responses"
+MCP_TOOLS_CACHE_PATH = DATA_DIR / "cache" / "mcp_tools.json"
+TOOL_INDEX_PATH = DATA_DIR / "cache" / "tool_index.npz"
+MEMORY_INDEX_PATH = DATA_DIR / "cache" / "memory_index.npz"
+BLOBS_DIR = DATA_DIR / "blobs"
+ATTACHMENTS_DIR = DATA_DIR / "attachments"
+IMAGE_CACHE_DIR = DATA_DIR / "cache" / "images"
 
 COOKIE_CONFIG = CookieConfig(enable_cookie=False)
 
@@ -28,6 +35,15 @@ class ColorsEnum(str, Enum):
     divider = "#404040"
 
 
+class CodeColorsEnum(str, Enum):
+    keyword = "#c678dd"
+    string = "#98c379"
+    comment = "#7f848e"
+    number = "#d19a66"
+    function = "#61afef"
+    text = "#ffffff"
+
+
 class FontSizesEnum(int, Enum):
     heading = 24
     title = 18
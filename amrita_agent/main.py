@@ -1,23 +1,27 @@
 import asyncio
 
-import amrita_core
 import flet as ft
 
-from amrita_agent.utils.chat import (
-    DataManager,
-)
-
-from .config import apply_config
-from .app_view import AppView
 from .pages.loading import LoadingPage
+from .utils.startup import StartupProfiler
 
 
 def set_head(page: ft.Page, message: str):
     page.title = f"Amrita Agent - {message}" if message else "Amrita Agent"
-    amrita_core.logger.info(message)
     page.update()
 
 
+def _import_modules():
+    """导入 amrita_core 及依赖它的应用模块
+
+    amrita_core 的导入耗时较长，放到加载页绘制之后在线程中进行。
+    """
+    import amrita_core  # noqa: F401
+
+    from . import app_view, config  # noqa: F401
+    from .utils import chat  # noqa: F401
+
+
 async def main_async(page: ft.Page):
     global app
     page.title = "Amrita Agent"
@@ -29,20 +33,48 @@ async def main_async(page: ft.Page):
     page.title = f"{title} - Loading..."
     ld = LoadingPage()
     ld.apply_to_page(page)
-    await asyncio.sleep(1)
-    set_head(page, "正在初始化Core...")
-    amrita_core.init()
-    set_head(page, "正在初始化配置...")
-    apply_config()
-    set_head(page, "正在初始化Core服务...")
-    await amrita_core.load_amrita()
-    set_head(page, "正在初始化记忆与模型")
-    DataManager().loads()
+
+    def on_progress(message: str):
+        ld.set_progress(message)
+        set_head(page, message)
+
+    profiler = StartupProfiler(total=6, on_progress=on_progress)
+    await profiler.run("加载模块", _import_modules)
+
+    import amrita_core
+
+    from .app_view import AppView
+    from .config import ConfigService, apply_config, init_dir
+    from .utils.agent import install_adapter_layers
+    from .utils.chat import DataManager
+    from .utils.mcp_pool import MCPServerPool
+    from .utils.memory_index import MemoryIndex
+
+    await profiler.run("初始化目录", init_dir)
+    # 以下三个阶段互不依赖，在线程中并发执行
+    await asyncio.gather(
+        profiler.run("初始化Core", amrita_core.init),
+        profiler.run("初始化配置", apply_config),
+        profiler.run("加载记忆与模型", DataManager().loads),
+    )
+    # Core 服务（MCP 客户端等）依赖 Core 与配置
+    await profiler.run("初始化Core服务", amrita_core.load_amrita)
+    install_adapter_layers()
+    # MCP 服务在后台启动，不等待就绪
+    await MCPServerPool().start_from_config()
+    amrita_core.logger.info(profiler.format_report())
+    profiler.export()
     page.title = title
     page.clean()
     app = AppView(page)
     page.add(app)
     page.update()
+    # 首帧之后在空闲时间预热其余视图
+    page.run_task(app.warm_up)
+    # 配置文件被外部修改时自动重新加载
+    page.run_task(ConfigService().watch)
+    # 后台维护跨会话记忆索引
+    page.run_task(MemoryIndex().maintain)
 
 
 ft.app(main_async)
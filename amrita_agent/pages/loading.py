@@ -1,22 +1,28 @@
 import flet as ft
+
+
 class LoadingPage(ft.Container):
-    _process_text = ft.Text(
-                    "正在初始化",
-                    size=8,
-                    weight=ft.FontWeight.W_500,
-                )
     def __init__(self):
         super().__init__()
+        self._process_text = ft.Text(
+            "正在初始化",
+            size=8,
+            weight=ft.FontWeight.W_500,
+        )
         self.content = self.build_controls()
-        self.alignment=ft.alignment.center
-        self.expand=True
-    def apply_to_page(self,page:ft.Page):
-        self.page = page
-        page.clean(
+        self.alignment = ft.alignment.center
+        self.expand = True
 
-        )
+    def apply_to_page(self, page: ft.Page):
+        self.page = page
+        page.clean()
         page.add(self)
         page.update()
+
+    def set_progress(self, message: str):
+        """更新加载进度文本（由调用方负责刷新页面）"""
+        self._process_text.value = message
+
     def build_controls(self) -> ft.Column:
         return ft.Column(
             [
@@ -26,9 +32,8 @@ class LoadingPage(ft.Container):
                     size=16,
                     weight=ft.FontWeight.W_500,
                 ),
-                self._process_text
+                self._process_text,
             ],
             alignment=ft.MainAxisAlignment.CENTER,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         )
-        
\ No newline at end of file
@@ -0,0 +1,425 @@
+"""本地 HTTP / WebSocket API 服务
+
+    amrita-agent serve [--host 127.0.0.1] [--port 8765] [-w 4] [--max-pending 32]
+
+接口：
+- GET    /presets                    预设列表（不含 api_key）
+- GET    /sessions                   会话列表
+- POST   /sessions                   新建会话 {"name": 可选}
+- GET    /sessions/{sid}             会话详情（含消息）
+- PATCH  /sessions/{sid}             重命名 {"name": ...}
+- DELETE /sessions/{sid}             删除会话
+- POST   /sessions/{sid}/chat        发送消息 {"prompt": ..., "preset": 可选,
+                                     "images": 可选，base64 或 data URL 列表}；
+                                     请求头 Accept: text/event-stream 时以 SSE 流式返回
+- GET    /sessions/{sid}/ws          WebSocket，每条消息同上，返回 chunk/done/error 事件
+- GET    /metrics                    请求耗时、调度队列、响应缓存与连接复用统计
+- GET    /metrics/prometheus         指标注册表，Prometheus 文本格式
+- GET    /trace                      最近的追踪，Chrome trace / Perfetto JSON
+
+对话经 TurnScheduler 调度：同时进行的对话数受 --workers 限制，
+同一会话的对话按到达顺序串行执行，排队中的对话超过 --max-pending 时返回 503。流式输出时消费方读取过慢会暂停模型输出，
+超过 SLOW_CONSUMER_TIMEOUT 仍无法写出则中止本轮对话。本模块不导入 flet。
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import aclosing, asynccontextmanager, suppress
+from typing import Any
+
+import amrita_core
+from aiohttp import WSMsgType, web
+
+from .config import ConfigService
+from .utils.agent import AgentTurn, bootstrap, resolve_preset
+from .utils.chat import DataManager, Memory
+from .utils.connection_pool import ConnectionPool
+from .utils.images import ImagePipeline
+from .utils.mcp_pool import MCPServerPool
+from .utils.memory_index import MemoryIndex
+from .utils.metrics import MetricsRegistry
+from .utils.response_cache import ResponseCache
+from .utils.scheduler import Priority, TurnScheduler
+from .utils.tracing import Tracer
+
+SERVER_WORKERS = 4
+SERVER_MAX_PENDING = 32
+SLOW_CONSUMER_TIMEOUT = 30  # 单次写出等待消费方的最长时间（秒）
+METRICS_WINDOW = 512  # 每个路由保留最近多少次请求的耗时用于计算分位数
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """按路由统计请求次数、错误数与耗时分位数"""
+
+    def __init__(self):
+        self._count: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        self._durations: dict[str, deque[float]] = {}
+
+    def record(self, route: str, duration_ms: float, error: bool):
+        self._count[route] = self._count.get(route, 0) + 1
+        if error:
+            self._errors[route] = self._errors.get(route, 0) + 1
+        self._durations.setdefault(route, deque(maxlen=METRICS_WINDOW)).append(
+            duration_ms
+        )
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        result = {}
+        for route, durations in self._durations.items():
+            ordered = sorted(durations)
+            result[route] = {
+                "count": self._count[route],
+                "errors": self._errors.get(route, 0),
+                "avg_ms": sum(ordered) / len(ordered),
+                "p50_ms": ordered[int(len(ordered) * 0.5)],
+                "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                "max_ms": ordered[-1],
+            }
+        return result
+
+
+def _dump_session(memory: Memory, messages: bool = False) -> dict[str, Any]:
+    data: dict[str, Any] = {
+        "name": memory.name,
+        "session_id": memory.session_id,
+        "last_update": memory.last_update.isoformat(),
+        "message_count": len(memory.messages),
+    }
+    if messages:
+        data["messages"] = memory.model_dump(mode="json")["messages"]
+        data["abstract"] = memory.abstract
+    return data
+
+
+def _get_session(request: web.Request) -> Memory:
+    try:
+        return DataManager().get_memory_by_session_id(request.match_info["sid"])
+    except KeyError:
+        raise web.HTTPNotFound(text="session not found") from None
+
+
+async def _read_json(request: web.Request) -> dict[str, Any]:
+    if not request.can_read_body:
+        return {}
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="invalid json") from None
+    if not isinstance(data, dict):
+        raise web.HTTPBadRequest(text="json object expected")
+    return data
+
+
+async def _prepare_turn(memory: Memory, data: dict[str, Any]) -> AgentTurn:
+    prompt = data.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise web.HTTPBadRequest(text="`prompt` is required")
+    try:
+        preset = resolve_preset(data.get("preset"))
+    except (ValueError, IndexError) as e:
+        # 预设不存在时为 ValueError，没有任何预设时为 IndexError
+        raise web.HTTPBadRequest(text=f"preset unavailable: {e!r}") from None
+    images = data.get("images") or []
+    if not isinstance(images, list) or not all(isinstance(i, str) for i in images):
+        raise web.HTTPBadRequest(text="`images` must be a list of strings")
+    try:
+        contents = [
+            await ImagePipeline().ingest(
+                base64.b64decode(image.partition("base64,")[2] or image)
+            )
+            for image in images
+        ]
+    except (binascii.Error, ValueError) as e:
+        raise web.HTTPBadRequest(text=f"invalid image: {e}") from None
+    return AgentTurn(memory, prompt, preset, contents)
+
+
+async def _write_with_timeout(write: Awaitable[None]):
+    try:
+        await asyncio.wait_for(write, SLOW_CONSUMER_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ConnectionResetError("slow consumer") from None
+
+
+class ApiServer:
+    def __init__(self, workers: int, max_pending: int):
+        self.metrics = RequestMetrics()
+        self.max_pending = max_pending
+        self.rejected = 0
+        TurnScheduler().set_max_concurrency(workers)
+        self.app = web.Application(middlewares=[self._timing_middleware])
+        self.app.add_routes(
+            [
+                web.get("/presets", self.list_presets),
+                web.get("/sessions", self.list_sessions),
+                web.post("/sessions", self.create_session),
+                web.get("/sessions/{sid}", self.get_session),
+                web.patch("/sessions/{sid}", self.rename_session),
+                web.delete("/sessions/{sid}", self.delete_session),
+                web.post("/sessions/{sid}/chat", self.chat),
+                web.get("/sessions/{sid}/ws", self.chat_ws),
+                web.get("/metrics", self.get_metrics),
+                web.get("/metrics/prometheus", self.get_prometheus),
+                web.get("/trace", self.get_trace),
+            ]
+        )
+
+    @asynccontextmanager
+    async def _turn_slot(self, turn: AgentTurn) -> AsyncGenerator[None, None]:
+        """经调度器排队执行一轮对话，排队过多时直接拒绝"""
+        scheduler = TurnScheduler()
+        if scheduler.queue_depth >= self.max_pending:
+            self.rejected += 1
+            raise web.HTTPServiceUnavailable(
+                text="too many pending turns", headers={"Retry-After": "1"}
+            )
+        async with scheduler.slot(turn.memory.session_id, turn.preset, Priority.NORMAL):
+            yield
+
+    @web.middleware
+    async def _timing_middleware(
+        self,
+        request: web.Request,
+        handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    ) -> web.StreamResponse:
+        start = time.perf_counter()
+        route = request.match_info.route.resource
+        name = f"{request.method} {route.canonical if route else '<unmatched>'}"
+        error = True
+        try:
+            response = await handler(request)
+            error = response.status >= 500
+            return response
+        except web.HTTPException as e:
+            error = e.status >= 500
+            raise
+        finally:
+            self.metrics.record(name, (time.perf_counter() - start) * 1000, error)
+
+    async def list_presets(self, request: web.Request) -> web.Response:
+        presets = amrita_core.PresetManager().get_all_presets()
+        return web.json_response(
+            [
+                {
+                    "name": p.name,
+                    "model": p.model,
+                    "protocol": p.protocol,
+                    "base_url": p.base_url,
+                }
+                for p in presets
+            ]
+        )
+
+    async def list_sessions(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            [_dump_session(memory) for memory in DataManager().get_memories()]
+        )
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        data = await _read_json(request)
+        name = data.get("name")
+        dm = DataManager()
+        if name is not None:
+            if not isinstance(name, str) or not name.strip():
+                raise web.HTTPBadRequest(text="`name` must be a non-empty string")
+        try:
+            memory = dm.new_session(name)
+        except ValueError:
+            raise web.HTTPConflict(text="session name already exists") from None
+        await asyncio.to_thread(memory.save)
+        return web.json_response(_dump_session(memory), status=201)
+
+    async def get_session(self, request: web.Request) -> web.Response:
+        return web.json_response(_dump_session(_get_session(request), messages=True))
+
+    async def rename_session(self, request: web.Request) -> web.Response:
+        name = (await _read_json(request)).get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise web.HTTPBadRequest(text="`name` is required")
+        # 会话可能同时被其他请求重命名或删除，直接按 ID 操作
+        try:
+            memory = await asyncio.to_thread(
+                DataManager().rename_session, request.match_info["sid"], name
+            )
+        except KeyError:
+            raise web.HTTPNotFound(text="session not found") from None
+        except ValueError:
+            raise web.HTTPConflict(text="session name already exists") from None
+        return web.json_response(_dump_session(memory))
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        try:
+            await asyncio.to_thread(DataManager().destroy, request.match_info["sid"])
+        except KeyError:
+            raise web.HTTPNotFound(text="session not found") from None
+        return web.Response(status=204)
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        memory = _get_session(request)
+        turn = await _prepare_turn(memory, await _read_json(request))
+        start = time.perf_counter()
+        if "text/event-stream" not in request.headers.get("Accept", ""):
+            async with self._turn_slot(turn):
+                response = await turn.run()
+            return web.json_response(
+                {
+                    "response": response,
+                    "elapsed_ms": (time.perf_counter() - start) * 1000,
+                }
+            )
+
+        async with self._turn_slot(turn):
+            stream = web.StreamResponse(
+                headers={
+                    "Content-Type": "text/event-stream",
+                    "Cache-Control": "no-cache",
+                }
+            )
+            await stream.prepare(request)
+
+            async def send(event: str, data: dict[str, Any]) -> bool:
+                """发送一个事件，客户端已断开或消费过慢时返回 False"""
+                payload = json.dumps(data, ensure_ascii=False)
+                try:
+                    await _write_with_timeout(
+                        stream.write(f"event: {event}\ndata: {payload}\n\n".encode())
+                    )
+                except ConnectionResetError:
+                    return False
+                return True
+
+            # 只有写入失败才视为客户端断开，对话中的同类异常作为错误事件返回
+            try:
+                async with aclosing(turn.stream()) as chunks:
+                    async for chunk in chunks:
+                        if not await send("chunk", {"text": chunk}):
+                            return stream
+            except Exception as e:
+                sent = await send("error", {"error": f"{type(e).__name__}: {e}"})
+            else:
+                sent = await send(
+                    "done",
+                    {
+                        "response": turn.response,
+                        "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    },
+                )
+            if sent:
+                with suppress(ConnectionResetError):
+                    await stream.write_eof()
+        return stream
+
+    async def chat_ws(self, request: web.Request) -> web.WebSocketResponse:
+        memory = _get_session(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = json.loads(message.data)
+                if not isinstance(data, dict):
+                    raise web.HTTPBadRequest(text="json object expected")
+                turn = await _prepare_turn(memory, data)
+                start = time.perf_counter()
+                async with (
+                    self._turn_slot(turn),
+                    aclosing(turn.stream()) as chunks,
+                ):
+                    async for chunk in chunks:
+                        await _write_with_timeout(
+                            ws.send_json({"type": "chunk", "text": chunk})
+                        )
+                await ws.send_json(
+                    {
+                        "type": "done",
+                        "response": turn.response,
+                        "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    }
+                )
+            except ConnectionResetError:
+                break
+            except web.HTTPException as e:
+                await ws.send_json(
+                    {"type": "error", "status": e.status, "error": e.text}
+                )
+            except Exception as e:
+                await ws.send_json(
+                    {"type": "error", "error": f"{type(e).__name__}: {e}"}
+                )
+        return ws
+
+    async def get_metrics(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "requests": self.metrics.snapshot(),
+                "turns": {**TurnScheduler().stats(), "rejected": self.rejected},
+                "response_cache": ResponseCache().stats(),
+                "connections": ConnectionPool().stats(),
+                "mcp": MCPServerPool().stats(),
+            }
+        )
+
+    async def get_prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=MetricsRegistry().render_prometheus().encode("utf-8"),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        )
+
+    async def get_trace(self, request: web.Request) -> web.Response:
+        return web.json_response(Tracer().to_chrome_trace())
+
+
+async def serve(host: str, port: int, workers: int, max_pending: int):
+    await bootstrap()
+    pool = ConnectionPool()
+    await asyncio.gather(
+        *(
+            pool.prewarm(preset)
+            for preset in amrita_core.PresetManager().get_all_presets()
+        )
+    )
+    server = ApiServer(workers, max_pending)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    amrita_core.logger.info(f"API 服务已启动: http://{host}:{port}")
+    config_watcher = asyncio.create_task(ConfigService().watch())
+    memory_indexer = asyncio.create_task(MemoryIndex().maintain())
+    try:
+        await asyncio.Event().wait()
+    finally:
+        config_watcher.cancel()
+        memory_indexer.cancel()
+        await runner.cleanup()
+        await pool.aclose()
+        await MCPServerPool().aclose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="amrita-agent serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "-w", "--workers", type=int, default=SERVER_WORKERS, help="最大并发对话数"
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=SERVER_MAX_PENDING,
+        help="最多等待中的对话数，超出后返回 503",
+    )
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,37 @@
+"""以 mixin 包装已注册的模型适配器
+
+各功能为每个已注册的适配器创建 mixin 在前的子类，并在适配器表中替换原适配器。
+子类不经 AdapterManager.register_adapter 注册：后者每次覆盖都会输出警告，
+逐层包装时会产生大量警告。安装顺序见 utils.agent.install_adapter_layers。
+"""
+
+from amrita_core import logger
+from amrita_core.protocol import AdapterManager, ModelAdapter
+
+
+def replace_adapter(old: type[ModelAdapter], new: type[ModelAdapter]):
+    """将 old 占用的所有协议改为由 new 处理，不输出覆盖警告"""
+    adapters = AdapterManager().get_adapters()
+    for protocol, adapter in adapters.items():
+        if adapter is old:
+            adapters[protocol] = new
+
+
+def wrap_adapters(mixin: type, prefix: str, marker: str):
+    """为所有已注册的适配器混入 mixin
+
+    marker 为 mixin 上值为 True 的类属性，已带有该属性的适配器会被跳过，
+    因此可重复调用；之后再注册的适配器不会被包装。
+    """
+    for adapter in set(AdapterManager().get_adapters().values()):
+        if getattr(adapter, marker, False):
+            continue
+        # 类名只保留最内层适配器的名字，避免逐层叠加前缀
+        origin = getattr(adapter, "__origin_adapter__", adapter)
+        wrapped = type(
+            f"{prefix}{origin.__name__}",
+            (mixin, adapter),
+            {"__abstract__": True, "__origin_adapter__": origin},
+        )
+        replace_adapter(adapter, wrapped)
+        logger.debug(f"已为适配器 {origin.__name__} 混入 {mixin.__name__}")
@@ -0,0 +1,275 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Sequence
+from contextlib import suppress
+from datetime import datetime
+
+import amrita_core
+from amrita_core import ChatObject, ModelPreset, PresetManager
+from amrita_core.chatmanager import RESPONSE_TYPE
+from amrita_core.protocol import MessageContent, MessageWithMetadata
+from amrita_core.types import ImageContent, TextContent
+
+from ..config import apply_config, get_config
+from .attachments import ingest_text, is_large_input
+from .chat import DataManager, Memory
+from .connection_pool import ConnectionPool, install_connection_pool
+from .images import install_image_payloads
+from .mcp_pool import MCPServerPool
+from .memory_index import MemoryIndex, install_memory_recall, recalled_memory
+from .metrics import (
+    LLM_ERRORS,
+    LLM_TOKENS_PER_SECOND,
+    LLM_TTFT_SECONDS,
+    LLM_TURN_SECONDS,
+    LLM_TURNS,
+    TOOL_CALL_SECONDS,
+    TOOL_CALLS,
+)
+from .mock_adapter import MockAdapter  # noqa: F401  注册 mock 协议
+from .response_cache import install_response_cache
+from .tool_executor import ToolScope, install_tool_executor
+from .tool_index import install_tool_selection
+from .tracing import Tracer, span
+
+STREAM_BUFFER = 64  # 消费方未取走的片段超过此数量时暂停模型输出
+
+
+def install_adapter_layers():
+    """替换并包装已注册的模型适配器，需在 Core 服务加载之后调用
+
+    后安装的一层包在外面，请求依次经过：
+    记忆召回 → 工具挑选 → 工具预取 → 响应缓存 → 图片解析 → 连接池适配器。
+    - 图片解析在缓存之内：缓存键使用图片引用，命中时无需编码图片
+    - 工具预取在缓存之外：缓存命中的工具调用同样被预取
+    - 记忆召回在最外层：缓存键包含召回的内容
+    """
+    install_connection_pool()
+    install_image_payloads()
+    install_response_cache()
+    install_tool_executor()
+    install_tool_selection()
+    install_memory_recall()
+
+
+async def bootstrap():
+    """无界面模式的初始化：Core、配置与会话并发加载，随后加载 Core 服务"""
+    await asyncio.gather(
+        asyncio.to_thread(amrita_core.init),
+        asyncio.to_thread(apply_config),
+        asyncio.to_thread(DataManager().loads),
+    )
+    await amrita_core.load_amrita()
+    install_adapter_layers()
+    # MCP 服务在后台启动，不等待就绪
+    await MCPServerPool().start_from_config()
+
+
+def resolve_preset(name: str | None = None) -> ModelPreset:
+    """按名称获取预设，未指定时使用默认预设"""
+    if name:
+        return PresetManager().get_preset(name)
+    return PresetManager().get_default_preset()
+
+
+async def prewarm_preset(name: str | None = None):
+    """预热预设端点的连接，预设不存在时忽略"""
+    try:
+        preset = resolve_preset(name)
+    except (ValueError, IndexError):
+        return
+    await ConnectionPool().prewarm(preset)
+
+
+def resolve_session(name_or_session_id: str | None = None) -> Memory:
+    """按名称或会话 ID 获取会话，不存在时以该名称新建"""
+    dm = DataManager()
+    if name_or_session_id is None:
+        return dm.new_session()
+    with suppress(KeyError):
+        return dm.get_memory_by_name(name_or_session_id)
+    with suppress(KeyError):
+        return dm.get_memory_by_session_id(name_or_session_id)
+    try:
+        return dm.new_session(name_or_session_id)
+    except ValueError:  # 同名会话刚被其他线程创建
+        return dm.get_memory_by_name(name_or_session_id)
+
+
+class _ToolTracker:
+    """根据流中的工具调用通知统计工具调用次数与耗时
+
+    内核在调用开始时必定发出通知，完成通知则取决于配置，
+    因此未收到完成通知的调用以之后的第一条输出作为结束。
+    """
+
+    def __init__(self):
+        self._running: dict[str, tuple[str, int]] = {}
+
+    def _finish(self, tool_id: str, status: str):
+        if (call := self._running.pop(tool_id, None)) is not None:
+            name, start = call
+            end = time.perf_counter_ns()
+            TOOL_CALL_SECONDS.observe((end - start) / 1e9, tool=name)
+            TOOL_CALLS.inc(tool=name, status=status)
+            Tracer().record(f"tool.{name}", start, end, status=status)
+
+    def flush(self):
+        for tool_id in list(self._running):
+            self._finish(tool_id, "ok")
+
+    def feed(self, item: RESPONSE_TYPE):
+        meta = item.get_metadata() if isinstance(item, MessageWithMetadata) else {}
+        if meta.get("type") != "function_call":
+            self.flush()
+        elif meta.get("is_done"):
+            self._finish(meta.get("tool_id", ""), "error" if meta.get("err") else "ok")
+        else:
+            self.flush()
+            self._running[meta.get("tool_id", "")] = (
+                meta.get("function_name", "unknown"),
+                time.perf_counter_ns(),
+            )
+
+
+class AgentTurn:
+    """一轮对话：将用户输入交给 ChatObject，流式产出回复并在结束后保存会话
+
+    同一会话的多轮对话必须串行执行，由调用方保证。
+    """
+
+    def __init__(
+        self,
+        memory: Memory,
+        user_input: str,
+        preset: ModelPreset,
+        images: Sequence[ImageContent] = (),
+    ):
+        self.memory = memory
+        self.user_input = user_input
+        self.preset = preset
+        # 由 ImagePipeline.ingest 得到，消息中只保存图片引用
+        self.images = list(images)
+        self.response = ""
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        with span(
+            "agent.turn", preset=self.preset.name, session=self.memory.session_id
+        ):
+            async for delta in self._stream():
+                yield delta
+
+    async def _stream(self) -> AsyncGenerator[str, None]:
+        # 使用回调而不是 get_response_generator：后者在对话出错时不会结束。
+        # credits 限制未被消费的片段数，消费方变慢时回调会等待，从而暂停模型输出
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        credits = asyncio.Semaphore(STREAM_BUFFER)
+        tools = _ToolTracker()
+        preset = self.preset.name
+        started = time.perf_counter_ns()
+        first: int | None = None
+        status = "cancelled"
+
+        async def emit(text: str):
+            await credits.acquire()
+            queue.put_nowait(text)
+
+        async def on_chunk(item: RESPONSE_TYPE):
+            tools.feed(item)
+            if tool_scope.is_batched(item):
+                return  # 并行执行的工具调用按批次报告进度
+            content = item.get_content() if isinstance(item, MessageContent) else item
+            await emit(str(content))
+
+        config = get_config()
+        notify = config.agent_tool_call_notice == "notify"
+        tool_scope = ToolScope(self.memory.session_id, emit if notify else None)
+        if is_large_input(self.user_input):
+            # 大段输入保存为附件，消息中只保留摘录
+            attachment = await asyncio.to_thread(ingest_text, self.user_input)
+            self.user_input = attachment.to_prompt()
+        recalled = ""
+        if config.memory_retrieval_enable:
+            with span("memory.recall"):
+                recalled = await asyncio.to_thread(
+                    MemoryIndex().recall, self.user_input, self.memory.session_id
+                )
+        # 会话以副本的形式更新，以最新版本作为上下文
+        with suppress(KeyError):
+            self.memory = DataManager().get_memory_by_session_id(self.memory.session_id)
+        with tool_scope.activate(), recalled_memory(recalled):
+            chat = ChatObject(
+                train={"role": "system", "content": ""},
+                user_input=(
+                    [TextContent(text=self.user_input), *self.images]
+                    if self.images
+                    else self.user_input
+                ),
+                # 在副本上对话，失败的轮次不会在会话中留下用户消息
+                context=self.memory.model_copy(deep=True),
+                session_id=self.memory.session_id,
+                callback=on_chunk,
+                preset=self.preset,
+            ).begin()
+
+        async def drive():
+            try:
+                await chat
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.create_task(drive())
+        text = ""
+        try:
+            while (chunk := await queue.get()) is not None:
+                credits.release()
+                # 适配器在流式模式下每次产出截至目前的完整文本，这里只产出增量
+                if chunk.startswith(text):
+                    delta, text = chunk[len(text) :], chunk
+                else:
+                    delta, text = chunk, text + chunk
+                if delta:
+                    if first is None:
+                        first = time.perf_counter_ns()
+                        LLM_TTFT_SECONDS.observe((first - started) / 1e9, preset=preset)
+                        Tracer().record("llm.ttft", started, first)
+                    yield delta
+            try:
+                await task  # 抛出对话过程中的异常
+            except Exception as e:
+                status = "error"
+                LLM_ERRORS.inc(preset=preset, error=type(e).__name__)
+                raise
+            status = "ok"
+        finally:
+            if not task.done():
+                chat.terminate()
+            tool_scope.close()
+            tools.flush()
+            finished = time.perf_counter_ns()
+            LLM_TURNS.inc(preset=preset, status=status)
+            LLM_TURN_SECONDS.observe((finished - started) / 1e9, preset=preset)
+            usage = chat.response.usage if status == "ok" else None
+            if usage and first is not None and finished > first:
+                LLM_TOKENS_PER_SECOND.observe(
+                    usage.completion_tokens * 1e9 / (finished - first), preset=preset
+                )
+        self.response = chat.response.content if chat.response.content else text
+        dm = DataManager()
+        try:
+            # 对话期间会话可能已被重命名，只更新消息相关的字段
+            self.memory = dm.update(
+                self.memory.session_id,
+                messages=chat.data.messages,
+                abstract=chat.data.abstract,
+                last_update=datetime.utcnow(),
+            )
+        except KeyError:
+            return  # 对话期间会话已被删除
+        await asyncio.to_thread(dm.save, self.memory.session_id)
+        MemoryIndex().schedule()
+
+    async def run(self) -> str:
+        async for _ in self.stream():
+            pass
+        return self.response
@@ -0,0 +1,186 @@
+"""大段输入的分块保存
+
+超过 LARGE_INPUT_CHARS 的输入（例如粘贴的日志）不直接作为消息内容：
+全文按 ATTACHMENT_CHUNK_CHARS 分段写入 ATTACHMENTS_DIR，边写边估算 token 数，
+消息中只保留开头与结尾的摘录以及附件信息，摘录大小受会话 token 窗口限制。
+智能体模式下模型可调用 `read_attachment` 按段读取全文。
+
+附件目录以全文的 SHA-256 命名，相同内容只保存一份：
+
+    ATTACHMENTS_DIR/<sha256>/meta.json
+    ATTACHMENTS_DIR/<sha256>/00000.txt ...
+"""
+
+import hashlib
+import json
+import re
+import shutil
+import uuid
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from amrita_core.tokenizer import Tokenizer
+from amrita_core.tools.manager import simple_tool
+
+from ..config import get_config
+from ..constants import ATTACHMENTS_DIR
+from .tracing import traced
+
+LARGE_INPUT_CHARS = 20_000  # 超过此字符数的输入作为附件保存
+ATTACHMENT_CHUNK_CHARS = 4_000  # 每段的字符数，也是 read_attachment 单次返回的上限
+ATTACHMENT_EXCERPT_TOKENS = 2_000  # 消息中摘录的 token 上限
+PREVIEW_LINES = 12  # 界面中折叠显示的行数
+PREVIEW_CHARS = 1_500
+
+_ID_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def is_large_input(text: str) -> bool:
+    return len(text) > LARGE_INPUT_CHARS
+
+
+def preview(text: str) -> str:
+    """折叠显示用的开头几行"""
+    head = "\n".join(text[:PREVIEW_CHARS].splitlines()[:PREVIEW_LINES])
+    return head.rstrip() + "\n…"
+
+
+@dataclass(frozen=True)
+class Attachment:
+    id: str
+    name: str
+    chars: int
+    tokens: int  # 按当前 tokens_count_mode 估算
+    chunks: int
+    head: str
+    tail: str
+
+    @property
+    def path(self) -> Path:
+        return ATTACHMENTS_DIR / self.id
+
+    def read_chunk(self, index: int) -> str:
+        return (self.path / f"{index:05d}.txt").read_text("utf-8")
+
+    def to_prompt(self) -> str:
+        """写入消息的附件说明与摘录"""
+        omitted = self.chars - len(self.head) - len(self.tail)
+        body = (
+            f"{self.head}\n"
+            f"…… [omitted {omitted} characters; call read_attachment with "
+            f'attachment_id="{self.id}" and chunk 0-{self.chunks - 1} to read them] ……\n'
+            f"{self.tail}"
+            if omitted > 0
+            else self.head
+        )
+        return (
+            f'<attachment id="{self.id}" name="{self.name}" chars="{self.chars}" '
+            + f'tokens="{self.tokens}" chunks="{self.chunks}">\n'
+            + body
+            + "\n</attachment>"
+        )
+
+    @classmethod
+    def load(cls, attachment_id: str) -> "Attachment":
+        if not _ID_RE.fullmatch(attachment_id):
+            raise ValueError(f"无效的附件 ID: {attachment_id}")
+        path = ATTACHMENTS_DIR / attachment_id / "meta.json"
+        return cls(**json.loads(path.read_text("utf-8")))
+
+
+def _excerpt_chars(chars: int, tokens: int) -> int:
+    """摘录的字符数：按全文的平均每 token 字符数换算 token 预算"""
+    budget = min(ATTACHMENT_EXCERPT_TOKENS, get_config().session_tokens_windows // 4)
+    return int(budget * chars / max(tokens, 1))
+
+
+def _split(text: str) -> Iterator[str]:
+    for start in range(0, len(text), ATTACHMENT_CHUNK_CHARS):
+        yield text[start : start + ATTACHMENT_CHUNK_CHARS]
+
+
+def _read_blocks(path: Path) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while block := f.read(ATTACHMENT_CHUNK_CHARS):
+            yield block
+
+
+@traced("attachment.ingest")
+def ingest_chunks(chunks: Iterable[str], name: str) -> Attachment:
+    """逐段写入附件并估算 token 数，只在内存中保留开头与结尾"""
+    # 不经过 hybrid_token_count 的缓存，避免大段文本占满缓存
+    tokenizer = Tokenizer(mode=get_config().tokens_count_mode)
+    digest = hashlib.sha256()
+    ATTACHMENTS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = ATTACHMENTS_DIR / f".{uuid.uuid4().hex}.tmp"
+    tmp.mkdir()
+    head: list[str] = []
+    tail: deque[str] = deque(maxlen=2)
+    chars = tokens = count = 0
+    try:
+        for chunk in chunks:
+            (tmp / f"{count:05d}.txt").write_text(chunk, "utf-8")
+            digest.update(chunk.encode("utf-8"))
+            chars += len(chunk)
+            tokens += tokenizer.count_tokens(text=chunk)
+            if count < 2:
+                head.append(chunk)
+            tail.append(chunk)
+            count += 1
+        excerpt = _excerpt_chars(chars, tokens)
+        if chars <= excerpt and count <= 2:
+            head_text, tail_text = "".join(tail), ""
+        else:
+            head_text = "".join(head)[: excerpt * 2 // 3]
+            tail_text = "".join(tail)[-(excerpt // 3) :]
+        attachment = Attachment(
+            id=digest.hexdigest(),
+            name=name,
+            chars=chars,
+            tokens=tokens,
+            chunks=count,
+            head=head_text,
+            tail=tail_text,
+        )
+        (tmp / "meta.json").write_text(
+            json.dumps(asdict(attachment), ensure_ascii=False), "utf-8"
+        )
+        if attachment.path.exists():
+            shutil.rmtree(tmp)  # 相同内容已保存过
+        else:
+            tmp.rename(attachment.path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return attachment
+
+
+def ingest_text(text: str, name: str = "paste.txt") -> Attachment:
+    return ingest_chunks(_split(text), name)
+
+
+def ingest_file(path: Path) -> Attachment:
+    """按块读取文本文件，不一次读入整个文件"""
+    return ingest_chunks(_read_blocks(path), path.name)
+
+
+@simple_tool
+def read_attachment(attachment_id: str, chunk: int) -> str:
+    """Read one chunk of a large attachment that was truncated in the conversation.
+
+    Args:
+        attachment_id (str): The id attribute of the <attachment> tag.
+        chunk (int): Zero-based chunk index, within the chunks attribute of the tag.
+
+    Returns:
+        str: The text of the chunk.
+    """
+    try:
+        attachment = Attachment.load(attachment_id)
+    except (OSError, ValueError, TypeError):
+        return f"Attachment {attachment_id} not found"
+    if not 0 <= chunk < attachment.chunks:
+        return f"Chunk out of range, valid chunks are 0-{attachment.chunks - 1}"
+    return attachment.read_chunk(chunk)
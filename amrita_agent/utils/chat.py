@@ -1,6 +1,10 @@
 import json
-from collections.abc import Generator, Sequence
+import threading
+from collections.abc import Generator, Mapping, Sequence
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 from uuid import uuid4
 
@@ -9,11 +13,25 @@ from amrita_core import (
     MemoryModel,
     ModelPreset,
     PresetManager,
+    logger,
 )
+from amrita_core.types import CONTENT_LIST_TYPE_ITEM  # noqa: F401
 from typing_extensions import Self
 
 from amrita_agent.constants import MEMORY_SESSIONS_DIR, PRESETS_DIR
 
+from .metrics import SESSION_LOAD_SECONDS, SESSION_SAVE_SECONDS, SESSIONS
+from .tracing import span, traced
+
+_save_locks: dict[str, threading.RLock] = {}
+_save_locks_guard = threading.Lock()
+
+
+def _save_lock(session_id: str) -> threading.RLock:
+    """同一会话的写入共用一把锁"""
+    with _save_locks_guard:
+        return _save_locks.setdefault(session_id, threading.RLock())
+
 
 class Memory(MemoryModel):
     name: str
@@ -21,13 +39,22 @@ class Memory(MemoryModel):
     last_update: datetime
 
     def save(self):
-        with open(
-            MEMORY_SESSIONS_DIR / f"{self.session_id}.json", "w", encoding="u8"
-        ) as f:
-            json.dump(self.model_dump(), f)
+        # 先写临时文件再替换，避免写入中断留下损坏的会话文件；
+        # 同一会话的写入串行执行，临时文件名按线程区分
+        path = MEMORY_SESSIONS_DIR / f"{self.session_id}.json"
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with (
+            _save_lock(self.session_id),
+            span("storage.save", session=self.session_id),
+            SESSION_SAVE_SECONDS.time(),
+        ):
+            with open(tmp, "w", encoding="u8") as f:
+                json.dump(self.model_dump(mode="json"), f)
+            tmp.replace(path)
 
     def destroy(self):
-        (MEMORY_SESSIONS_DIR / f"{self.session_id}.json").unlink(True)
+        with _save_lock(self.session_id):
+            (MEMORY_SESSIONS_DIR / f"{self.session_id}.json").unlink(True)
 
     @classmethod
     def load(cls, session_id: str):
@@ -39,84 +66,240 @@ class Memory(MemoryModel):
     @classmethod
     def loading(cls) -> Generator[Self, Any, None]:
         for file in MEMORY_SESSIONS_DIR.glob("*.json"):
-            with open(file, encoding="u8") as f:
-                yield cls.model_validate(json.load(f))
+            if (memory := cls._read(file)) is not None:
+                yield memory
+
+    @classmethod
+    def _read(cls, file: Path) -> Self | None:
+        try:
+            with (
+                span("storage.read", file=file.name),
+                SESSION_LOAD_SECONDS.time(),
+                open(file, encoding="u8") as f,
+            ):
+                return cls.model_validate(json.load(f))
+        except (ValueError, OSError) as e:
+            logger.warning(f"跳过无法读取的会话文件 {file.name}: {e}")
+            return None
+
+
+# MemoryModel.messages 使用了在其之后才定义的 CONTENT_LIST_TYPE_ITEM
+Memory.model_rebuild()
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """某一时刻的会话索引，只读
+
+    DataManager 的写操作在锁内复制并修改索引后发布新的快照，已取得的快照不会
+    再变化，读取方无需加锁，也不会看到改了一半的索引。Memory 对象同样不会被原地
+    修改，更新会话时发布的是修改后的副本。
+    """
+
+    name2sessionid: Mapping[str, str]
+    sessionid2name: Mapping[str, str]
+    sessionid2memory: Mapping[str, Memory]
+
+    @classmethod
+    def build(
+        cls,
+        name2sessionid: dict[str, str],
+        sessionid2name: dict[str, str],
+        sessionid2memory: dict[str, Memory],
+    ) -> Self:
+        return cls(
+            MappingProxyType(name2sessionid),
+            MappingProxyType(sessionid2name),
+            MappingProxyType(sessionid2memory),
+        )
+
+    def memories(self) -> list[Memory]:
+        """按最后更新时间倒序返回所有会话"""
+        return sorted(
+            self.sessionid2memory.values(), key=lambda x: x.last_update, reverse=True
+        )
 
 
 class DataManager:
     _instance = None
-    _name2sessionid: dict[str, str]
-    _sessionid2name: dict[str, str]
-    _sessionid2memory: dict[str, Memory]
+    _snapshot: SessionSnapshot
     _name2presets: dict[str, ModelPreset]
+    _lock: threading.Lock  # 串行化写操作，读操作只取快照
 
     def __new__(cls) -> Self:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._name2sessionid = {}
-            cls._sessionid2memory = {}
-            cls._sessionid2name = {}
+            cls._snapshot = SessionSnapshot.build({}, {}, {})
             cls._name2presets = {}
+            cls._lock = threading.Lock()
         return cls._instance
 
+    def snapshot(self) -> SessionSnapshot:
+        return self._snapshot
+
+    def _publish(
+        self,
+        name2sessionid: dict[str, str],
+        sessionid2name: dict[str, str],
+        sessionid2memory: dict[str, Memory],
+    ):
+        """发布新的快照，只在持有 _lock 时调用"""
+        self._snapshot = SessionSnapshot.build(
+            name2sessionid, sessionid2name, sessionid2memory
+        )
+        SESSIONS.set(len(sessionid2memory))
+
+    def _copy(self) -> tuple[dict[str, str], dict[str, str], dict[str, Memory]]:
+        snapshot = self._snapshot
+        return (
+            dict(snapshot.name2sessionid),
+            dict(snapshot.sessionid2name),
+            dict(snapshot.sessionid2memory),
+        )
+
+    @traced("storage.loads")
     def loads(self):
-        for data in Memory.loading():
+        loaded = list(Memory.loading())
+        for data in loaded:
             data.save()
-            session_id = data.session_id
-            self._name2sessionid[data.name] = session_id
-            self._sessionid2name[session_id] = data.name
-            self._sessionid2memory[session_id] = data
+        with self._lock:
+            name2sessionid, sessionid2name, sessionid2memory = self._copy()
+            for data in loaded:
+                session_id = data.session_id
+                name2sessionid[data.name] = session_id
+                sessionid2name[session_id] = data.name
+                sessionid2memory[session_id] = data
+            self._publish(name2sessionid, sessionid2name, sessionid2memory)
         for file in PRESETS_DIR.glob("*.toml"):
             data = ModelPreset.model_validate(tomli.loads(file.read_text("utf-8")))
             PresetManager().add_preset(data)
-            self._name2presets[data.name] = data
+            with self._lock:
+                self._name2presets = {**self._name2presets, data.name: data}
 
     def get_memory_by_name(self, name: str) -> Memory:
-        return self._sessionid2memory[self._name2sessionid[name]]
+        snapshot = self._snapshot
+        return snapshot.sessionid2memory[snapshot.name2sessionid[name]]
 
     def get_memory_by_name_contains(self, name: str) -> Sequence[Memory]:
+        snapshot = self._snapshot
         return [
-            self._sessionid2memory[v]
-            for k, v in self._name2sessionid.items()
+            snapshot.sessionid2memory[v]
+            for k, v in snapshot.name2sessionid.items()
             if name.strip().lower() in k.lower().strip()
         ]
 
     def get_memory_by_session_id(self, sid: str) -> Memory:
-        return self._sessionid2memory[sid]
+        return self._snapshot.sessionid2memory[sid]
 
     def get_session_id(self, name: str) -> str:
-        return self._name2sessionid[name]
+        return self._snapshot.name2sessionid[name]
 
     def get_name(self, sid: str) -> str:
-        return self._sessionid2name[sid]
+        return self._snapshot.sessionid2name[sid]
 
-    def new_session(self, name: str | None = None):
-        name = name or f"新的对话{len(self._sessionid2memory) + 1!s}"
-        session_id = uuid4().hex
-        self._sessionid2name[session_id] = name
-        self._name2sessionid[name] = session_id
+    def new_session(self, name: str | None = None) -> Memory:
+        """新建会话，名称已存在时抛出 ValueError；未指定名称时自动取不重复的名称"""
+        with self._lock:
+            name2sessionid, sessionid2name, sessionid2memory = self._copy()
+            if name is None:
+                index = len(sessionid2memory) + 1
+                while (name := f"新的对话{index!s}") in name2sessionid:
+                    index += 1
+            elif name in name2sessionid:
+                raise ValueError(f"Session name `{name}` already exists")
+            session_id = uuid4().hex
+            memory = Memory(
+                name=name, session_id=session_id, last_update=datetime.utcnow()
+            )
+            name2sessionid[name] = session_id
+            sessionid2name[session_id] = name
+            sessionid2memory[session_id] = memory
+            self._publish(name2sessionid, sessionid2name, sessionid2memory)
+        return memory
 
-    def init_session(self, name: str, session_id: str):
-        self._sessionid2memory[session_id] = Memory(
-            name=name, session_id=session_id, last_update=datetime.utcnow()
-        )
+    def init_session(self, name: str, session_id: str) -> Memory:
+        memory = Memory(name=name, session_id=session_id, last_update=datetime.utcnow())
+        with self._lock:
+            name2sessionid, sessionid2name, sessionid2memory = self._copy()
+            if (old := sessionid2name.get(session_id)) is not None:
+                name2sessionid.pop(old, None)
+            name2sessionid[name] = session_id
+            sessionid2name[session_id] = name
+            sessionid2memory[session_id] = memory
+            self._publish(name2sessionid, sessionid2name, sessionid2memory)
+        return memory
+
+    def get_memories(self) -> list[Memory]:
+        """按最后更新时间倒序返回所有会话"""
+        return self._snapshot.memories()
+
+    def update(self, session_id: str, **changes: Any) -> Memory:
+        """发布修改了部分字段的会话副本并返回，会话不存在时抛出 KeyError
+
+        不修改名称，重命名使用 rename。
+        """
+        with self._lock:
+            name2sessionid, sessionid2name, sessionid2memory = self._copy()
+            memory = sessionid2memory[session_id].model_copy(update=changes)
+            sessionid2memory[session_id] = memory
+            self._publish(name2sessionid, sessionid2name, sessionid2memory)
+        return memory
+
+    def save(self, session_id: str):
+        """保存会话的最新版本，会话不存在时抛出 KeyError
+
+        在写锁内读取快照，并发保存时最后写入文件的总是最新的版本。
+        """
+        with _save_lock(session_id):
+            self.get_memory_by_session_id(session_id).save()
+
+    @traced("storage.rename")
+    def rename(self, old: str, new: str) -> Memory:
+        """按名称重命名会话并返回新的版本
+
+        old 不存在时抛出 KeyError，new 已被占用时抛出 ValueError。
+        """
+        with self._lock:
+            session_id = self._snapshot.name2sessionid[old]
+            memory = self._rename(session_id, new)
+        self.save(session_id)
+        return memory
+
+    @traced("storage.rename")
+    def rename_session(self, session_id: str, new: str) -> Memory:
+        """按会话 ID 重命名会话并返回新的版本
+
+        会话不存在时抛出 KeyError，new 已被占用时抛出 ValueError。
+        """
+        with self._lock:
+            memory = self._rename(session_id, new)
+        self.save(session_id)
+        return memory
 
-    def rename(self, old: str, new: str):
-        session_id = self.get_session_id(old)
-        self._sessionid2name.pop(session_id)
-        memory = self._sessionid2memory.pop(session_id)
-        self._name2sessionid.pop(old)
-        self.init_session(new, session_id)
-        self._sessionid2memory[session_id] = memory
+    def _rename(self, session_id: str, new: str) -> Memory:
+        """发布重命名后的快照，只在持有 _lock 时调用"""
+        name2sessionid, sessionid2name, sessionid2memory = self._copy()
+        name2sessionid.pop(sessionid2name[session_id])
+        if new in name2sessionid:
+            raise ValueError(f"Session name `{new}` already exists")
+        name2sessionid[new] = session_id
+        sessionid2name[session_id] = new
+        memory = sessionid2memory[session_id].model_copy(update={"name": new})
+        sessionid2memory[session_id] = memory
+        self._publish(name2sessionid, sessionid2name, sessionid2memory)
+        return memory
 
+    @traced("storage.destroy")
     def destroy(self, name_or_session_id: str):
-        if session_id := self._name2sessionid.get(name_or_session_id):
-            self._name2sessionid.pop(name_or_session_id)
-        elif name_or_session_id in self._sessionid2name:
-            session_id = name_or_session_id
-            name = self._sessionid2name.pop(name_or_session_id)
-            self._name2sessionid.pop(name)
-        else:
-            raise KeyError(f"No session found from `{name_or_session_id}`")
-        memory = self._sessionid2memory[session_id]
+        with self._lock:
+            name2sessionid, sessionid2name, sessionid2memory = self._copy()
+            if session_id := name2sessionid.pop(name_or_session_id, None):
+                sessionid2name.pop(session_id, None)
+            elif (name := sessionid2name.pop(name_or_session_id, None)) is not None:
+                session_id = name_or_session_id
+                name2sessionid.pop(name, None)
+            else:
+                raise KeyError(f"No session found from `{name_or_session_id}`")
+            memory = sessionid2memory.pop(session_id)
+            self._publish(name2sessionid, sessionid2name, sessionid2memory)
         memory.destroy()
@@ -0,0 +1,292 @@
+"""按端点共享的 HTTP 长连接池
+
+内置的 OpenAI 适配器每次调用都会新建一个 AsyncOpenAI 客户端且从不关闭，
+每一轮对话、每一步工具调用都要重新建立 TCP/TLS 连接，泄漏的客户端被回收时
+还可能影响后续连接。install_connection_pool 用 PooledOpenAIAdapter 替换该适配器：
+同一端点（scheme://host:port）的所有会话共享一个 httpx.AsyncClient，
+并统计新建连接数与复用次数。
+
+预设的 `extra.prewarm` 为真时才预热其端点：预热请求不携带 API Key，
+任意响应都会留下一条可复用的连接。
+"""
+
+import asyncio
+import functools
+import time
+import types
+from collections.abc import AsyncGenerator, Callable, Iterable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import asdict, dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import openai
+from amrita_core import logger
+from amrita_core.builtins.adapter import OpenAIAdapter
+from amrita_core.protocol import COMPLETION_RETURNING, AdapterManager
+from amrita_core.tools.models import ToolChoice
+from amrita_core.types import ModelPreset, ToolCall, UniResponse
+from typing_extensions import Self
+
+from .adapters import replace_adapter
+from .tracing import Tracer, span
+
+POOL_MAX_CONNECTIONS = 32  # 每个端点的最大连接数
+POOL_MAX_KEEPALIVE = 8  # 每个端点保留的空闲连接数
+POOL_KEEPALIVE_EXPIRY = 120.0  # 空闲连接保留时长（秒）
+PREWARM_TIMEOUT = 5.0
+DRAIN_LIMIT = 64 * 1024  # 释放未读完的响应时最多再读取的字节数
+DRAIN_TIMEOUT = 2.0
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    connections: int = 0  # 新建的 TCP 连接
+    tls_handshakes: int = 0
+    prewarms: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+
+class _TracingTransport(httpx.AsyncHTTPTransport):
+    """通过 httpcore 的 trace 扩展统计新建连接"""
+
+    def __init__(self, stats: EndpointStats, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.requests += 1
+        request.extensions["trace"] = self._trace
+        return await super().handle_async_request(request)
+
+    async def _trace(self, event: str, info: dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            self.stats.connections += 1
+        elif event == "connection.start_tls.complete":
+            self.stats.tls_handshakes += 1
+
+
+async def _release(response: httpx.Response):
+    """读完剩余的少量数据后关闭响应，连接才能回到池中"""
+
+    async def drain():
+        size = 0
+        # 响应已开始读取，只能直接读取底层的字节流
+        async for chunk in response.stream:  # type: ignore[union-attr]
+            size += len(chunk)
+            if size > DRAIN_LIMIT:
+                return
+
+    with suppress(Exception):
+        await asyncio.wait_for(drain(), DRAIN_TIMEOUT)
+    await response.aclose()
+
+
+def endpoint_of(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme}://{parts.hostname}:{port}"
+
+
+class ConnectionPool:
+    """按端点缓存 httpx 客户端，按 (地址, api_key, 超时, 重试) 缓存 OpenAI 客户端"""
+
+    _instance = None
+    _http_clients: dict[str, httpx.AsyncClient]
+    _openai_clients: dict[tuple[str, str, float, int], openai.AsyncOpenAI]
+    _stats: dict[str, EndpointStats]
+    _warming: dict[str, asyncio.Task[None]]
+    _responses: dict[asyncio.Task[Any], list[httpx.Response]]
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._http_clients = {}
+            cls._openai_clients = {}
+            cls._stats = {}
+            cls._warming = {}
+            cls._responses = {}
+        return cls._instance
+
+    def http_client(self, base_url: str) -> httpx.AsyncClient:
+        endpoint = endpoint_of(base_url)
+        if (client := self._http_clients.get(endpoint)) is None or client.is_closed:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            limits = httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            )
+            client = httpx.AsyncClient(
+                transport=_TracingTransport(stats, limits=limits),
+                limits=limits,
+                # 超时由 OpenAI 客户端逐请求设置
+                timeout=None,
+                follow_redirects=True,
+                event_hooks={"response": [self._on_response]},
+            )
+            self._http_clients[endpoint] = client
+        return client
+
+    async def _on_response(self, response: httpx.Response):
+        if (responses := self._responses.get(asyncio.current_task())) is not None:
+            responses.append(response)
+
+    @asynccontextmanager
+    async def releasing(self) -> AsyncGenerator[None, None]:
+        """退出时释放当前任务在此期间收到、但没有读完的响应
+
+        内置适配器读到末尾的用量片段就不再读取流式响应，也不关闭它，
+        连接要等响应被回收时才会关闭，无法复用。
+        """
+        task = asyncio.current_task()
+        assert task is not None
+        responses = self._responses.setdefault(task, [])
+        try:
+            yield
+        finally:
+            if self._responses.get(task) is responses:
+                del self._responses[task]
+            for response in responses:
+                if not response.is_closed:
+                    await _release(response)
+
+    def openai_client(
+        self, base_url: str, api_key: str, timeout: float, max_retries: int
+    ) -> openai.AsyncOpenAI:
+        key = (base_url, api_key, timeout, max_retries)
+        client = self._openai_clients.get(key)
+        http_client = self.http_client(base_url)
+        if client is None or client._client is not http_client:
+            client = openai.AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client,
+            )
+            self._openai_clients[key] = client
+        return client
+
+    async def _prewarm(self, preset: ModelPreset):
+        endpoint = endpoint_of(preset.base_url)
+        try:
+            # 不携带 API Key；任意响应都会留下一条可复用的连接，状态码无关紧要
+            await self.http_client(preset.base_url).get(
+                preset.base_url.rstrip("/") + "/models", timeout=PREWARM_TIMEOUT
+            )
+        except httpx.HTTPError as e:
+            logger.debug(f"预热连接 {endpoint} 失败: {e!r}")
+        else:
+            self._stats[endpoint].prewarms += 1
+            logger.debug(f"已预热连接 {endpoint}")
+
+    async def prewarm(self, preset: ModelPreset):
+        """为开启了 extra.prewarm 的预设建立连接；同一端点的并发预热只执行一次"""
+        if not (preset.extra or {}).get("prewarm"):
+            return
+        adapter = AdapterManager().get_adapters().get(preset.protocol)
+        if adapter is None or not issubclass(adapter, PooledOpenAIAdapter):
+            return
+        endpoint = endpoint_of(preset.base_url)
+        if (task := self._warming.get(endpoint)) is None:
+            task = asyncio.create_task(self._prewarm(preset))
+            self._warming[endpoint] = task
+            task.add_done_callback(lambda _: self._warming.pop(endpoint, None))
+        await asyncio.shield(task)
+
+    async def aclose(self):
+        clients = list(self._http_clients.values())
+        self._http_clients.clear()
+        self._openai_clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            endpoint: {**asdict(stats), "reused": stats.reused}
+            for endpoint, stats in self._stats.items()
+        }
+
+
+class _PooledOpenAIModule:
+    """内置适配器所用 openai 模块的替身，只把新建客户端换成连接池中的客户端"""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(openai, name)
+
+    @staticmethod
+    def AsyncOpenAI(
+        *,
+        base_url: str,
+        api_key: str,
+        timeout: float,
+        max_retries: int = openai.DEFAULT_MAX_RETRIES,
+    ) -> openai.AsyncOpenAI:
+        return ConnectionPool().openai_client(base_url, api_key, timeout, max_retries)
+
+
+def _with_pooled_client(method: Callable[..., Any]) -> Callable[..., Any]:
+    """复制内置适配器的方法，其中的 openai 换成 _PooledOpenAIModule，其余逻辑不变
+
+    内置适配器没有创建客户端的扩展点，参数与重试等行为因此始终与内置适配器一致。
+    """
+    pooled = types.FunctionType(
+        method.__code__,
+        {**method.__globals__, "openai": _PooledOpenAIModule()},
+        method.__name__,
+        method.__defaults__,
+        method.__closure__,
+    )
+    pooled.__kwdefaults__ = method.__kwdefaults__
+    return functools.update_wrapper(pooled, method)
+
+
+_call_api = _with_pooled_client(OpenAIAdapter.call_api)
+_call_tools = _with_pooled_client(OpenAIAdapter.call_tools)
+
+
+class PooledOpenAIAdapter(OpenAIAdapter):
+    """使用共享连接池的 OpenAI 协议适配器，除客户端外与内置适配器相同"""
+
+    # 不在定义时注册，由 install_connection_pool 替换内置适配器
+    __abstract__ = True
+
+    async def call_api(
+        self, messages: Iterable
+    ) -> AsyncGenerator[COMPLETION_RETURNING, None]:
+        # 不能跨 yield 持有 span，请求耗时记录到首个输出为止
+        start = time.perf_counter_ns()
+        recorded = False
+        async with ConnectionPool().releasing():
+            async for item in _call_api(self, messages):
+                if not recorded:
+                    recorded = True
+                    Tracer().record(
+                        "llm.request",
+                        start,
+                        model=self.preset.model,
+                        stream=self.preset.config.stream,
+                    )
+                yield item
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: ToolChoice | None = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        with span("llm.tools_request", model=self.preset.model):
+            return await _call_tools(self, messages, tools, tool_choice)
+
+
+def install_connection_pool():
+    """以 PooledOpenAIAdapter 替换内置的 OpenAI 适配器，可重复调用
+
+    不在导入时注册：覆盖警告会在日志配置之前输出（batch 模式下会混入标准输出）。
+    """
+    replace_adapter(OpenAIAdapter, PooledOpenAIAdapter)
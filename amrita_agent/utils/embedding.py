@@ -0,0 +1,87 @@
+"""本地文本向量化
+
+默认使用哈希向量化：分词后将每个词元哈希到固定维度并带符号累加，
+最后做 L2 归一化，向量间的点积即余弦相似度。不需要模型文件，
+适合工具检索、历史消息检索等对语义要求不高的场景。
+
+可通过 `set_embedder()` 换成其他实现（例如本地句向量模型），
+只需提供 `name`、`dim` 与 `embed()`；索引会按 `name` 判断是否需要重建。
+"""
+
+import re
+import zlib
+from typing import Protocol
+
+import numpy as np
+
+HASHING_DIM = 1024
+
+# 英文与数字按词切分（同时拆开 snake_case 与 camelCase），中文取单字与相邻双字
+_WORD_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+|[\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens: list[str] = []
+    for word in _WORD_RE.findall(text):
+        if "\u4e00" <= word[0] <= "\u9fff":
+            tokens.extend(word)
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """返回形状为 (len(texts), dim) 的 float32 矩阵，每行已归一化"""
+        ...
+
+
+class HashingEmbedder:
+    """带符号的特征哈希，哈希使用 crc32 以保证跨进程稳定"""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows: list[int] = []
+        cols: list[int] = []
+        signs: list[float] = []
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (rows, cols), signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+_embedder: Embedder = HashingEmbedder()
+
+
+def get_embedder() -> Embedder:
+    return _embedder
+
+
+def set_embedder(embedder: Embedder):
+    global _embedder
+    _embedder = embedder
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """余弦相似度最高的 k 行，按相似度降序返回 (行号, 相似度)"""
+    if not len(matrix) or k <= 0:
+        return []
+    scores = matrix @ query
+    k = min(k, len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in ordered]
@@ -0,0 +1,251 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from typing_extensions import Self
+
+TokenSpan = tuple[str, str]
+"""(文本, 记号类型)"""
+
+HIGHLIGHT_WORKERS = 2
+HIGHLIGHT_CACHE_SIZE = 256
+
+_C_LIKE_KEYWORDS = (
+    "break case catch class const continue default delete do else enum export "
+    "extends false finally for function if import in instanceof let new null "
+    "return static struct super switch this throw true try typeof var void while "
+    "yield async await interface implements public private protected package "
+    "fn let mut impl trait pub use mod match loop where self Self go func defer "
+    "chan select type map range nil int long short char float double bool "
+    "unsigned signed auto namespace template typename virtual override"
+)
+
+_KEYWORDS: dict[str, str] = {
+    "python": (
+        "False None True and as assert async await break class continue def del "
+        "elif else except finally for from global if import in is lambda "
+        "nonlocal not or pass raise return try while with yield match case"
+    ),
+    "bash": (
+        "if then else elif fi case esac for while until do done in function "
+        "return local export readonly declare unset echo exit source"
+    ),
+    "sql": (
+        "select from where and or not insert into values update set delete "
+        "create table drop alter index join left right inner outer on group "
+        "by order having limit offset as distinct union all null is like in "
+        "SELECT FROM WHERE AND OR NOT INSERT INTO VALUES UPDATE SET DELETE "
+        "CREATE TABLE DROP ALTER INDEX JOIN LEFT RIGHT INNER OUTER ON GROUP "
+        "BY ORDER HAVING LIMIT OFFSET AS DISTINCT UNION ALL NULL IS LIKE IN"
+    ),
+    "json": "true false null",
+    "toml": "true false",
+    "yaml": "true false null yes no on off",
+    "c": _C_LIKE_KEYWORDS,
+}
+
+_ALIASES: dict[str, str] = {
+    "py": "python",
+    "python3": "python",
+    "sh": "bash",
+    "shell": "bash",
+    "zsh": "bash",
+    "console": "bash",
+    "yml": "yaml",
+    "js": "c",
+    "javascript": "c",
+    "ts": "c",
+    "typescript": "c",
+    "jsx": "c",
+    "tsx": "c",
+    "java": "c",
+    "kotlin": "c",
+    "go": "c",
+    "golang": "c",
+    "rust": "c",
+    "rs": "c",
+    "cpp": "c",
+    "cxx": "c",
+    "h": "c",
+    "hpp": "c",
+    "csharp": "c",
+    "cs": "c",
+    "swift": "c",
+    "dart": "c",
+}
+
+_HASH_COMMENT = {"python", "bash", "toml", "yaml"}
+_SLASH_COMMENT = {"c", "json"}
+_DASH_COMMENT = {"sql"}
+
+
+def _build_pattern(language: str) -> re.Pattern[str]:
+    """为语言构建一个带命名分组的记号正则"""
+    parts: list[str] = []
+    if language in _HASH_COMMENT:
+        parts.append(r"(?P<comment>#[^\n]*)")
+    if language in _SLASH_COMMENT:
+        parts.append(r"(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)")
+    if language in _DASH_COMMENT:
+        parts.append(r"(?P<comment>--[^\n]*)")
+    if language == "python":
+        parts.append(
+            r'(?P<string>[rRbBfFuU]{0,2}(?:"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'))'
+        )
+    parts.append(
+        r"(?P<string>\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'"
+        + (r"|`(?:\\.|[^`\\])*`" if language in ("c", "bash") else "")
+        + ")"
+    )
+    parts.append(
+        r"(?P<number>\b(?:0[xXbBoO][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\b)"
+    )
+    keywords = _KEYWORDS.get(language)
+    if keywords:
+        words = "|".join(sorted(set(keywords.split()), key=len, reverse=True))
+        parts.append(rf"(?P<keyword>\b(?:{words})\b)")
+    parts.append(r"(?P<function>\b[A-Za-z_][A-Za-z0-9_]*(?=\())")
+    return re.compile("|".join(_dedupe_groups(parts)))
+
+
+def _dedupe_groups(parts: list[str]) -> list[str]:
+    """re 不允许重复的分组名，为重复的分组加上序号后缀"""
+    seen: dict[str, int] = {}
+    result: list[str] = []
+    for part in parts:
+        name = part[4 : part.index(">")]
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            part = part.replace(f"(?P<{name}>", f"(?P<{name}__{count}>", 1)
+        result.append(part)
+    return result
+
+
+_PATTERNS: dict[str, re.Pattern[str]] = {}
+_PATTERNS_LOCK = threading.Lock()
+
+
+def normalize_language(language: str) -> str:
+    language = (language or "").strip().lower()
+    return _ALIASES.get(language, language)
+
+
+def _get_pattern(language: str) -> re.Pattern[str]:
+    with _PATTERNS_LOCK:
+        if language not in _PATTERNS:
+            _PATTERNS[language] = _build_pattern(language)
+        return _PATTERNS[language]
+
+
+def tokenize(code: str, language: str = "") -> list[TokenSpan]:
+    """将代码切分为 (文本, 记号类型) 片段，相邻的同类片段会被合并"""
+    pattern = _get_pattern(normalize_language(language))
+    spans: list[TokenSpan] = []
+    position = 0
+
+    def push(text: str, kind: str):
+        if not text:
+            return
+        if spans and spans[-1][1] == kind:
+            spans[-1] = (spans[-1][0] + text, kind)
+        else:
+            spans.append((text, kind))
+
+    for match in pattern.finditer(code):
+        start, end = match.span()
+        if start == end:
+            continue
+        push(code[position:start], "text")
+        kind = (match.lastgroup or "text").split("__", 1)[0]
+        push(match.group(), kind)
+        position = end
+    push(code[position:], "text")
+    return spans
+
+
+class CodeHighlighter:
+    """在工作线程池中对代码分词，并按 (语言, 内容哈希) 缓存分词结果"""
+
+    _instance = None
+    enabled: bool  # 关闭时不再高亮，代码保持纯文本
+    _executor: ThreadPoolExecutor
+    _cache: OrderedDict[tuple[str, str], list[TokenSpan]]
+    _pending: dict[tuple[str, str], Future[list[TokenSpan]]]
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls.enabled = True
+            cls._executor = ThreadPoolExecutor(
+                max_workers=HIGHLIGHT_WORKERS, thread_name_prefix="highlight"
+            )
+            cls._cache = OrderedDict()
+            cls._pending = {}
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    @staticmethod
+    def cache_key(language: str, code: str) -> tuple[str, str]:
+        digest = hashlib.sha1(code.encode("utf-8", "surrogatepass")).hexdigest()
+        return normalize_language(language), digest
+
+    def get_cached(self, language: str, code: str) -> list[TokenSpan] | None:
+        key = self.cache_key(language, code)
+        with self._lock:
+            spans = self._cache.get(key)
+            if spans is not None:
+                self._cache.move_to_end(key)
+            return spans
+
+    def submit(
+        self,
+        language: str,
+        code: str,
+        callback: Callable[[list[TokenSpan]], None],
+    ) -> Future[list[TokenSpan]] | None:
+        """提交高亮任务
+
+        命中缓存时同步调用 callback 并返回 None；否则在工作线程中分词，
+        完成后在工作线程中调用 callback。相同内容的并发请求会合并为同一个任务。
+        关闭时不调用 callback 并返回 None。
+        """
+        if not self.enabled:
+            return None
+        key = self.cache_key(language, code)
+        with self._lock:
+            spans = self._cache.get(key)
+            if spans is not None:
+                self._cache.move_to_end(key)
+            else:
+                future = self._pending.get(key)
+                if future is None:
+                    future = self._executor.submit(self._run, key, code)
+                    self._pending[key] = future
+        if spans is not None:
+            callback(spans)
+            return None
+
+        def done(fut: Future[list[TokenSpan]]):
+            if not fut.cancelled() and fut.exception() is None:
+                callback(fut.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def _run(self, key: tuple[str, str], code: str) -> list[TokenSpan]:
+        try:
+            spans = tokenize(code, key[0])
+            with self._lock:
+                self._cache[key] = spans
+                self._cache.move_to_end(key)
+                while len(self._cache) > HIGHLIGHT_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            return spans
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
@@ -0,0 +1,275 @@
+"""图片的存储与预处理
+
+- 图片按内容的 SHA-256 保存在 BLOBS_DIR 中，同一张图片只存一份；
+  会话中的消息只记录 `blob:<sha256>` 引用，而不是 base64 数据
+- 请求模型前，适配器把引用替换为按预设缩放、重新编码后的 data URL。
+  目标尺寸取预设 extra 中的 `image_max_side`（默认 IMAGE_MAX_SIDE），
+  JPEG 质量取 `image_quality`；预设未开启 multimodal 时图片替换为占位文本
+- 缩放后的图片与界面缩略图缓存在 IMAGE_CACHE_DIR，编码后的 data URL
+  另在内存中按 LRU 缓存；缩放与编码在线程池中执行
+
+缩放依赖可选的 Pillow（`pip install amrita-agent[images]`），
+未安装时按原图发送，缩略图也使用原图。
+"""
+
+import asyncio
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+from amrita_core.protocol import (
+    COMPLETION_RETURNING,
+    ModelAdapter,
+    get_image_format,
+)
+from amrita_core.types import (
+    ImageContent,
+    ImageUrl,
+    ModelPreset,
+    TextContent,
+    ToolCall,
+    UniResponse,
+)
+from typing_extensions import Self
+
+from ..constants import BLOBS_DIR, IMAGE_CACHE_DIR
+from .adapters import wrap_adapters
+from .metrics import IMAGE_ENCODE_SECONDS
+from .tracing import propagate
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖
+    Image = ImageOps = None
+
+BLOB_SCHEME = "blob:"
+IMAGE_MAX_SIDE = 1024  # 发送给模型的图片最长边（像素）
+IMAGE_QUALITY = 85
+IMAGE_THUMBNAIL_SIDE = 256
+IMAGE_WORKERS = 2  # 缩放与编码的线程数
+IMAGE_PAYLOAD_CACHE_BYTES = 64 * 1024 * 1024  # 内存中 data URL 缓存的总大小
+IMAGE_PLACEHOLDER = "[图片]"
+
+
+def blob_url(digest: str) -> str:
+    return f"{BLOB_SCHEME}{digest}"
+
+
+def parse_blob_url(url: str) -> str | None:
+    return url[len(BLOB_SCHEME) :] if url.startswith(BLOB_SCHEME) else None
+
+
+def image_content(digest: str) -> ImageContent:
+    """引用已保存图片的消息内容"""
+    return ImageContent(image_url=ImageUrl(url=blob_url(digest)))
+
+
+class BlobStore:
+    """按内容寻址的文件存储"""
+
+    _instance = None
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def path(self, digest: str) -> Path:
+        return BLOBS_DIR / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        """保存数据并返回其 SHA-256，已存在时不重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+
+def _resize(data: bytes, max_side: int, quality: int) -> bytes:
+    """缩放到最长边不超过 max_side；有透明通道时保存为 PNG，否则为 JPEG"""
+    assert Image is not None
+    assert ImageOps is not None
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        resized = max(image.size) > max_side
+        if resized:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        if has_alpha:
+            image.save(out, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    encoded = out.getvalue()
+    # 未缩放且重新编码后更大时保留原图
+    return encoded if resized or len(encoded) < len(data) else data
+
+
+class ImagePipeline:
+    """图片的保存、缩放与编码"""
+
+    _instance = None
+    _threads: ThreadPoolExecutor
+    _payloads: OrderedDict[tuple[str, int, int], str]
+    _payload_bytes: int
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._threads = ThreadPoolExecutor(
+                IMAGE_WORKERS, thread_name_prefix="amrita-image"
+            )
+            cls._payloads = OrderedDict()
+            cls._payload_bytes = 0
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._threads, propagate(func), *args
+        )
+
+    def _store(self, data: bytes) -> str:
+        if get_image_format(data) is None:
+            raise ValueError("不支持的图片格式")
+        return BlobStore().put(data)
+
+    async def store(self, data: bytes | Path) -> str:
+        """保存图片，返回其 SHA-256"""
+        if isinstance(data, Path):
+            data = await self._run(data.read_bytes)
+        return await self._run(self._store, data)
+
+    async def ingest(self, data: bytes | Path) -> ImageContent:
+        """保存图片，返回引用它的消息内容"""
+        return image_content(await self.store(data))
+
+    def _variant(self, digest: str, max_side: int, quality: int) -> Path:
+        """缩放后的图片文件，已缓存时直接返回"""
+        if Image is None:
+            return BlobStore().path(digest)
+        path = IMAGE_CACHE_DIR / f"{digest}-{max_side}-{quality}"
+        if not path.exists():
+            with IMAGE_ENCODE_SECONDS.time():
+                data = _resize(BlobStore().get(digest), max_side, quality)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        return path
+
+    def _encode(self, digest: str, max_side: int, quality: int) -> str:
+        data = self._variant(digest, max_side, quality).read_bytes()
+        image_format = get_image_format(data) or "jpeg"
+        if image_format == "jpg":
+            image_format = "jpeg"  # filetype 返回扩展名，MIME 类型为 image/jpeg
+        return f"data:image/{image_format};base64,{base64.b64encode(data).decode()}"
+
+    def _remember(self, key: tuple[str, int, int], payload: str):
+        with self._lock:
+            if key in self._payloads:
+                return
+            self._payloads[key] = payload
+            self._payload_bytes += len(payload)
+            while self._payload_bytes > IMAGE_PAYLOAD_CACHE_BYTES and self._payloads:
+                _, evicted = self._payloads.popitem(last=False)
+                self._payload_bytes -= len(evicted)
+
+    async def payload(
+        self, digest: str, max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_QUALITY
+    ) -> str:
+        """发送给模型的 data URL"""
+        key = (digest, max_side, quality)
+        with self._lock:
+            if (cached := self._payloads.get(key)) is not None:
+                self._payloads.move_to_end(key)
+                return cached
+        payload = await self._run(self._encode, digest, max_side, quality)
+        self._remember(key, payload)
+        return payload
+
+    async def thumbnail(self, digest: str) -> Path:
+        """界面显示用的缩略图文件"""
+        return await self._run(
+            self._variant, digest, IMAGE_THUMBNAIL_SIDE, IMAGE_QUALITY
+        )
+
+    async def resolve(self, messages: Iterable[Any], preset: ModelPreset) -> list[Any]:
+        """把消息中的图片引用替换为按预设处理后的 data URL"""
+        messages = list(messages)
+        extra = preset.extra or {}
+        max_side = int(extra.get("image_max_side", IMAGE_MAX_SIDE))
+        quality = int(extra.get("image_quality", IMAGE_QUALITY))
+        multimodal = preset.config.multimodal
+
+        async def convert(part: Any) -> Any:
+            data = part if isinstance(part, dict) else part.model_dump()
+            if data.get("type") != "image_url":
+                return part
+            if not multimodal:
+                return TextContent(text=IMAGE_PLACEHOLDER)
+            if (digest := parse_blob_url(data["image_url"]["url"])) is None:
+                return part
+            url = await self.payload(digest, max_side, quality)
+            return ImageContent(image_url=ImageUrl(url=url))
+
+        for i, message in enumerate(messages):
+            content = (
+                message.get("content")
+                if isinstance(message, dict)
+                else getattr(message, "content", None)
+            )
+            if not isinstance(content, list):
+                continue
+            parts = await asyncio.gather(*(convert(part) for part in content))
+            if all(a is b for a, b in zip(parts, content)):
+                continue
+            if isinstance(message, dict):
+                messages[i] = {**message, "content": parts}
+            else:
+                messages[i] = message.model_copy(update={"content": parts})
+        return messages
+
+
+class _ImagePayloadMixin(ModelAdapter):
+    """请求模型前解析图片引用，由 install_image_payloads 动态混入"""
+
+    __abstract__ = True
+    __image_payloads__ = True
+
+    async def call_api(
+        self, messages: Iterable
+    ) -> AsyncGenerator[COMPLETION_RETURNING, None]:
+        messages = await ImagePipeline().resolve(messages, self.preset)
+        async for item in super().call_api(messages):
+            yield item
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: Any = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        messages = await ImagePipeline().resolve(messages, self.preset)
+        return await super().call_tools(messages, tools, tool_choice)
+
+
+def install_image_payloads():
+    """为所有已注册的适配器加上图片引用解析，可重复调用"""
+    wrap_adapters(_ImagePayloadMixin, "Imaging", "__image_payloads__")
@@ -0,0 +1,768 @@
+"""单遍 Markdown 渲染器
+
+直接扫描 Markdown 文本，按块生成与 UI 无关的控件描述（ControlSpec），
+不再经过 Markdown → HTML → HTMLParser 的两次分词。块级与行内规则遵循
+python-markdown（tables、fenced_code、nl2br、sane_lists 扩展）的行为，
+以便与 `HTMLSpecParser` 的输出保持一致；行首的块级 HTML 与 python-markdown
+一样整块原样保留。
+"""
+
+import html
+import re
+from collections.abc import Collection
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+TAB_LENGTH = 4
+
+
+@dataclass(frozen=True)
+class TextSpec:
+    text: str
+    bold: bool = False
+
+
+@dataclass(frozen=True)
+class CodeSpec:
+    code: str
+    language: str = ""
+
+
+@dataclass(frozen=True)
+class ListSpec:
+    items: tuple[tuple[int, str], ...]
+    """(嵌套深度, 文本)"""
+    ordered: bool = False
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    header: tuple[str, ...]
+    rows: tuple[tuple[str, ...], ...]
+
+
+ControlSpec = TextSpec | CodeSpec | ListSpec | TableSpec
+
+# 块级规则
+_FENCE_RE = re.compile(
+    r"^(?P<fence>~{3,}|`{3,})[ ]*"
+    r"(?:\{[^\n]*\}|\.?(?P<lang>[\w#.+-]*)[ ]*)?"
+    r"(?:hl_lines=(?P<quot>\"|')(?:.*?)(?P=quot)[ ]*)?$"
+)
+_HASH_HEADER_RE = re.compile(
+    r"(?:^|\n)(?P<level>#{1,6})(?P<header>(?:\\.|[^\\])*?)#*(?:\n|$)"
+)
+_SETEXT_HEADER_RE = re.compile(r"^.*?\n[=-]+[ ]*(\n|$)")
+_HR_RE = re.compile(
+    r"^[ ]{0,3}(?=(?P<atomicgroup>(-+[ ]{0,2}){3,}|(_+[ ]{0,2}){3,}|(\*+[ ]{0,2}){3,}))"
+    r"(?P=atomicgroup)[ ]*$",
+    re.MULTILINE,
+)
+_OL_RE = re.compile(r"^[ ]{0,3}\d+\.[ ]+(.*)")
+_UL_RE = re.compile(r"^[ ]{0,3}[*+-][ ]+(.*)")
+_OL_CHILD_RE = re.compile(r"^[ ]{0,3}((\d+\.))[ ]+(.*)")
+_UL_CHILD_RE = re.compile(r"^[ ]{0,3}(([*+-]))[ ]+(.*)")
+_INDENT_RE = re.compile(r"^[ ]{4,7}((\d+\.)|[*+-])[ ]+.*")
+_QUOTE_RE = re.compile(r"(^|\n)[ ]{0,3}>[ ]?(.*)")
+_QUOTE_CLEAN_RE = re.compile(r"^[ ]{0,3}>[ ]?(.*)")
+_TABLE_END_BORDER_RE = re.compile(r"(?<!\\)(?:\\\\)*\|$")
+_TABLE_CODE_PIPES_RE = re.compile(r"(?:(\\\\)|(\\`+)|(`+)|(\\\|)|(\|))")
+_HTML_BLOCK_RE = re.compile(r"^[ ]{0,3}<([a-zA-Z][a-zA-Z0-9]*)(?=[\s/>]|$)")
+# python-markdown 的块级标签，出现在行首时整块原样保留
+_BLOCK_LEVEL_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "body",
+    "canvas",
+    "center",
+    "colgroup",
+    "dd",
+    "details",
+    "div",
+    "dl",
+    "dt",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "group",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hgroup",
+    "hr",
+    "html",
+    "iframe",
+    "legend",
+    "li",
+    "main",
+    "map",
+    "math",
+    "menu",
+    "nav",
+    "noscript",
+    "object",
+    "ol",
+    "option",
+    "output",
+    "p",
+    "pre",
+    "progress",
+    "script",
+    "section",
+    "style",
+    "summary",
+    "table",
+    "tbody",
+    "td",
+    "textarea",
+    "tfoot",
+    "th",
+    "thead",
+    "tr",
+    "ul",
+    "video",
+}
+_VOID_TAGS = {"hr"}
+_REFERENCE_DEF_RE = re.compile(
+    r"^[ ]{0,3}\[([^\[\]]*)\]:[ ]*\n?[ ]*([^\s]+)[ ]*(?:\n[ ]*)?"
+    r"(([\"'])(.*)\4[ ]*|\((.*)\)[ ]*)?$",
+    re.MULTILINE,
+)
+
+# 行内规则，与 python-markdown 一样以 DOTALL 编译，可跨行匹配
+_BACKTICK_RE = re.compile(
+    r"(?:(?<!\\)((?:\\{2})+)(?=`+)|(?<!\\)(`+)(.+?)(?<!`)\2(?!`))",
+    re.DOTALL,
+)
+_ESCAPE_RE = re.compile(r"\\([\\`*_{}\[\]()>#+\-.!|])")
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+# [text][id]、[text][] 与 [text]，前缀 ! 为图片
+_REFERENCE_RE = re.compile(r"(!?)\[([^\[\]]*)\](?:\s?\[([^\]]*)\])?")
+_WHITESPACE_RE = re.compile(r"\s+")
+_AUTOLINK_RE = re.compile(r"<((?:[Ff]|[Hh][Tt])[Tt][Pp][Ss]?://[^<>]*)>")
+_AUTOMAIL_RE = re.compile(r"<(?:mailto:)?([^<> !]+@[^@<> ]+)>")
+_HTML_TAG_RE = re.compile(
+    r"<(?:/?[a-zA-Z][^<>@ ]*(?: [^<>]*)?|!--(?:(?!<!--|-->).)*--)>", re.DOTALL
+)
+_NOT_STRONG_RE = re.compile(r"((^|(?<=\s))(\*{1,3}|_{1,3})(?=\s|$))")
+_STRONG_EM_RE = re.compile(r"(\*{3}|_{3})(.+?)\1", re.DOTALL)
+_STRONG_RE = re.compile(
+    r"(\*{2})(.+?)\1|(?<!\w)(_{2})(?!_)(.+?)(?<!_)\3(?!\w)", re.DOTALL
+)
+_EM_RE = re.compile(r"(\*)([^\*]+)\1|(?<!\w)(_)(?!_)(.+?)(?<!_)\3(?!\w)", re.DOTALL)
+_LINE_BREAK_RE = re.compile(r"  \n")
+_PLACEHOLDER_RE = re.compile("\x02(\\d+)\x03")
+
+
+def render_inline(text: str, references: Collection[str] = ()) -> str:
+    """去除行内标记，返回纯文本；references 为已定义的链接引用 ID（小写）"""
+    stash: list[str] = []
+
+    def store(value: str) -> str:
+        stash.append(value)
+        return f"\x02{len(stash) - 1}\x03"
+
+    def code(match: re.Match[str]) -> str:
+        if match.group(1):
+            return store("\\" * (len(match.group(1)) // 2))
+        return store(match.group(3).strip())
+
+    text = _BACKTICK_RE.sub(code, text)
+    text = _ESCAPE_RE.sub(lambda m: store(m.group(1)), text)
+    text = _IMAGE_RE.sub("", text)
+    text = _LINK_RE.sub(r"\1", text)
+    if references:
+
+        def reference(match: re.Match[str]) -> str:
+            image, label, ref = match.groups()
+            key = _WHITESPACE_RE.sub(" ", (ref or label).lower())
+            # 未定义的引用与 python-markdown 一样原样保留
+            if key not in references:
+                return match.group()
+            return "" if image else label
+
+        text = _REFERENCE_RE.sub(reference, text)
+    text = _AUTOLINK_RE.sub(lambda m: store(m.group(1)), text)
+    text = _AUTOMAIL_RE.sub(lambda m: store(m.group(1)), text)
+    text = _LINE_BREAK_RE.sub("\n", text)  # 行尾两个空格的硬换行
+    text = _HTML_TAG_RE.sub("", text)
+    text = _NOT_STRONG_RE.sub(lambda m: store(m.group(1)), text)
+    text = _STRONG_EM_RE.sub(r"\2", text)
+    text = _STRONG_RE.sub(lambda m: m.group(2) or m.group(4), text)
+    text = _EM_RE.sub(lambda m: m.group(2) or m.group(4), text)
+    text = html.unescape(text)
+    if stash:
+        text = _PLACEHOLDER_RE.sub(lambda m: stash[int(m.group(1))], text)
+    return text
+
+
+_BLOCK_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "hr"}
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# 只可能来自原样保留的 HTML 块的块级标签
+_RAW_BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "center",
+    "details",
+    "div",
+    "dl",
+    "dt",
+    "dd",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "header",
+    "hgroup",
+    "legend",
+    "main",
+    "nav",
+    "section",
+    "summary",
+}
+
+
+class HTMLSpecParser(HTMLParser):
+    """HTML 解析器，将 markdown 库生成的 HTML 转换为 ControlSpec
+
+    旧的 Markdown → HTML → HTMLParser 渲染路径，保留作为单遍渲染器的参照实现
+    与基准；单遍渲染器也用它解析原样保留的 HTML 块。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.specs: list[ControlSpec] = []
+        self.current_text = ""
+        self.current_bold = False
+        self.current_italic = False
+        self.current_code = False
+        self.current_list_items: list[tuple[int, str]] = []
+        self.list_depth = 0
+        self.list_ordered = False
+        self.after_br = False
+        self.in_list = False
+        self.in_code_block = False
+        self.code_language = ""
+        self.code_content = ""
+        self.in_table = False
+        self.in_table_head = False
+        self.table_header: list[str] = []
+        self.table_rows: list[list[str]] = []
+        self.current_row: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.after_br = False
+        if tag in _BLOCK_TAGS | _RAW_BLOCK_TAGS and not self.in_list:
+            # 块级元素之前未结束的文本单独成段
+            self._add_text_control()
+        if tag == "strong" or tag == "b":
+            self.current_bold = True
+        elif tag == "em" or tag == "i":
+            self.current_italic = True
+        elif tag == "code" or tag == "pre":
+            if tag == "code":
+                self.current_code = True
+            else:
+                self.in_code_block = True
+            # 获取代码语言（fenced_code 将 class 写在 <pre> 内的 <code> 上）
+            for attr, value in attrs:
+                if attr == "class":
+                    match = re.search(r"language-(\w+)", value or "")
+                    if match:
+                        self.code_language = match.group(1)
+        elif tag == "ul" or tag == "ol":
+            if self.list_depth == 0:
+                self._add_text_control()
+                self.list_ordered = tag == "ol"
+            elif self.current_text.strip():
+                # 嵌套列表之前的文本属于外层列表项
+                self._add_list_item()
+            self.list_depth += 1
+            self.in_list = True
+        elif tag == "li":
+            pass  # 处理列表项在文本处理中
+        elif tag == "br":
+            self.current_text += "\n"
+            self.after_br = True
+        elif tag == "table":
+            self._add_text_control()
+            self.in_table = True
+            self.table_header = []
+            self.table_rows = []
+        elif tag == "thead":
+            self.in_table_head = True
+        elif tag == "tr":
+            self.current_row = []
+        elif tag == "td" or tag == "th":
+            self.current_text = ""
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _RAW_BLOCK_TAGS and not self.in_list and not self.in_table:
+            # 原样保留的 HTML 块中的文本单独成段，不并入之后的段落
+            self._add_text_control()
+        elif tag == "strong" or tag == "b":
+            self.current_bold = False
+        elif tag == "em" or tag == "i":
+            self.current_italic = False
+        elif tag == "code":
+            self.current_code = False
+        elif tag == "pre":
+            self.in_code_block = False
+            if self.code_content.strip():
+                self._add_code_block(self.code_content, self.code_language)
+            self.code_content = ""
+            self.code_language = ""
+        elif tag in _HEADING_TAGS:
+            self._add_text_control(bold=True)
+        elif tag == "p":
+            if not self.in_list and self.current_text.strip():
+                self._add_text_control()
+        elif tag == "ul" or tag == "ol":
+            self.list_depth -= 1
+            if self.list_depth == 0:
+                self.in_list = False
+                if self.current_list_items:
+                    self._add_list_control()
+        elif tag == "li":
+            if self.current_text.strip():
+                self._add_list_item()
+        elif tag == "td" or tag == "th":
+            self.current_row.append(self.current_text.strip())
+            self.current_text = ""
+        elif tag == "tr":
+            if self.in_table_head:
+                self.table_header = self.current_row
+            else:
+                self.table_rows.append(self.current_row)
+            self.current_row = []
+            self.current_text = ""
+        elif tag == "thead":
+            self.in_table_head = False
+        elif tag == "table":
+            self.in_table = False
+            self._add_table_control()
+            self.current_text = ""
+
+    def handle_data(self, data: str) -> None:
+        # convert_charrefs 已解码实体，这里不再重复 unescape
+        if self.in_code_block:
+            self.code_content += data
+        else:
+            if self.after_br and data.startswith("\n"):
+                # nl2br 生成的 <br /> 后总跟着一个换行
+                data = data[1:]
+            self.after_br = False
+            self.current_text += data
+
+    def close(self) -> None:
+        super().close()
+        self._add_text_control()  # 未闭合的 HTML 块
+
+    def _add_text_control(self, bold: bool = False) -> None:
+        text = self.current_text.strip()
+        self.current_text = ""
+        if text:
+            self.specs.append(TextSpec(text, bold))
+
+    def _add_code_block(self, code: str, language: str = "") -> None:
+        code_text = code.strip()
+        if code_text:
+            self.specs.append(CodeSpec(code_text, language))
+
+    def _add_table_control(self) -> None:
+        if not self.table_header and not self.table_rows:
+            return
+
+        self.specs.append(
+            TableSpec(
+                tuple(self.table_header), tuple(tuple(row) for row in self.table_rows)
+            )
+        )
+        self.table_header = []
+        self.table_rows = []
+
+    def _add_list_item(self) -> None:
+        self.current_list_items.append((self.list_depth - 1, self.current_text.strip()))
+        self.current_text = ""
+
+    def _add_list_control(self) -> None:
+        if not self.current_list_items:
+            return
+
+        self.specs.append(ListSpec(tuple(self.current_list_items), self.list_ordered))
+        self.current_list_items = []
+
+
+def _normalize(text: str) -> list[str]:
+    text = text.replace("\r\n", "\n").replace("\r", "\n").expandtabs(TAB_LENGTH)
+    return [line if line.strip() else "" for line in text.split("\n")]
+
+
+def _dedent(line: str, width: int = TAB_LENGTH) -> str:
+    return line[width:] if line.startswith(" " * width) else line.lstrip(" ")
+
+
+class MarkdownRenderer:
+    """逐行扫描 Markdown，将每个完整的块立即转换为 ControlSpec"""
+
+    def __init__(self, references: Collection[str] = ()):
+        self.specs: list[ControlSpec] = []
+        self._last_block = ""  # 上一个块级元素的类型，用于列表/代码的续接
+        self.references = set(references)  # 链接引用定义的 ID（小写）
+
+    def _inline(self, text: str) -> str:
+        return render_inline(text, self.references)
+
+    def render(self, text: str) -> list[ControlSpec]:
+        lines = _normalize(text)
+        block: list[str] = []
+        index = 0
+        total = len(lines)
+        while index < total:
+            line = lines[index]
+            if not line:
+                if block:
+                    self._parse_block(block)
+                    block = []
+                index += 1
+                continue
+            fence = _FENCE_RE.match(line)
+            if fence:
+                end = self._find_fence_end(lines, index + 1, fence.group("fence"))
+                if end is not None:
+                    if block:
+                        self._parse_block(block)
+                        block = []
+                    self._add_code(
+                        "\n".join(lines[index + 1 : end]), fence.group("lang") or ""
+                    )
+                    index = end + 1
+                    continue
+            raw = _HTML_BLOCK_RE.match(line)
+            if raw and raw.group(1).lower() in _BLOCK_LEVEL_TAGS:
+                if block:
+                    self._parse_block(block)
+                    block = []
+                end, column = self._find_html_end(lines, index, raw)
+                self._add_html("\n".join([*lines[index:end], lines[end][:column]]))
+                # 闭合标签之后的内容与下一行一起按 Markdown 解析
+                tail = lines[end][column:].strip()
+                if tail:
+                    lines[end] = tail
+                    index = end
+                else:
+                    index = end + 1
+                continue
+            block.append(line)
+            index += 1
+        if block:
+            self._parse_block(block)
+        return self.specs
+
+    @staticmethod
+    def _find_fence_end(lines: list[str], start: int, fence: str) -> int | None:
+        for index in range(start, len(lines)):
+            line = lines[index]
+            if line.startswith(fence) and not line[len(fence) :].strip(" "):
+                return index
+        return None
+
+    @staticmethod
+    def _find_html_end(
+        lines: list[str], start: int, tag: re.Match[str]
+    ) -> tuple[int, int]:
+        """HTML 块闭合标签所在的行与其后的位置，未闭合时到文末"""
+        name = tag.group(1)
+        if name.lower() in _VOID_TAGS:
+            close = lines[start].find(">", tag.end())
+            return start, len(lines[start]) if close < 0 else close + 1
+        pattern = re.compile(rf"<(/?){name}(?=[\s/>])[^>]*>", re.IGNORECASE)
+        depth = 0
+        for index in range(start, len(lines)):
+            for match in pattern.finditer(lines[index]):
+                if match.group(1):
+                    depth -= 1
+                elif not match.group().endswith("/>"):
+                    depth += 1
+                if depth <= 0:
+                    return index, match.end()
+        return len(lines) - 1, len(lines[-1])
+
+    # 块级处理，顺序与 python-markdown 的 BlockProcessor 优先级一致
+    def _parse_block(self, lines: list[str]) -> None:
+        first = lines[0]
+        if first.startswith(" " * TAB_LENGTH):
+            if self._last_block in ("ul", "ol"):
+                self._continue_list(lines)
+            else:
+                self._parse_indented_code(lines)
+            return
+        if self._is_table(lines):
+            self._add_table(lines)
+            return
+        block = "\n".join(lines)
+        header = _HASH_HEADER_RE.search(block)
+        if header:
+            before = block[: header.start()]
+            after = block[header.end() :]
+            if before:
+                self._parse_block(before.split("\n"))
+            self._add_text(self._inline(header.group("header").strip()), bold=True)
+            self._last_block = "h"
+            if after:
+                self._parse_block(after.split("\n"))
+            return
+        if _SETEXT_HEADER_RE.match(block):
+            self._add_text(self._inline(first.strip()), bold=True)
+            self._last_block = "h"
+            if len(lines) > 2:
+                self._parse_block(lines[2:])
+            return
+        hr = _HR_RE.search(block)
+        if hr:
+            before = block[: hr.start()].rstrip("\n")
+            after = block[hr.end() :].lstrip("\n")
+            if before:
+                self._parse_block(before.split("\n"))
+            self._last_block = "hr"
+            if after:
+                self._parse_block(after.split("\n"))
+            return
+        if _OL_RE.match(first):
+            self._add_list(lines, ordered=True)
+            return
+        if _UL_RE.match(first):
+            self._add_list(lines, ordered=False)
+            return
+        quote = _QUOTE_RE.search(block)
+        if quote:
+            before = block[: quote.start()]
+            if before:
+                self._parse_block(before.split("\n"))
+            inner = [
+                match.group(1) if (match := _QUOTE_CLEAN_RE.match(line)) else line
+                for line in block[quote.start() :].lstrip("\n").split("\n")
+            ]
+            # 引用块内容按块重新解析
+            saved, self._last_block = self._last_block, ""
+            self.render("\n".join(inner))
+            self._last_block = saved if saved == "quote" else "quote"
+            return
+        ref = _REFERENCE_DEF_RE.search(block)
+        if ref:
+            # 链接引用定义不生成内容，前后的内容各自成块
+            self.references.add(ref.group(1).strip().lower())
+            before = block[: ref.start()].rstrip("\n")
+            after = block[ref.end() :].lstrip("\n")
+            if before.strip():
+                self._parse_block(before.split("\n"))
+            if after.strip():
+                self._parse_block(after.split("\n"))
+            return
+        self._add_text(self._inline(block.lstrip()))
+        self._last_block = "p"
+
+    def _parse_indented_code(self, lines: list[str]) -> None:
+        code: list[str] = []
+        rest: list[str] = []
+        for line in lines:
+            if rest or not (line.startswith(" " * TAB_LENGTH) or not line):
+                rest.append(line)
+            else:
+                code.append(line[TAB_LENGTH:])
+        if self._last_block == "code" and self.specs:
+            previous = self.specs.pop()
+            assert isinstance(previous, CodeSpec)
+            self._add_code(previous.code + "\n\n" + "\n".join(code), "")
+        else:
+            self._add_code("\n".join(code), "")
+        self._last_block = "code"
+        if rest:
+            self._parse_block(rest)
+
+    # 列表
+    def _list_items(self, lines: list[str], ordered: bool) -> list[str]:
+        child_re = _OL_CHILD_RE if ordered else _UL_CHILD_RE
+        items: list[str] = []
+        for line in lines:
+            match = child_re.match(line)
+            if match:
+                items.append(match.group(3))
+            elif _INDENT_RE.match(line):
+                if items and items[-1].startswith(" " * TAB_LENGTH):
+                    items[-1] = f"{items[-1]}\n{line}"
+                else:
+                    items.append(line)
+            elif items:
+                items[-1] = f"{items[-1]}\n{line}"
+            else:
+                items.append(line)
+        return items
+
+    def _collect_items(
+        self, lines: list[str], ordered: bool, depth: int, out: list[tuple[int, str]]
+    ) -> None:
+        for item in self._list_items(lines, ordered):
+            if item.startswith(" " * TAB_LENGTH):
+                nested = [_dedent(line) for line in item.split("\n")]
+                self._collect_nested(nested, depth + 1, out)
+            else:
+                text = self._inline(item).strip()
+                if text:
+                    out.append((depth, text))
+
+    def _collect_nested(
+        self, lines: list[str], depth: int, out: list[tuple[int, str]]
+    ) -> None:
+        if _OL_RE.match(lines[0]):
+            self._collect_items(lines, True, depth, out)
+        elif _UL_RE.match(lines[0]):
+            self._collect_items(lines, False, depth, out)
+        elif out:
+            # 缩进的普通内容并入上一个列表项
+            level, text = out[-1]
+            extra = self._inline("\n".join(lines).lstrip()).strip()
+            if extra:
+                out[-1] = (level, f"{text}\n{extra}")
+
+    def _add_list(self, lines: list[str], ordered: bool) -> None:
+        items: list[tuple[int, str]] = []
+        self._collect_items(lines, ordered, 0, items)
+        kind = "ol" if ordered else "ul"
+        if self._last_block == kind and self.specs:
+            previous = self.specs[-1]
+            if isinstance(previous, ListSpec):
+                self.specs[-1] = ListSpec(previous.items + tuple(items), ordered)
+                return
+        if items:
+            self.specs.append(ListSpec(tuple(items), ordered))
+            self._last_block = kind
+        else:
+            self._last_block = ""
+
+    def _continue_list(self, lines: list[str]) -> None:
+        previous = self.specs[-1] if self.specs else None
+        if not isinstance(previous, ListSpec):
+            self._parse_indented_code(lines)
+            return
+        items = list(previous.items)
+        self._collect_nested([_dedent(line) for line in lines], 1, items)
+        self.specs[-1] = ListSpec(tuple(items), previous.ordered)
+
+    # 表格
+    @staticmethod
+    def _table_border(header: str) -> bool:
+        return header.startswith("|") or bool(_TABLE_END_BORDER_RE.search(header))
+
+    def _split_row(self, row: str, border: bool) -> list[str]:
+        if border:
+            if row.startswith("|"):
+                row = row[1:]
+            row = _TABLE_END_BORDER_RE.sub("", row)
+        pipes: list[int] = []
+        tics: list[tuple[int, int, int, int]] = []  # (长度, 起点, 终点, 转义长度)
+        for match in _TABLE_CODE_PIPES_RE.finditer(row):
+            if match.group(2):
+                tics.append(
+                    (len(match.group(2)) - 1, match.start(2), match.end(2) - 1, 1)
+                )
+            elif match.group(3):
+                tics.append((len(match.group(3)), match.start(3), match.end(3) - 1, 0))
+            elif match.group(5):
+                pipes.append(match.start(5))
+        regions: list[tuple[int, int]] = []
+        pos = 0
+        while pos < len(tics):
+            size = tics[pos][0] - tics[pos][3]
+            closing = next(
+                (i for i in range(pos + 1, len(tics)) if tics[i][0] == size), None
+            )
+            if size == 0 or closing is None:
+                pos += 1
+                continue
+            regions.append((tics[pos][1], tics[closing][2]))
+            pos = closing + 1
+        cells: list[str] = []
+        start = 0
+        for pipe in pipes:
+            if any(begin <= pipe <= end for begin, end in regions):
+                continue
+            cells.append(row[start:pipe])
+            start = pipe + 1
+        cells.append(row[start:])
+        return cells
+
+    def _is_table(self, lines: list[str]) -> bool:
+        if len(lines) < 2:
+            return False
+        rows = [line.strip(" ") for line in lines]
+        border = self._table_border(rows[0])
+        header = self._split_row(rows[0], border)
+        is_table = len(header) > 1
+        if not is_table and len(header) == 1 and border:
+            is_table = all(
+                row.startswith("|") or _TABLE_END_BORDER_RE.search(row)
+                for row in rows[1:]
+            )
+        if is_table:
+            separator = self._split_row(rows[1], border)
+            is_table = len(separator) == len(header) and set("".join(separator)) <= set(
+                "|:- "
+            )
+        return is_table
+
+    def _add_table(self, lines: list[str]) -> None:
+        header_line = lines[0].strip(" ")
+        border = self._table_border(header_line)
+        columns = len(self._split_row(lines[1].strip(" "), border))
+
+        def cells(line: str) -> tuple[str, ...]:
+            values = self._split_row(line.strip(" "), border)[:columns]
+            values += [""] * (columns - len(values))
+            return tuple(self._inline(value.strip(" ")).strip() for value in values)
+
+        rows = tuple(cells(line) for line in lines[2:]) or (("",) * columns,)
+        self.specs.append(TableSpec(cells(header_line), rows))
+        self._last_block = "table"
+
+    # 生成 spec
+    def _add_text(self, text: str, bold: bool = False) -> None:
+        text = text.strip()
+        if text:
+            self.specs.append(TextSpec(text, bold))
+
+    def _add_html(self, text: str) -> None:
+        # 原样保留的 HTML 块不按 Markdown 解析，与旧路径使用同一个解析器
+        parser = HTMLSpecParser()
+        parser.feed(text)
+        parser.close()
+        self.specs.extend(parser.specs)
+        self._last_block = "html"
+
+    def _add_code(self, code: str, language: str) -> None:
+        code = code.strip()
+        match = re.match(r"\w+", language)
+        if code:
+            self.specs.append(CodeSpec(code, match.group() if match else ""))
+        self._last_block = "code"
+
+
+def render_markdown(text: str) -> list[ControlSpec]:
+    """单遍渲染 Markdown 为 ControlSpec 列表"""
+    if "]:" in text:
+        # 链接引用可以在定义之前使用，先扫描一遍收集定义
+        references = MarkdownRenderer()
+        references.render(text)
+        return MarkdownRenderer(references.references).render(text)
+    return MarkdownRenderer().render(text)
@@ -0,0 +1,361 @@
+"""常驻的 MCP 服务进程池
+
+内核自带的 MCP 客户端在启动时逐个连接服务以获取工具列表，之后每次工具调用
+都重新启动一次 stdio 服务。这里改为由应用管理：
+
+- 启动时在后台并发连接 `agent_mcp_server_scripts` 中的服务，并在各会话间复用
+- 同一服务的并发调用复用同一连接（MCP 请求按 ID 多路复用）
+- 定期探测连接，连接失效或调用失败时自动重启服务（指数退避）
+- 工具列表缓存在 MCP_TOOLS_CACHE_PATH 中，下次启动时在服务就绪前即可注册工具，
+  调用会等待服务就绪
+
+内核的 `agent_mcp_client_enable` 始终为 False（见 config.py），避免重复启动服务。
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from amrita_core import logger
+from amrita_core.tools.manager import ToolsManager
+from amrita_core.tools.models import (
+    FunctionDefinitionSchema,
+    FunctionParametersSchema,
+    MCPToolSchema,
+    ToolData,
+    ToolFunctionSchema,
+    cast_mcp_properties_to_amrita,
+)
+from fastmcp import Client
+from fastmcp.client.client import CallToolResult
+from mcp.types import TextContent
+from typing_extensions import Self
+
+from ..config import AgentConfig, ConfigDiff, ConfigService, get_config
+from ..constants import MCP_TOOLS_CACHE_PATH
+from .tool_executor import prefetchable
+
+MCP_HEALTH_INTERVAL = 15.0  # 健康检查间隔（秒）
+MCP_PROBE_TIMEOUT = 5.0
+MCP_READY_TIMEOUT = 30.0  # 调用等待服务就绪的最长时间（秒）
+MCP_RESTART_BACKOFF = 1.0  # 首次重启前的等待时间，之后每次翻倍
+MCP_RESTART_BACKOFF_MAX = 60.0
+
+ServerState = Literal["starting", "ready", "restarting", "stopped"]
+
+
+def _script_mtime(script: str) -> float:
+    try:
+        return Path(script).stat().st_mtime
+    except OSError:
+        return 0.0  # URL 或命令，无法判断是否变化
+
+
+def _to_tool_schema(tool: MCPToolSchema) -> ToolFunctionSchema:
+    """将 MCP 工具描述转换为内核的工具格式"""
+    return ToolFunctionSchema(
+        strict=True,
+        type="function",
+        function=FunctionDefinitionSchema(
+            name=tool.name,
+            description=tool.description or f"Running tool named: {tool.name}",
+            parameters=FunctionParametersSchema(
+                type="object",
+                required=tool.inputSchema.required,
+                properties=cast_mcp_properties_to_amrita(
+                    property=tool.inputSchema.properties
+                ),
+            ),
+        ),
+    )
+
+
+@dataclass
+class _MCPServer:
+    script: str
+    tools: list[MCPToolSchema] = field(default_factory=list)
+    state: ServerState = "starting"
+    client: Client | None = None
+    restarts: int = 0
+    calls: int = 0
+    errors: int = 0
+    last_error: str | None = None
+    started_at: float | None = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+    stopping: asyncio.Event = field(default_factory=asyncio.Event)
+    disconnected: asyncio.Event = field(default_factory=asyncio.Event)  # 当前连接
+    task: asyncio.Task[None] | None = None
+
+
+class MCPServerPool:
+    """管理常驻的 MCP 服务连接，并将其工具注册到 ToolsManager"""
+
+    _instance = None
+    _servers: dict[str, _MCPServer]
+    _tool_owner: dict[str, str]  # 工具名 -> 服务脚本
+    _loop: asyncio.AbstractEventLoop | None
+    _subscribed: bool
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._servers = {}
+            cls._tool_owner = {}
+            cls._loop = None
+            cls._subscribed = False
+        return cls._instance
+
+    # ---- 工具列表缓存 ----
+
+    def _load_cache(self) -> dict[str, Any]:
+        try:
+            return json.loads(MCP_TOOLS_CACHE_PATH.read_text("utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        cache = {
+            script: {
+                "mtime": _script_mtime(script),
+                "tools": [tool.model_dump(mode="json") for tool in server.tools],
+            }
+            for script, server in self._servers.items()
+            if server.tools
+        }
+        MCP_TOOLS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        MCP_TOOLS_CACHE_PATH.write_text(
+            json.dumps(cache, ensure_ascii=False), encoding="utf-8"
+        )
+
+    # ---- 工具注册 ----
+
+    def _register_tools(self, server: _MCPServer, tools: list[MCPToolSchema]):
+        manager = ToolsManager()
+        self._unregister_tools(server)
+        server.tools = tools
+        for tool in tools:
+            owner = self._tool_owner.get(tool.name)
+            if manager.has_tool(tool.name) and owner is None:
+                logger.warning(
+                    f"MCP 工具 {tool.name}（{server.script}）与已有工具重名，已跳过"
+                )
+                continue
+            if owner is not None and owner != server.script:
+                logger.warning(
+                    f"MCP 工具 {tool.name} 已由 {owner} 提供，已跳过 {server.script}"
+                )
+                continue
+            manager.register_tool(
+                ToolData(data=_to_tool_schema(tool), func=self._tool_func(tool.name))
+            )
+            self._tool_owner[tool.name] = server.script
+
+    def _unregister_tools(self, server: _MCPServer):
+        manager = ToolsManager()
+        for name, owner in list(self._tool_owner.items()):
+            if owner == server.script:
+                manager.remove_tool(name)
+                del self._tool_owner[name]
+
+    def _tool_func(self, name: str):
+        async def run_mcp_tool(data: dict[str, Any]) -> str:
+            return await self.call(name, data)
+
+        # 工具在预取层安装之后才注册，在此包装以便并行执行
+        return prefetchable(name, run_mcp_tool)
+
+    # ---- 服务生命周期 ----
+
+    async def _supervise(self, server: _MCPServer):
+        """保持连接；连接断开或健康检查失败时按退避重启"""
+        backoff = MCP_RESTART_BACKOFF
+        while not server.stopping.is_set():
+            connected_at: float | None = None
+            try:
+                async with Client(server.script) as client:
+                    await self._refresh_tools(server, client)
+                    server.disconnected = asyncio.Event()
+                    server.client = client
+                    server.state = "ready"
+                    server.started_at = connected_at = time.time()
+                    server.ready.set()
+                    logger.info(
+                        f"MCP 服务已就绪: {server.script}（{len(server.tools)} 个工具）"
+                    )
+                    await self._health_loop(server, client)
+            except Exception as e:
+                server.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"MCP 服务 {server.script} 连接失败: {e}")
+            finally:
+                server.client = None
+                server.ready.clear()
+                server.disconnected.set()
+            if server.stopping.is_set():
+                break
+            server.state = "restarting"
+            server.restarts += 1
+            if connected_at and time.time() - connected_at > MCP_HEALTH_INTERVAL:
+                backoff = MCP_RESTART_BACKOFF  # 稳定运行过一段时间，重新计算退避
+            try:
+                await asyncio.wait_for(server.stopping.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, MCP_RESTART_BACKOFF_MAX)
+        server.state = "stopped"
+
+    async def _refresh_tools(self, server: _MCPServer, client: Client):
+        tools = [
+            MCPToolSchema.model_validate(tool.model_dump(by_alias=True))
+            for tool in await client.list_tools()
+        ]
+        if tools != server.tools:
+            self._register_tools(server, tools)
+            await asyncio.to_thread(self._save_cache)
+
+    async def _health_loop(self, server: _MCPServer, client: Client):
+        while not server.stopping.is_set():
+            server.wake.clear()
+            # 调用失败时会提前唤醒，立即检查连接
+            wait_wake = asyncio.ensure_future(server.wake.wait())
+            wait_stop = asyncio.ensure_future(server.stopping.wait())
+            await asyncio.wait(
+                (wait_wake, wait_stop),
+                timeout=MCP_HEALTH_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            wait_wake.cancel()
+            wait_stop.cancel()
+            if server.stopping.is_set():
+                return
+            if not client.is_connected():
+                raise ConnectionError("连接已断开")
+            # 并非所有服务都实现 ping，以列出工具作为探测，同时发现工具变化
+            await asyncio.wait_for(
+                self._refresh_tools(server, client), MCP_PROBE_TIMEOUT
+            )
+            server.ready.set()
+
+    def _start(self, script: str, cache: dict[str, Any]):
+        server = self._servers[script] = _MCPServer(script)
+        entry = cache.get(script)
+        if entry and entry.get("mtime") == _script_mtime(script):
+            # 先按缓存注册工具，服务就绪前的调用会等待
+            self._register_tools(
+                server,
+                [MCPToolSchema.model_validate(tool) for tool in entry["tools"]],
+            )
+        server.task = asyncio.create_task(self._supervise(server))
+
+    async def _stop(self, script: str):
+        server = self._servers.pop(script)
+        server.stopping.set()
+        self._unregister_tools(server)
+        if server.task is not None:
+            try:
+                await asyncio.wait_for(server.task, MCP_PROBE_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+
+    async def sync(self, scripts: Iterable[str]):
+        """使运行中的服务与给定的脚本列表一致；不等待服务就绪"""
+        self._loop = asyncio.get_running_loop()
+        wanted = list(dict.fromkeys(scripts))
+        for script in [s for s in self._servers if s not in wanted]:
+            await self._stop(script)
+        missing = [s for s in wanted if s not in self._servers]
+        if missing:
+            cache = await asyncio.to_thread(self._load_cache)
+            for script in missing:
+                self._start(script, cache)
+
+    async def start_from_config(self):
+        """按配置启动服务，并在相关配置变更时同步"""
+        if not self._subscribed:
+            ConfigService().subscribe(self._on_config_change)
+            self._subscribed = True
+        await self.sync(self._scripts(get_config()))
+
+    @staticmethod
+    def _scripts(config: AgentConfig) -> list[str]:
+        if not config.agent_mcp_client_enable:
+            return []
+        return list(config.agent_mcp_server_scripts)
+
+    def _on_config_change(self, config: AgentConfig, changes: ConfigDiff):
+        if self._loop is None or not (
+            changes.keys() & {"agent_mcp_client_enable", "agent_mcp_server_scripts"}
+        ):
+            return
+        # 配置可能在其他线程中变更
+        asyncio.run_coroutine_threadsafe(self.sync(self._scripts(config)), self._loop)
+
+    async def aclose(self):
+        for script in list(self._servers):
+            await self._stop(script)
+
+    # ---- 调用 ----
+
+    async def call(self, tool_name: str, data: dict[str, Any]) -> str:
+        script = self._tool_owner.get(tool_name)
+        if script is None or (server := self._servers.get(script)) is None:
+            raise RuntimeError(f"MCP 工具 {tool_name} 不可用")
+        server.calls += 1
+        try:
+            await asyncio.wait_for(server.ready.wait(), MCP_READY_TIMEOUT)
+            client = server.client
+            assert client is not None
+            result = await self._call_on(server, client, tool_name, data)
+        except Exception as e:
+            server.errors += 1
+            server.last_error = f"{type(e).__name__}: {e}"
+            # 进程退出后连接可能仍显示为已连接，暂停后续调用直到探测通过或重启完成
+            server.ready.clear()
+            server.wake.set()
+            raise RuntimeError(f"MCP 服务 {script} 调用失败: {e}") from e
+        text = "".join(
+            f"{item.text}\n\n"
+            for item in result.content
+            if isinstance(item, TextContent)
+        )
+        if result.is_error:
+            raise RuntimeError(text.strip() or f"MCP 工具 {tool_name} 返回错误")
+        return text
+
+    @staticmethod
+    async def _call_on(
+        server: _MCPServer, client: Client, tool_name: str, data: dict[str, Any]
+    ) -> CallToolResult:
+        """连接在调用期间断开时立即失败，而不是一直等待响应"""
+        call = asyncio.ensure_future(
+            client.call_tool(tool_name, data, raise_on_error=False)
+        )
+        lost = asyncio.ensure_future(server.disconnected.wait())
+        try:
+            await asyncio.wait((call, lost), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lost.cancel()
+        if not call.done():
+            call.cancel()
+            raise ConnectionError("连接已断开")
+        return call.result()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            script: {
+                "state": server.state,
+                "tools": [tool.name for tool in server.tools],
+                "restarts": server.restarts,
+                "calls": server.calls,
+                "errors": server.errors,
+                "last_error": server.last_error,
+                "uptime_s": time.time() - server.started_at
+                if server.state == "ready" and server.started_at
+                else 0.0,
+            }
+            for script, server in self._servers.items()
+        }
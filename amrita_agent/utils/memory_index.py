@@ -0,0 +1,334 @@
+"""跨会话的长期记忆检索
+
+开启 `memory_retrieval_enable` 后，所有会话中的用户与助手消息被切分为片段并
+建立向量索引；每轮对话用用户输入检索最相关的片段，在 token 预算内附加到
+发送给模型的系统提示中。召回内容只出现在请求里，不写入会话。
+
+索引按会话记录指纹（最后更新时间与消息数），由 `maintain()` 在后台定期或
+在对话保存后增量更新，只重新切分、计算有变化的会话；索引保存在
+MEMORY_INDEX_PATH，重启后无需重新计算。
+"""
+
+import asyncio
+import contextvars
+import threading
+from collections.abc import AsyncGenerator, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import numpy as np
+from amrita_core import logger
+from amrita_core.protocol import COMPLETION_RETURNING, ModelAdapter
+from amrita_core.tokenizer import hybrid_token_count
+from amrita_core.types import ToolCall, UniResponse
+from typing_extensions import Self
+
+from ..config import get_config
+from ..constants import MEMORY_INDEX_PATH
+from .adapters import wrap_adapters
+from .chat import DataManager, Memory
+from .embedding import get_embedder, top_k
+from .tracing import span
+
+MEMORY_CHUNK_CHARS = 400  # 单个片段的最大字符数
+MEMORY_INDEX_INTERVAL = 60.0  # 后台检查会话变化的间隔（秒）
+MEMORY_RECALL_MIN_SCORE = 0.1  # 低于此相似度的片段不召回
+
+_ROLE_LABELS = {"user": "用户", "assistant": "助手"}
+
+
+def _message_text(message: Any) -> tuple[str, str]:
+    message = message if isinstance(message, dict) else message.model_dump()
+    content = message.get("content")
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return message.get("role", ""), content or ""
+
+
+def _split(text: str, size: int = MEMORY_CHUNK_CHARS) -> Iterator[str]:
+    """按段落合并到不超过 size 个字符，过长的段落直接截断成多段"""
+    buffer = ""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if buffer and len(buffer) + len(paragraph) + 1 > size:
+            yield buffer
+            buffer = ""
+        while len(paragraph) > size:
+            yield paragraph[:size]
+            paragraph = paragraph[size:]
+        buffer = f"{buffer}\n{paragraph}" if buffer else paragraph
+    if buffer:
+        yield buffer
+
+
+def chunk_memory(memory: Memory) -> list[tuple[str, str]]:
+    """将会话中的用户与助手消息切分为 (角色, 片段)"""
+    chunks: list[tuple[str, str]] = []
+    for message in memory.messages:
+        role, text = _message_text(message)
+        if (label := _ROLE_LABELS.get(role)) is None:
+            continue  # 跳过系统消息与工具结果
+        chunks.extend((label, chunk) for chunk in _split(text))
+    return chunks
+
+
+def _fingerprint(memory: Memory) -> str:
+    return f"{memory.last_update.isoformat()}:{len(memory.messages)}"
+
+
+class MemoryIndex:
+    """所有会话消息片段的向量索引"""
+
+    _instance = None
+    _session_ids: list[str]
+    _texts: list[str]
+    _matrix: np.ndarray | None
+    _fingerprints: dict[str, str]
+    _embedder_name: str | None
+    _loaded: bool
+    _lock: threading.Lock
+    _refresh_lock: threading.Lock
+    _wake: asyncio.Event | None
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._session_ids = []
+            cls._texts = []
+            cls._matrix = None
+            cls._fingerprints = {}
+            cls._embedder_name = None
+            cls._loaded = False
+            cls._lock = threading.Lock()
+            cls._refresh_lock = threading.Lock()
+            cls._wake = None
+        return cls._instance
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with np.load(MEMORY_INDEX_PATH) as data:
+                embedder = str(data["embedder"])
+                if embedder != get_embedder().name:
+                    return  # 向量化方式已变，全部重新计算
+                self._session_ids = [str(s) for s in data["session_ids"]]
+                self._texts = [str(t) for t in data["texts"]]
+                self._matrix = data["matrix"]
+                self._fingerprints = dict(
+                    zip(
+                        (str(s) for s in data["fp_sessions"]),
+                        (str(f) for f in data["fp_values"]),
+                    )
+                )
+                self._embedder_name = embedder
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def _save(self):
+        assert self._matrix is not None
+        MEMORY_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = MEMORY_INDEX_PATH.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            embedder=np.array(self._embedder_name),
+            session_ids=np.array(self._session_ids, dtype=str),
+            texts=np.array(self._texts, dtype=str),
+            matrix=self._matrix,
+            fp_sessions=np.array(list(self._fingerprints), dtype=str),
+            fp_values=np.array(list(self._fingerprints.values()), dtype=str),
+        )
+        tmp.replace(MEMORY_INDEX_PATH)
+
+    def refresh(self) -> int:
+        """使索引与当前会话一致，返回重新切分的会话数
+
+        向量在锁外计算，检索只在最后替换索引时短暂等待。
+        """
+        embedder = get_embedder()
+        with self._refresh_lock:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                if self._embedder_name != embedder.name:
+                    self._session_ids, self._texts, self._matrix = [], [], None
+                    self._fingerprints = {}
+                session_ids, texts = self._session_ids, self._texts
+                matrix, fingerprints = self._matrix, self._fingerprints
+
+            memories = {m.session_id: m for m in DataManager().get_memories()}
+            wanted = {sid: _fingerprint(m) for sid, m in memories.items()}
+            if wanted == fingerprints:
+                return 0
+            changed = {sid for sid, fp in wanted.items() if fingerprints.get(sid) != fp}
+
+            with span("memory.index", sessions=len(changed)):
+                keep = [
+                    i
+                    for i, sid in enumerate(session_ids)
+                    if sid in wanted and sid not in changed
+                ]
+                new_ids: list[str] = []
+                new_texts: list[str] = []
+                bodies: list[str] = []
+                for sid in changed:
+                    for label, chunk in chunk_memory(memories[sid]):
+                        new_ids.append(sid)
+                        new_texts.append(f"{label}: {chunk}")
+                        bodies.append(chunk)  # 角色标注不参与向量化
+                parts = []
+                if keep and matrix is not None:
+                    parts.append(matrix[keep])
+                if bodies:
+                    parts.append(embedder.embed(bodies))
+                new_matrix = (
+                    np.concatenate(parts)
+                    if parts
+                    else np.zeros((0, embedder.dim), dtype=np.float32)
+                )
+
+            with self._lock:
+                self._session_ids = [session_ids[i] for i in keep] + new_ids
+                self._texts = [texts[i] for i in keep] + new_texts
+                self._matrix = new_matrix
+                self._fingerprints = wanted
+                self._embedder_name = embedder.name
+            self._save()
+            logger.debug(
+                f"记忆索引已更新：{len(self._texts)} 个片段，重新切分 {len(changed)} 个会话"
+            )
+            return len(changed)
+
+    def search(
+        self, query: str, k: int, exclude_session: str | None = None
+    ) -> list[tuple[str, str, float]]:
+        """返回 (会话 ID, 片段, 相似度)，按相似度降序"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._matrix is None or not self._texts:
+                return []
+            vector = get_embedder().embed([query])[0]
+            # 多取一些，以便排除当前会话后仍有 k 个
+            candidates = top_k(self._matrix, vector, k * 4 if exclude_session else k)
+            session_ids, texts = self._session_ids, self._texts
+        results = [
+            (session_ids[i], texts[i], score)
+            for i, score in candidates
+            if score >= MEMORY_RECALL_MIN_SCORE and session_ids[i] != exclude_session
+        ]
+        return results[:k]
+
+    def recall(self, query: str, session_id: str | None = None) -> str:
+        """检索与查询相关的历史片段，按 token 预算拼接为提示文本"""
+        config = get_config()
+        # 发送完整上下文时当前会话已在请求中，只召回其他会话
+        exclude = None if config.use_minimal_context else session_id
+        dm = DataManager()
+        lines: list[str] = []
+        used = 0
+        for sid, text, _ in self.search(query, config.memory_retrieval_top_k, exclude):
+            try:
+                name = dm.get_name(sid)
+            except KeyError:
+                continue  # 会话已删除，索引尚未更新
+            line = f"[{name}] {text}"
+            tokens = hybrid_token_count(line, config.tokens_count_mode)
+            if used + tokens > config.memory_retrieval_token_budget:
+                break
+            lines.append(line)
+            used += tokens
+        if not lines:
+            return ""
+        return (
+            "<MEMORY>\nThe following snippets are recalled from earlier conversations "
+            "and may be relevant to the user's message:\n"
+            + "\n".join(lines)
+            + "\n</MEMORY>"
+        )
+
+    def schedule(self):
+        """请求后台尽快更新索引（例如会话保存后）"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def maintain(self, interval: float = MEMORY_INDEX_INTERVAL):
+        """在后台维护索引：定期检查，或被 schedule() 提前唤醒"""
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                if get_config().memory_retrieval_enable:
+                    try:
+                        await asyncio.to_thread(self.refresh)
+                    except Exception as e:
+                        logger.opt(exception=e).warning("更新记忆索引失败")
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wake = None
+
+
+_recalled: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "amrita_recalled_memory", default=""
+)
+
+
+@contextmanager
+def recalled_memory(text: str) -> Iterator[None]:
+    """在此期间创建的任务（即对话任务）请求模型时附带召回的片段"""
+    token = _recalled.set(text)
+    try:
+        yield
+    finally:
+        _recalled.reset(token)
+
+
+def _with_recall(messages: Iterable[Any]) -> Iterable[Any]:
+    if not (text := _recalled.get()):
+        return messages
+    messages = list(messages)
+    if not messages:
+        return messages
+    first = messages[0]
+    role, content = _message_text(first)
+    if role != "system":
+        return messages
+    # 附加到已有的系统提示中，而不是插入新的系统消息，兼容只接受一条系统消息的接口
+    content = f"{content}\n{text}"
+    if isinstance(first, dict):
+        messages[0] = {**first, "content": content}
+    else:
+        messages[0] = first.model_copy(update={"content": content})
+    return messages
+
+
+class _RecallMixin(ModelAdapter):
+    """请求模型时附加召回的历史片段，由 install_memory_recall 动态混入"""
+
+    __abstract__ = True
+    __memory_recall__ = True
+
+    async def call_api(
+        self, messages: Iterable
+    ) -> AsyncGenerator[COMPLETION_RETURNING, None]:
+        async for item in super().call_api(_with_recall(messages)):
+            yield item
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: Any = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        return await super().call_tools(_with_recall(messages), tools, tool_choice)
+
+
+def install_memory_recall():
+    """为所有已注册的适配器加上记忆召回，可重复调用"""
+    wrap_adapters(_RecallMixin, "Recalling", "__memory_recall__")
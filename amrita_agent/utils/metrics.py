@@ -0,0 +1,282 @@
+"""轻量指标注册表：计数器、仪表与直方图
+
+指标可带标签，所有操作线程安全（会话保存等在线程中执行）。
+`render_prometheus()` 输出 Prometheus 文本格式，`snapshot()` 供性能页展示。
+常用指标在本模块末尾定义，各处直接导入使用。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from typing_extensions import Self
+
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+HISTOGRAM_WINDOW = 512  # 每个标签组合保留最近多少个样本用于计算分位数
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = (*key, *extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type: str
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+    def series(self) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                for key, value in self._values.items()
+            ]
+
+    def series(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {"labels": dict(key), "value": value}
+                for key, value in self._values.items()
+            ]
+
+
+class Gauge(Counter):
+    """可任意设置的当前值"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+@dataclass
+class _HistogramState:
+    buckets: list[int]
+    sum: float = 0.0
+    count: int = 0
+    recent: deque[float] = field(default_factory=lambda: deque(maxlen=HISTOGRAM_WINDOW))
+
+
+class Histogram(_Metric):
+    """分桶统计；另保留最近的样本用于在界面中显示分位数"""
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._states: dict[LabelKey, _HistogramState] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _HistogramState([0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state.buckets[i] += 1
+                    break
+            state.sum += value
+            state.count += 1
+            state.recent.append(value)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, state in self._states.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state.buckets):
+                    cumulative += count
+                    le = (("le", _format_value(bound)),)
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+                    )
+                inf = (("le", "+Inf"),)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, inf)} {state.count}"
+                )
+                labels = _format_labels(key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state.sum)}")
+                lines.append(f"{self.name}_count{labels} {state.count}")
+        return lines
+
+    def series(self) -> list[dict[str, Any]]:
+        with self._lock:
+            result = []
+            for key, state in self._states.items():
+                recent = sorted(state.recent)
+                result.append(
+                    {
+                        "labels": dict(key),
+                        "count": state.count,
+                        "sum": state.sum,
+                        "avg": state.sum / state.count,
+                        **{
+                            name: recent[min(int(len(recent) * q), len(recent) - 1)]
+                            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+                        },
+                    }
+                )
+            return result
+
+
+class MetricsRegistry:
+    """按名称注册指标；同名指标重复注册时返回已有实例"""
+
+    _instance = None
+    _metrics: dict[str, _Metric]
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._metrics = {}
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    def _register(self, metric_type: type[_Metric], name: str, *args: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_type(name, *args)
+            elif type(metric) is not metric_type:
+                raise ValueError(f"指标 {name} 已注册为 {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge, name, help)
+
+    def histogram(
+        self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, help, buckets)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [
+            {
+                "name": metric.name,
+                "type": metric.type,
+                "help": metric.help,
+                "series": metric.series(),
+            }
+            for metric in metrics
+        ]
+
+
+_registry = MetricsRegistry()
+
+SESSION_SAVE_SECONDS = _registry.histogram(
+    "amrita_session_save_seconds", "会话保存耗时"
+)
+SESSION_LOAD_SECONDS = _registry.histogram(
+    "amrita_session_load_seconds", "单个会话文件读取与解析耗时"
+)
+SESSIONS = _registry.gauge("amrita_sessions", "已加载的会话数")
+RENDER_SECONDS = _registry.histogram(
+    "amrita_render_seconds", "Markdown 渲染为控件的耗时"
+)
+RENDER_CONTROLS = _registry.histogram(
+    "amrita_render_controls",
+    "单次渲染生成的顶层控件数",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+LLM_TTFT_SECONDS = _registry.histogram(
+    "amrita_llm_ttft_seconds", "从发起对话到收到首个片段的耗时"
+)
+LLM_TURN_SECONDS = _registry.histogram("amrita_llm_turn_seconds", "一轮对话的总耗时")
+LLM_TOKENS_PER_SECOND = _registry.histogram(
+    "amrita_llm_tokens_per_second",
+    "首个片段之后的输出速率",
+    buckets=(1, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+LLM_TURNS = _registry.counter("amrita_llm_turns_total", "对话轮数，按结果分类")
+LLM_ERRORS = _registry.counter(
+    "amrita_llm_errors_total", "失败的对话轮数，按异常类型分类"
+)
+TOOL_CALLS = _registry.counter("amrita_tool_calls_total", "工具调用次数，按结果分类")
+TOOL_CALL_SECONDS = _registry.histogram("amrita_tool_call_seconds", "工具调用耗时")
+TOOL_EXEC_SECONDS = _registry.histogram(
+    "amrita_tool_exec_seconds", "工具函数的执行耗时，按工具与结果分类"
+)
+IMAGE_ENCODE_SECONDS = _registry.histogram(
+    "amrita_image_encode_seconds", "图片缩放与重新编码的耗时"
+)
@@ -0,0 +1,136 @@
+"""本地模拟模型，用于在不调用真实 API 的情况下测试与压测
+
+预设中设置 `protocol = "mock"` 即可使用，base_url 与 api_key 不会被访问。
+行为由预设的 extra 控制：
+- `mock_latency`：首个片段之前的延迟（秒），默认 0.2
+- `mock_token_rate`：每秒输出的词元数，0 表示不限速，默认 50
+- `mock_response`：回复内容，默认复述用户的最后一条消息
+- `mock_tokens`：指定后改为生成该数量词元的填充文本
+- `mock_tool_script`：工具调用脚本，每一步是一组 `{name, arguments}`；
+  用户消息之后第 n 次请求工具调用时返回第 n 步，脚本用完后不再调用工具
+
+是否流式输出由预设的 `config.stream` 决定。
+"""
+
+import asyncio
+import json
+import re
+import time
+from collections.abc import AsyncGenerator, Iterable
+from typing import Any
+
+from amrita_core.protocol import (
+    COMPLETION_RETURNING,
+    ModelAdapter,
+    StringMessageContent,
+)
+from amrita_core.tools.models import ToolChoice
+from amrita_core.types import Function, ToolCall, UniResponse, UniResponseUsage
+
+MOCK_LATENCY = 0.2
+MOCK_TOKEN_RATE = 50.0
+_FILLER = "模拟模型正在生成用于基准测试的填充文本 "
+
+# 中文按字、其余按最多 4 个字符切分，近似真实分词器的词元数量
+_TOKEN_RE = re.compile(r"\s*(?:[\u4e00-\u9fff]|[^\s\u4e00-\u9fff]{1,4})|\s+$")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def _as_dict(message: Any) -> dict[str, Any]:
+    return message if isinstance(message, dict) else message.model_dump()
+
+
+def _text_of(message: dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return content or ""
+
+
+class MockAdapter(ModelAdapter):
+    """按预设 extra 中的参数模拟延迟、输出速率与工具调用"""
+
+    def _extra(self, key: str, default: Any) -> Any:
+        return (self.preset.extra or {}).get(key, default)
+
+    def _reply(self, messages: list[dict[str, Any]]) -> str:
+        if (count := self._extra("mock_tokens", None)) is not None:
+            filler = tokenize(_FILLER)
+            return "".join(filler[i % len(filler)] for i in range(int(count)))
+        if (response := self._extra("mock_response", None)) is not None:
+            return str(response)
+        last_user = next(
+            (_text_of(m) for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        return f"这是模拟模型的回复：{last_user}"
+
+    async def call_api(
+        self, messages: Iterable
+    ) -> AsyncGenerator[COMPLETION_RETURNING, None]:
+        messages = [_as_dict(m) for m in messages]
+        tokens = tokenize(self._reply(messages))
+        rate = float(self._extra("mock_token_rate", MOCK_TOKEN_RATE))
+        await asyncio.sleep(float(self._extra("mock_latency", MOCK_LATENCY)))
+        start = time.perf_counter()
+        response = ""
+        for i, token in enumerate(tokens):
+            if rate > 0:
+                # 按起始时间对齐，避免逐个 sleep 的误差累积
+                await asyncio.sleep(max(start + i / rate - time.perf_counter(), 0))
+            response += token
+            if self.preset.config.stream:
+                yield StringMessageContent(response)
+        if not self.preset.config.stream:
+            yield StringMessageContent(response)
+        prompt_tokens = sum(len(tokenize(_text_of(m))) for m in messages)
+        yield UniResponse(
+            role="assistant",
+            content=response,
+            usage=UniResponseUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(tokens),
+                total_tokens=prompt_tokens + len(tokens),
+            ),
+            tool_calls=None,
+        )
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: ToolChoice | None = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        messages = [_as_dict(m) for m in messages]
+        await asyncio.sleep(float(self._extra("mock_latency", MOCK_LATENCY)))
+        script: list[list[dict[str, Any]]] = self._extra("mock_tool_script", [])
+        # 最后一条用户消息之后已经发起过几次工具调用
+        step = 0
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                break
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                step += 1
+        available = {
+            _as_dict(tool).get("function", {}).get("name") for tool in tools or []
+        }
+        calls = [
+            ToolCall(
+                id=f"mock-{step}-{i}",
+                function=Function(
+                    name=call["name"],
+                    arguments=json.dumps(call.get("arguments", {}), ensure_ascii=False),
+                ),
+            )
+            for i, call in enumerate(script[step] if step < len(script) else [])
+            if call["name"] in available
+        ]
+        return UniResponse(role="assistant", tool_calls=calls or None, content=None)
+
+    @staticmethod
+    def get_adapter_protocol() -> str:
+        return "mock"
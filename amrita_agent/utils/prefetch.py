@@ -0,0 +1,155 @@
+"""会话视图的预取
+
+鼠标悬停在侧边栏的对话上（或启动后空闲时最近的几个对话）时，在后台取出
+该会话最后一页消息并渲染为 ControlSpec，点击对话时只需构建控件。
+
+- 每页消息数与空闲时预取的会话数由 `ui_prefetch_messages`、
+  `ui_prefetch_recent_sessions` 配置，后者为 0 时不做空闲预取
+- 同时进行的预取不超过 PREFETCH_CONCURRENCY 个；鼠标移开时取消未完成的预取，
+  渲染按消息逐条进行，取消在两条消息之间生效
+- 结果按会话的最后更新时间与消息数校验，会话有新消息后自动失效
+"""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from amrita_core import logger
+from typing_extensions import Self
+
+from ..config import get_config
+from .chat import DataManager, Memory
+from .markdown_spec import ControlSpec, render_markdown
+from .tracing import span
+
+PREFETCH_CONCURRENCY = 2
+PREFETCH_CACHE_SESSIONS = 16  # 最多保留多少个会话的预渲染结果
+
+
+@dataclass(frozen=True)
+class MessageView:
+    """一条消息的显示内容，specs 为 None 时按纯文本显示"""
+
+    text: str
+    is_user: bool
+    specs: Sequence[ControlSpec] | None = None
+
+
+def _fingerprint(memory: Memory) -> tuple[str, int]:
+    return memory.last_update.isoformat(), len(memory.messages)
+
+
+def _message_text(message: Any) -> str:
+    content = message.content
+    if isinstance(content, list):
+        parts = (p if isinstance(p, dict) else p.model_dump() for p in content)
+        return "".join(p.get("text", "") for p in parts if p.get("type") == "text")
+    return content or ""
+
+
+def last_page(memory: Memory, size: int) -> list[tuple[str, bool]]:
+    """会话最后 size 条用户与助手消息的 (文本, 是否为用户)"""
+    page: list[tuple[str, bool]] = []
+    for message in reversed(memory.messages):
+        if len(page) >= size:
+            break
+        if message.role not in ("user", "assistant"):
+            continue
+        if text := _message_text(message):
+            page.append((text, message.role == "user"))
+    page.reverse()
+    return page
+
+
+class SessionPrefetcher:
+    """按会话缓存最后一页消息的预渲染结果"""
+
+    _instance = None
+    _views: OrderedDict[str, tuple[tuple[str, int], list[MessageView]]]
+    _tasks: dict[str, asyncio.Task[None]]
+    _slots: asyncio.Semaphore | None
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._views = OrderedDict()
+            cls._tasks = {}
+            cls._slots = None
+        return cls._instance
+
+    def get(self, memory: Memory) -> list[MessageView] | None:
+        """已预取且仍然有效的结果"""
+        cached = self._views.get(memory.session_id)
+        if cached is None or cached[0] != _fingerprint(memory):
+            return None
+        self._views.move_to_end(memory.session_id)
+        return cached[1]
+
+    def render(self, memory: Memory) -> list[MessageView]:
+        """同步渲染（未预取时在点击时调用）并缓存"""
+        views = [
+            MessageView(text, is_user, None if is_user else render_markdown(text))
+            for text, is_user in last_page(memory, get_config().ui_prefetch_messages)
+        ]
+        self._store(memory, views)
+        return views
+
+    def _store(self, memory: Memory, views: list[MessageView]):
+        self._views[memory.session_id] = (_fingerprint(memory), views)
+        self._views.move_to_end(memory.session_id)
+        while len(self._views) > PREFETCH_CACHE_SESSIONS:
+            self._views.popitem(last=False)
+
+    async def _prefetch(self, memory: Memory):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        async with self._slots:
+            fingerprint = _fingerprint(memory)
+            views: list[MessageView] = []
+            with span("ui.prefetch", session=memory.session_id):
+                for text, is_user in last_page(
+                    memory, get_config().ui_prefetch_messages
+                ):
+                    specs = (
+                        None
+                        if is_user
+                        else await asyncio.to_thread(render_markdown, text)
+                    )
+                    views.append(MessageView(text, is_user, specs))
+            if fingerprint == _fingerprint(memory):
+                self._store(memory, views)
+
+    def prefetch(self, session_id: str) -> asyncio.Task[None] | None:
+        """在后台预取会话，已有有效结果或正在预取时不重复执行"""
+        try:
+            memory = DataManager().get_memory_by_session_id(session_id)
+        except KeyError:
+            return None
+        if self.get(memory) is not None:
+            return None
+        if (task := self._tasks.get(session_id)) is not None and not task.done():
+            return task
+        task = asyncio.create_task(self._prefetch(memory))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda t: self._finished(session_id, t))
+        return task
+
+    def _finished(self, session_id: str, task: asyncio.Task[None]):
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+        if not task.cancelled() and (e := task.exception()) is not None:
+            logger.opt(exception=e).warning(f"预取会话 {session_id} 失败")
+
+    def cancel(self, session_id: str):
+        """取消未完成的预取"""
+        if (task := self._tasks.get(session_id)) is not None:
+            task.cancel()
+
+    async def prefetch_recent(self):
+        """空闲时预取最近更新的几个会话"""
+        count = get_config().ui_prefetch_recent_sessions
+        for memory in DataManager().get_memories()[:count]:
+            if task := self.prefetch(memory.session_id):
+                await asyncio.gather(task, return_exceptions=True)
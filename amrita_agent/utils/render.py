@@ -1,5 +1,8 @@
+import functools
 import re
-from typing import Any
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any, Literal
 
 import flet as ft
 from pydantic import BaseModel
@@ -7,6 +10,10 @@ from pydantic.fields import FieldInfo
 
 from ..constants import ColorsEnum, FontSizesEnum
 
+_UI_PATTERN = re.compile(r"@ui\[([^\]]+)\]")
+
+WidgetKind = Literal["list", "switch", "slider", "number", "text", "value"]
+
 
 def parse_ui_config(description: str) -> tuple[str, dict[str, Any]]:
     """从description中解析@ui指令
@@ -15,103 +22,161 @@ def parse_ui_config(description: str) -> tuple[str, dict[str, Any]]:
     支持: @ui[slider,min,max] 等格式
     """
     ui_config: dict[str, Any] = {}
-    cleaned_description = description
 
     if not description:
-        return cleaned_description, ui_config
+        return description, ui_config
+
+    def collect(match: re.Match[str]) -> str:
+        parts = match.group(1).split(",")
+        ui_type = parts[0].strip()
+        if ui_type == "slider" and len(parts) >= 3:
+            try:
+                min_val = float(parts[1].strip())
+                max_val = float(parts[2].strip())
+                ui_config["slider"] = {"min": min_val, "max": max_val}
+            except ValueError:
+                pass
+        # 移除 @ui[...] 指令
+        return ""
+
+    # 匹配 @ui[type,param1,param2,...] 格式，解析与移除在同一遍中完成
+    cleaned_description = _UI_PATTERN.sub(collect, description).strip()
+    return cleaned_description, ui_config
 
-    # 匹配 @ui[type,param1,param2,...] 格式
-    pattern = r"@ui\[([^\]]+)\]"
-    matches = re.findall(pattern, description)
 
-    for match in matches:
-        parts = match.split(",")
-        if len(parts) > 0:
-            ui_type = parts[0].strip()
+@dataclass(frozen=True)
+class FieldSpec:
+    """单个字段的表单描述，由模型类编译一次后复用"""
+
+    path: tuple[str, ...]
+    title: str
+    description: str
+    kind: WidgetKind
+    field_info: FieldInfo
+    ui_config: dict[str, Any]
+    item_type: type = str
+    password: bool = False
+
+    @property
+    def key(self) -> str:
+        return ".".join(self.path)
+
+    def default(self) -> Any:
+        if self.field_info.default:
+            return self.field_info.default
+        if self.field_info.default_factory:
+            return self.field_info.default_factory()  # type: ignore
+        return None
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    """模型类对应的表单：[(分组标题, 字段列表), ...]"""
+
+    sections: tuple[tuple[str, tuple[FieldSpec, ...]], ...]
+
+    @property
+    def fields(self) -> Iterator[FieldSpec]:
+        for _, specs in self.sections:
+            yield from specs
+
+
+def _is_model(field_type: Any) -> bool:
+    return isinstance(field_type, type) and issubclass(field_type, BaseModel)
+
+
+def compile_field(path: tuple[str, ...], field_info: FieldInfo) -> FieldSpec:
+    """根据字段类型与 @ui 指令确定控件类型"""
+    field_type = field_info.annotation
+    description, ui_config = parse_ui_config(field_info.description or "")
+    kind: WidgetKind = "value"
+    item_type: type = str
+
+    if getattr(field_type, "__origin__", None) is list:
+        kind = "list"
+        args = getattr(field_type, "__args__", ())
+        item_type = args[0] if args else str
+    elif field_type is bool:
+        kind = "switch"
+    elif field_type is float or (field_type is int and "slider" in ui_config):
+        kind = "slider"
+    elif field_type is int:
+        kind = "number"
+    elif field_type is str:
+        kind = "text"
+
+    return FieldSpec(
+        path=path,
+        title=field_info.title or path[-1],
+        description=description,
+        kind=kind,
+        field_info=field_info,
+        ui_config=ui_config,
+        item_type=item_type,
+        # 检查字段描述中是否有 password 标记
+        password=kind == "text" and "password" in description.lower(),
+    )
 
-            if ui_type == "slider" and len(parts) >= 3:
-                try:
-                    min_val = float(parts[1].strip())
-                    max_val = float(parts[2].strip())
-                    ui_config["slider"] = {"min": min_val, "max": max_val}
-                except ValueError:
-                    pass
 
-    # 移除所有 @ui[...] 指令
-    cleaned_description = re.sub(pattern, "", description).strip()
+@functools.cache
+def compile_form_schema(model_class: type[BaseModel]) -> FormSchema:
+    """将模型类编译为表单描述，结果按类缓存
 
-    return cleaned_description, ui_config
+    嵌套的 BaseModel 字段（支持一层嵌套）各自成为一个分组，
+    其余字段归入“通用设置”。
+    """
+    sections: list[tuple[str, tuple[FieldSpec, ...]]] = []
+    regular: list[FieldSpec] = []
+    for field_name, field_info in model_class.model_fields.items():
+        field_type = field_info.annotation
+        if _is_model(field_type):
+            nested = tuple(
+                compile_field((field_name, name), info)
+                for name, info in field_type.model_fields.items()  # type: ignore[union-attr]
+            )
+            if nested:
+                sections.append((field_info.title or field_name, nested))
+        else:
+            regular.append(compile_field((field_name,), field_info))
+    if regular:
+        sections.append(("通用设置", tuple(regular)))
+    return FormSchema(tuple(sections))
 
 
-def create_control_for_field(
-    field_type: type | None, field_info: FieldInfo | None, current_value: Any = None
-) -> ft.Control:
-    """根据字段类型创建相应的 UI 控件"""
-
-    # 获取默认值
-    default_value = current_value
-    assert field_info
-    if default_value is None:
-        if field_info.default:
-            default_value = field_info.default
-        elif field_info.default_factory:
-            default_value = field_info.default_factory()  # type: ignore
-
-    # 解析 description 中的 @ui 指令
-    description = field_info.description or ""
-    clean_description, ui_config = parse_ui_config(description)
-
-    # 检查是否为 List 类型
-    if (
-        field_type is not None
-        and hasattr(field_type, "__origin__")
-        and field_type.__origin__ is list
-    ):
-        # 获取列表元素的类型
-        list_item_type = field_type.__args__[0] if field_type.__args__ else str
+def build_control(spec: FieldSpec, value: Any = None) -> ft.Control:
+    """根据字段描述创建相应的 UI 控件"""
+    if value is None:
+        value = spec.default()
 
+    if spec.kind == "list":
         # 创建列表编辑控件
-        return create_list_control(list_item_type, default_value or [])
+        return create_list_control(spec.item_type, value or [])
 
-    # 处理 bool 类型
-    if field_type is bool:
+    if spec.kind == "switch":
         return ft.Switch(
-            value=bool(default_value) if default_value is not None else False,
+            value=bool(value) if value is not None else False,
             thumb_color=ColorsEnum.accent_primary.value,
         )
 
-    # 处理 float 类型（温度等滑块）
-    if field_type is float:
-        slider_config = ui_config.get("slider", {})
-        min_val = slider_config.get("min", 0)
-        max_val = slider_config.get("max", 2)
-
-        return ft.Slider(
-            min=min_val,
-            max=max_val,
-            divisions=20,
-            value=float(default_value or 0.7),
-            width=200,
-        )
-
-    # 处理 int 类型
-    if field_type is int:
-        slider_config = ui_config.get("slider", {})
-        # 如果有 slider 配置，使用 Slider 而不是 TextField
-        if slider_config:
+    if spec.kind == "slider":
+        slider_config = spec.ui_config.get("slider", {})
+        if spec.field_info.annotation is int:
             min_val = int(slider_config.get("min", 0))
             max_val = int(slider_config.get("max", 100))
-            return ft.Slider(
-                min=min_val,
-                max=max_val,
-                divisions=max_val - min_val,
-                value=float(default_value or min_val),
-                width=200,
-            )
-
+            divisions = max_val - min_val
+        else:
+            # 温度等滑块
+            min_val = slider_config.get("min", 0)
+            max_val = slider_config.get("max", 2)
+            divisions = 20
+        control = ft.Slider(min=min_val, max=max_val, divisions=divisions, width=200)
+        set_control_value(spec, control, value)
+        return control
+
+    if spec.kind == "number":
         return ft.TextField(
             label="数值",
-            value=str(default_value or 0),
+            value=str(value or 0),
             width=150,
             bgcolor=ColorsEnum.input_bg.value,
             color=ColorsEnum.text_primary.value,
@@ -119,15 +184,11 @@ def create_control_for_field(
             border_color=ColorsEnum.input_border.value,
         )
 
-    # 处理 str 类型（默认为文本输入）
-    if field_type is str:
-        # 检查字段描述中是否有 password 标记
-        is_password = "password" in clean_description.lower()
-
+    if spec.kind == "text":
         return ft.TextField(
             label="文本",
-            value=str(default_value or ""),
-            password=is_password,
+            value=str(value or ""),
+            password=spec.password,
             bgcolor=ColorsEnum.input_bg.value,
             color=ColorsEnum.text_primary.value,
             label_style=ft.TextStyle(color=ColorsEnum.text_secondary.value),
@@ -138,7 +199,7 @@ def create_control_for_field(
     # 默认为文本输入框
     return ft.TextField(
         label="值",
-        value=str(default_value or ""),
+        value=str(value or ""),
         bgcolor=ColorsEnum.input_bg.value,
         color=ColorsEnum.text_primary.value,
         label_style=ft.TextStyle(color=ColorsEnum.text_secondary.value),
@@ -146,10 +207,54 @@ def create_control_for_field(
     )
 
 
+def set_control_value(spec: FieldSpec, control: ft.Control, value: Any):
+    """就地修改控件的值，不重建控件；由调用方统一 update"""
+    if value is None:
+        value = spec.default()
+
+    if spec.kind == "list":
+        assert isinstance(control, ft.Column)
+        list_items = control.controls[0]
+        assert isinstance(list_items, ft.Column)
+        list_items.controls = [
+            _list_item_row(list_items, str(item)) for item in value or []
+        ]
+    elif spec.kind == "switch":
+        assert isinstance(control, ft.Switch)
+        control.value = bool(value) if value is not None else False
+    elif spec.kind == "slider":
+        assert isinstance(control, ft.Slider)
+        if spec.field_info.annotation is int:
+            control.value = float(value or control.min or 0)
+        else:
+            control.value = float(value or 0.7)
+    elif spec.kind == "number":
+        assert isinstance(control, ft.TextField)
+        control.value = str(value or 0)
+    else:
+        assert isinstance(control, ft.TextField)
+        control.value = str(value or "")
+
+
+def get_control_value(spec: FieldSpec, control: ft.Control) -> Any:
+    """读取控件当前的值"""
+    if spec.kind == "list":
+        assert isinstance(control, ft.Column)
+        list_items = control.controls[0]
+        assert isinstance(list_items, ft.Column)
+        return [
+            row.controls[0].value
+            for row in list_items.controls
+            if isinstance(row, ft.Row) and isinstance(row.controls[0], ft.Text)
+        ]
+    return getattr(control, "value", None)
+
+
 def create_list_control(item_type: type, values: list) -> ft.Control:
     """创建列表编辑控件"""
-    # 列表容器
+    # 列表容器，现有项一次性构建
     list_items = ft.Column(scroll=ft.ScrollMode.AUTO, spacing=5)
+    list_items.controls = [_list_item_row(list_items, str(value)) for value in values]
 
     # 创建输入控件
     input_field = ft.TextField(
@@ -167,10 +272,6 @@ def create_list_control(item_type: type, values: list) -> ft.Control:
         on_click=lambda _: add_list_item(item_type, input_field, list_items),
     )
 
-    # 初始化现有项
-    for i, value in enumerate(values):
-        add_list_item_to_container(item_type, list_items, str(value), i)
-
     return ft.Column([list_items, ft.Row([input_field, add_btn], spacing=5)], spacing=5)
 
 
@@ -194,18 +295,15 @@ def add_list_item(item_type: type, input_field: ft.TextField, list_items: ft.Col
             converted_value = value_str  # 默认为字符串
 
         # 添加新项到列表
-        index = len(list_items.controls)
-        add_list_item_to_container(item_type, list_items, str(converted_value), index)
+        add_list_item_to_container(list_items, str(converted_value))
         input_field.value = ""  # 清空输入框
-        list_items.update()  # 更新列表
+        list_items.update()  # 同时更新列表与输入框
+        input_field.update()
     except ValueError:
         pass
 
 
-def add_list_item_to_container(
-    item_type: type, container: ft.Column, value: str, index: int
-):
-    """向容器添加列表项控件"""
+def _list_item_row(container: ft.Column, value: str) -> ft.Row:
     row = ft.Row(
         controls=[
             ft.Text(str(value), expand=True),
@@ -216,8 +314,12 @@ def add_list_item_to_container(
         ],
         spacing=5,
     )
-    container.controls.append(row)
-    container.update()
+    return row
+
+
+def add_list_item_to_container(container: ft.Column, value: str):
+    """向容器添加列表项控件，由调用方负责 update"""
+    container.controls.append(_list_item_row(container, value))
 
 
 def remove_list_item(container: ft.Column, item_row):
@@ -284,151 +386,51 @@ class SettingsSection(ft.Container):
 class BaseModelRender:
     def __init__(self):
         self.field_controls: dict[str, ft.Control] = {}
+        self.schema: FormSchema | None = None
 
     def render(self, model_instance: BaseModel) -> ft.Control:
         """将BaseModel实例渲染为Flet控件"""
-        model_type = type(model_instance)
-        sections = self._build_sections_from_model(model_type, model_instance)
-        
+        self.schema = compile_form_schema(type(model_instance))
+        self.field_controls = {}
+        sections: list[ft.Control] = []
+        for title, specs in self.schema.sections:
+            items = []
+            for spec in specs:
+                control = build_control(spec, self._value_of(model_instance, spec))
+                # 嵌套字段使用 "字段.子字段" 作为 key
+                self.field_controls[spec.key] = control
+                items.append(SettingItem(spec.title, spec.description, control))
+            sections.append(SettingsSection(title, items))
         return ft.Column(controls=sections, expand=True)
 
-    def _build_sections_from_model(self, model_class, config_instance=None) -> list[ft.Control]:
-        """从 Pydantic 模型构建设置部分"""
-        sections = []
-        model_fields = model_class.model_fields
-
-        if config_instance is not None:
-            current_config = config_instance
-        else:
-            current_config = model_class()
-
-        # 处理嵌套字段
-        for field_name, field_info in model_fields.items():
-            field_type = field_info.annotation
-            current_value = (
-                getattr(current_config, field_name, None) if current_config else None
-            )
-
-            # 检查字段是否是嵌套的 BaseModel（支持一层嵌套）
-            try:
-                if isinstance(field_type, type) and issubclass(field_type, BaseModel):
-                    # 这是一个嵌套模型，创建一个分组部分
-                    nested_items = self._build_items_from_model(
-                        field_type, current_value
-                    )
-                    if nested_items:
-                        section = SettingsSection(
-                            field_info.title or field_name, nested_items
-                        )
-                        sections.append(section)
-            except (TypeError, AttributeError):
-                pass
-
-        # 处理普通字段
-        regular_fields = []
-        for field_name, field_info in model_fields.items():
-            field_type = field_info.annotation
-            current_value = (
-                getattr(current_config, field_name, None) if current_config else None
-            )
-
-            try:
-                if isinstance(field_type, type) and issubclass(field_type, BaseModel):
-                    continue  # 已处理过的嵌套模型
-            except (TypeError, AttributeError):
-                pass
-
-            control = create_control_for_field(field_type, field_info, current_value)
-            self.field_controls[field_name] = control
-
-            # 清理 description 中的 @ui 指令
-            description = field_info.description or ""
-            clean_description, _ = parse_ui_config(description)
-
-            item = SettingItem(
-                field_info.title or field_name,
-                clean_description,
-                control,
+    @staticmethod
+    def _value_of(model_instance: BaseModel | None, spec: FieldSpec) -> Any:
+        value: Any = model_instance
+        for name in spec.path:
+            if value is None:
+                return None
+            value = getattr(value, name, None)
+        return value
+
+    def set_values(self, model_instance: BaseModel):
+        """将已渲染的控件就地改为另一个实例的值，调用方需 update"""
+        assert self.schema is not None, "请先调用 render"
+        for spec in self.schema.fields:
+            set_control_value(
+                spec,
+                self.field_controls[spec.key],
+                self._value_of(model_instance, spec),
             )
-            regular_fields.append(item)
-
-        # 如果有常规字段，添加一个通用设置部分
-        if regular_fields:
-            sections.append(SettingsSection("通用设置", regular_fields))
-
-        return sections
-
-    def _build_items_from_model(
-        self, model_class: type[BaseModel], current_instance: BaseModel | None = None
-    ) -> list[ft.Control]:
-        """从嵌套的 Pydantic 模型构建设置项"""
-        items = []
-        model_fields = model_class.model_fields
-
-        for field_name, field_info in model_fields.items():
-            field_type = field_info.annotation
-            current_value = (
-                getattr(current_instance, field_name, None)
-                if current_instance
-                else None
-            )
-
-            control = create_control_for_field(field_type, field_info, current_value)
-            # 使用嵌套路径作为 key
-            full_field_name = f"{model_class.__name__}.{field_name}"
-            self.field_controls[full_field_name] = control
-
-            # 清理 description 中的 @ui 指令
-            description = field_info.description or ""
-            clean_description, _ = parse_ui_config(description)
-
-            item = SettingItem(
-                field_info.title or field_name,
-                clean_description,
-                control,
-            )
-            items.append(item)
-
-        return items
 
     def get_values(self) -> dict[str, Any]:
         """获取所有控件的值"""
-        settings = {}
-        for field_name, control in self.field_controls.items():
-            # 特殊处理列表控件
-            if (
-                isinstance(control, ft.Column)
-                and len(control.controls) >= 2
-                and hasattr(control.controls[0], "controls")
-            ):
-                # 这是一个列表控件，提取其中的值
-                list_items_column = control.controls[0]
-                values = []
-
-                for list_row in list_items_column.controls:
-                    if isinstance(list_row, ft.Row) and len(list_row.controls) >= 1:
-                        text_control = list_row.controls[0]
-                        if isinstance(text_control, ft.Text):
-                            values.append(text_control.value)
-
-                value = values
-            elif isinstance(control, ft.Slider):
-                value = control.value
-            elif isinstance(control, ft.Switch):
-                value = control.value
-            elif isinstance(control, ft.TextField):
-                value = control.value
-            else:
-                value = None
-
-            # 处理嵌套字段的情况 (例如: "ModelName.fieldName")
-            if "." in field_name:
-                # 嵌套字段，需要重构回嵌套结构
-                model_name, field_name_part = field_name.split(".", 1)
-                if model_name not in settings:
-                    settings[model_name] = {}
-                settings[model_name][field_name_part] = value
-            else:
-                # 普通字段
-                settings[field_name] = value
-        return settings
\ No newline at end of file
+        assert self.schema is not None, "请先调用 render"
+        settings: dict[str, Any] = {}
+        for spec in self.schema.fields:
+            value = get_control_value(spec, self.field_controls[spec.key])
+            # 嵌套字段需要重构回嵌套结构
+            target = settings
+            for name in spec.path[:-1]:
+                target = target.setdefault(name, {})
+            target[spec.path[-1]] = value
+        return settings
@@ -0,0 +1,305 @@
+"""模型响应的磁盘缓存
+
+在预设的 extra 中设置 `cache = true` 开启，可选项：
+- `cache_ttl`：缓存有效期（秒），默认 RESPONSE_CACHE_TTL
+- `cache_replay`：`"realtime"`（默认，按录制时的节奏回放流式输出）或 `"instant"`
+
+缓存键是预设（名称、协议、地址、模型）、模型参数（top_p、temperature、
+max_tokens、stream）与完整消息列表的规范化 JSON 的 SHA-256。
+条目以 JSON 文件保存在 RESPONSE_CACHE_DIR 下，以文件 mtime 作为最近访问时间，
+按 LRU 淘汰以限制总大小与条目数。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Iterable
+from pathlib import Path
+from typing import Any
+
+from amrita_core.protocol import (
+    COMPLETION_RETURNING,
+    MessageContent,
+    ModelAdapter,
+    StringMessageContent,
+)
+from amrita_core.types import ModelPreset, ToolCall, UniResponse
+from pydantic import BaseModel
+from typing_extensions import Self
+
+from ..constants import RESPONSE_CACHE_DIR
+from .adapters import wrap_adapters
+
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_MAX_ENTRIES = 10000
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    return value
+
+
+def cache_key(
+    preset: ModelPreset, max_tokens: int | None, kind: str, payload: Any
+) -> str:
+    """计算缓存键（不包含 api_key）"""
+    canonical = json.dumps(
+        {
+            "kind": kind,
+            "preset": preset.name,
+            "protocol": preset.protocol,
+            "base_url": preset.base_url,
+            "model": preset.model,
+            "top_p": preset.config.top_p,
+            "temperature": preset.config.temperature,
+            "stream": preset.config.stream,
+            "max_tokens": max_tokens,
+            "payload": _to_jsonable(payload),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """按 LRU 淘汰的磁盘缓存，并按预设统计命中率"""
+
+    _instance = None
+    _index: OrderedDict[str, int]  # 键 -> 文件大小，按最近访问排序
+    _total_bytes: int
+    _loaded: bool
+    _hits: dict[str, int]
+    _misses: dict[str, int]
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._index = OrderedDict()
+            cls._total_bytes = 0
+            cls._loaded = False
+            cls._hits = {}
+            cls._misses = {}
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    @staticmethod
+    def _path(key: str) -> Path:
+        return RESPONSE_CACHE_DIR / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        """首次使用时扫描缓存目录，按 mtime 重建 LRU 顺序（需持有锁）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        entries = []
+        for file in RESPONSE_CACHE_DIR.glob("*/*.json"):
+            stat = file.stat()
+            entries.append((stat.st_mtime, file.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def _evict(self):
+        while self._index and (
+            self._total_bytes > RESPONSE_CACHE_MAX_BYTES
+            or len(self._index) > RESPONSE_CACHE_MAX_ENTRIES
+        ):
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def _drop(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str, ttl: float) -> dict[str, Any] | None:
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            path = self._path(key)
+            try:
+                entry = json.loads(path.read_text("utf-8"))
+            except (OSError, ValueError):
+                self._drop(key)
+                return None
+            if time.time() - entry["created"] > ttl:
+                self._drop(key)
+                return None
+            self._index.move_to_end(key)
+            os.utime(path)
+            return entry
+
+    def put(self, key: str, entry: dict[str, Any]):
+        data = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(data, "utf-8")
+            tmp.replace(path)
+            size = path.stat().st_size
+            self._total_bytes += size - self._index.get(key, 0)
+            self._index[key] = size
+            self._index.move_to_end(key)
+            self._evict()
+
+    def record(self, preset: str, hit: bool):
+        counter = self._hits if hit else self._misses
+        with self._lock:
+            counter[preset] = counter.get(preset, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._drop(key)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            presets = {}
+            for name in self._hits.keys() | self._misses.keys():
+                hits = self._hits.get(name, 0)
+                misses = self._misses.get(name, 0)
+                presets[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses),
+                }
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "presets": presets,
+            }
+
+
+def _cache_options(preset: ModelPreset) -> tuple[bool, float, bool]:
+    extra = preset.extra or {}
+    return (
+        bool(extra.get("cache", False)),
+        float(extra.get("cache_ttl", RESPONSE_CACHE_TTL)),
+        extra.get("cache_replay", "realtime") == "realtime",
+    )
+
+
+def _dump_response(response: UniResponse) -> dict[str, Any]:
+    return {
+        "content": response.content,
+        "usage": response.usage.model_dump(mode="json") if response.usage else None,
+        "tool_calls": _to_jsonable(response.tool_calls),
+    }
+
+
+def _load_response(data: dict[str, Any]) -> UniResponse:
+    tool_calls = data.get("tool_calls")
+    return UniResponse(
+        role="assistant",
+        content=data.get("content"),
+        usage=data.get("usage"),
+        tool_calls=(
+            [ToolCall.model_validate(call) for call in tool_calls]
+            if tool_calls is not None
+            else None
+        ),
+    )
+
+
+class _CachingMixin(ModelAdapter):
+    """为已注册的适配器加上响应缓存，由 install_response_cache 动态混入"""
+
+    __abstract__ = True
+    __response_cache__ = True
+
+    async def call_api(
+        self, messages: Iterable
+    ) -> AsyncGenerator[COMPLETION_RETURNING, None]:
+        enabled, ttl, realtime = _cache_options(self.preset)
+        if not enabled:
+            async for item in super().call_api(messages):
+                yield item
+            return
+
+        messages = list(messages)
+        cache = ResponseCache()
+        key = cache_key(self.preset, self.config.llm.max_tokens, "api", messages)
+        entry = await asyncio.to_thread(cache.get, key, ttl)
+        cache.record(self.preset.name, entry is not None)
+        if entry is not None:
+            last = 0.0
+            for offset, text in entry["chunks"]:
+                if realtime and offset > last:
+                    await asyncio.sleep(offset - last)
+                last = offset
+                yield StringMessageContent(text)
+            yield _load_response(entry["response"])
+            return
+
+        start = time.perf_counter()
+        chunks: list[tuple[float, str]] = []
+        async for item in super().call_api(messages):
+            if isinstance(item, UniResponse):
+                await asyncio.to_thread(
+                    cache.put,
+                    key,
+                    {
+                        "created": time.time(),
+                        "chunks": chunks,
+                        "response": _dump_response(item),
+                    },
+                )
+            elif isinstance(item, (str, MessageContent)):
+                text = item if isinstance(item, str) else str(item.get_content())
+                chunks.append((time.perf_counter() - start, text))
+            yield item
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: Any = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        enabled, ttl, _ = _cache_options(self.preset)
+        if not enabled:
+            return await super().call_tools(messages, tools, tool_choice)
+
+        messages = list(messages)
+        cache = ResponseCache()
+        key = cache_key(
+            self.preset,
+            self.config.llm.max_tokens,
+            "tools",
+            {"messages": messages, "tools": tools, "tool_choice": tool_choice},
+        )
+        entry = await asyncio.to_thread(cache.get, key, ttl)
+        cache.record(self.preset.name, entry is not None)
+        if entry is not None:
+            return _load_response(entry["response"])
+        response = await super().call_tools(messages, tools, tool_choice)
+        await asyncio.to_thread(
+            cache.put,
+            key,
+            {"created": time.time(), "response": _dump_response(response)},
+        )
+        return response
+
+
+def install_response_cache():
+    """为所有已注册的适配器包装缓存层，可重复调用"""
+    wrap_adapters(_CachingMixin, "Cached", "__response_cache__")
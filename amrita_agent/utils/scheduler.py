@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import time
+from collections import Counter, deque
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+from amrita_core import ModelPreset
+from typing_extensions import Self
+
+SCHEDULER_MAX_CONCURRENCY = 4
+WAIT_WINDOW = 256  # 保留最近多少次等待耗时用于统计
+
+
+class Priority(IntEnum):
+    """数值越小越先调度"""
+
+    FOREGROUND = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class TokenBucket:
+    """令牌桶：每分钟补充 rpm 个令牌，最多积攒 burst 个"""
+
+    def __init__(self, rpm: float, burst: int = 1):
+        self.rate = rpm / 60
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def try_take(self) -> float:
+        """取走一个令牌并返回 0；令牌不足时返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class _Ticket:
+    session_id: str
+    preset: str
+    priority: Priority
+    seq: int
+    enqueued: float = field(default_factory=time.monotonic)
+    future: asyncio.Future[None] = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+
+class TurnScheduler:
+    """对话轮次调度器
+
+    - 同一会话内的轮次按提交顺序串行执行
+    - 不同会话并行执行，受全局并发上限与预设并发上限约束
+    - 预设可配置令牌桶限速
+    - 前台会话的轮次优先调度，同优先级内先到先得
+
+    预设的限制从 `ModelPreset.extra` 读取：
+    `max_concurrency`（并发上限）、`rpm`（每分钟请求数）、`burst`（突发上限）。
+    """
+
+    _instance = None
+    _max_concurrency: int
+    _foreground: str | None
+    _queues: dict[str, deque[_Ticket]]
+    _busy_sessions: set[str]
+    _active: Counter[str]
+    _preset_limits: dict[str, int]
+    _buckets: dict[str, TokenBucket]
+    _timer: asyncio.TimerHandle | None
+    _seq: itertools.count
+    _waits: deque[float]
+    _completed: int
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._max_concurrency = SCHEDULER_MAX_CONCURRENCY
+            cls._foreground = None
+            cls._queues = {}
+            cls._busy_sessions = set()
+            cls._active = Counter()
+            cls._preset_limits = {}
+            cls._buckets = {}
+            cls._timer = None
+            cls._seq = itertools.count()
+            cls._waits = deque(maxlen=WAIT_WINDOW)
+            cls._completed = 0
+        return cls._instance
+
+    def set_max_concurrency(self, value: int):
+        self._max_concurrency = max(value, 1)
+        self._dispatch()
+
+    def set_foreground(self, session_id: str | None):
+        """设置前台会话，其排队中的轮次立即提升为最高优先级"""
+        self._foreground = session_id
+        self._dispatch()
+
+    def configure_preset(self, preset: ModelPreset):
+        """从预设的 extra 中读取并发上限与限速配置"""
+        extra: dict[str, Any] = preset.extra or {}
+        if limit := extra.get("max_concurrency"):
+            self._preset_limits[preset.name] = int(limit)
+        else:
+            self._preset_limits.pop(preset.name, None)
+        if rpm := extra.get("rpm"):
+            bucket = self._buckets.get(preset.name)
+            burst = int(extra.get("burst", 1))
+            if bucket is None or bucket.rate != rpm / 60 or bucket.capacity != burst:
+                self._buckets[preset.name] = TokenBucket(float(rpm), burst)
+        else:
+            self._buckets.pop(preset.name, None)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _priority(self, ticket: _Ticket) -> Priority:
+        if ticket.session_id == self._foreground:
+            return Priority.FOREGROUND
+        return ticket.priority
+
+    def _dispatch(self):
+        """按优先级依次放行满足并发与限速条件的会话队首轮次"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        heads = sorted(
+            (
+                queue[0]
+                for session_id, queue in self._queues.items()
+                if queue and session_id not in self._busy_sessions
+            ),
+            key=lambda t: (self._priority(t), t.seq),
+        )
+        retry_after: float | None = None
+        for ticket in heads:
+            if sum(self._active.values()) >= self._max_concurrency:
+                break
+            limit = self._preset_limits.get(ticket.preset)
+            if limit is not None and self._active[ticket.preset] >= limit:
+                continue
+            if bucket := self._buckets.get(ticket.preset):
+                wait = bucket.try_take()
+                if wait:
+                    retry_after = min(retry_after or wait, wait)
+                    continue
+            self._queues[ticket.session_id].popleft()
+            self._busy_sessions.add(ticket.session_id)
+            self._active[ticket.preset] += 1
+            self._waits.append(time.monotonic() - ticket.enqueued)
+            ticket.future.set_result(None)
+        if retry_after is not None:
+            self._timer = asyncio.get_running_loop().call_later(
+                retry_after, self._dispatch
+            )
+
+    def _release(self, ticket: _Ticket):
+        self._busy_sessions.discard(ticket.session_id)
+        self._active[ticket.preset] -= 1
+        if not self._active[ticket.preset]:
+            del self._active[ticket.preset]
+        if not self._queues.get(ticket.session_id, True):
+            del self._queues[ticket.session_id]
+        self._completed += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        session_id: str,
+        preset: ModelPreset,
+        priority: Priority = Priority.NORMAL,
+    ) -> AsyncGenerator[None, None]:
+        """排队等待执行一轮对话，退出上下文时释放"""
+        self.configure_preset(preset)
+        ticket = _Ticket(session_id, preset.name, priority, next(self._seq))
+        self._queues.setdefault(session_id, deque()).append(ticket)
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # 放行与取消同时发生
+                self._release(ticket)
+            else:
+                queue = self._queues.get(session_id)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue and session_id not in self._busy_sessions:
+                        del self._queues[session_id]
+                self._dispatch()
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits)
+        now = time.monotonic()
+        depth_by_preset: Counter[str] = Counter(
+            ticket.preset for queue in self._queues.values() for ticket in queue
+        )
+        oldest = min(
+            (queue[0].enqueued for queue in self._queues.values() if queue),
+            default=None,
+        )
+        return {
+            "max_concurrency": self._max_concurrency,
+            "active": sum(self._active.values()),
+            "active_by_preset": dict(self._active),
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_preset": dict(depth_by_preset),
+            "completed": self._completed,
+            "oldest_wait_ms": (now - oldest) * 1000 if oldest is not None else 0.0,
+            "avg_wait_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "p95_wait_ms": waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000
+            if waits
+            else 0.0,
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import inspect
+import json
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class PhaseRecord:
+    name: str
+    start_ms: float
+    end_ms: float
+    thread: str
+    ok: bool = True
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.end_ms - self.start_ms
+
+
+class StartupProfiler:
+    """记录启动阶段耗时，并在每个阶段开始/结束时推送进度
+
+    同步函数放到线程中执行，协程直接在事件循环中等待。
+    """
+
+    def __init__(
+        self,
+        total: int,
+        on_progress: Callable[[str], None] | None = None,
+    ):
+        self.total = total
+        self.on_progress = on_progress
+        self.records: list[PhaseRecord] = []
+        self._running: list[str] = []
+        self._origin = time.perf_counter()
+        self._started_at = datetime.now()
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    def _notify(self, message: str):
+        if self.on_progress is not None:
+            self.on_progress(message)
+
+    async def run(
+        self,
+        name: str,
+        func: Callable[..., T] | Callable[..., Awaitable[T]],
+        *args: Any,
+    ) -> T:
+        self._running.append(name)
+        self._notify(f"正在{'、'.join(self._running)}...")
+        start = self._now_ms()
+        thread = threading.current_thread().name
+
+        def call() -> T:
+            nonlocal thread
+            thread = threading.current_thread().name
+            return func(*args)  # type: ignore[return-value]
+
+        try:
+            if inspect.iscoroutinefunction(func):
+                result = await func(*args)
+            else:
+                result = await asyncio.to_thread(call)
+        except Exception as e:
+            self.records.append(
+                PhaseRecord(name, start, self._now_ms(), thread, False, repr(e))
+            )
+            self._running.remove(name)
+            raise
+        record = PhaseRecord(name, start, self._now_ms(), thread)
+        self.records.append(record)
+        self._running.remove(name)
+        self._notify(
+            f"[{len(self.records)}/{self.total}] {name} 完成 ({record.duration_ms:.0f}ms)"
+        )
+        return result
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "started_at": self._started_at.isoformat(),
+            "total_ms": self._now_ms(),
+            "phases": [
+                {**asdict(record), "duration_ms": record.duration_ms}
+                for record in sorted(self.records, key=lambda r: r.start_ms)
+            ],
+        }
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"启动耗时 {report['total_ms']:.0f}ms"]
+        lines.extend(
+            f"  {phase['name']:<16}{phase['start_ms']:>8.0f}ms +{phase['duration_ms']:.0f}ms"
+            + ("" if phase["ok"] else f"  失败: {phase['error']}")
+            for phase in report["phases"]
+        )
+        return "\n".join(lines)
+
+    def export(self, path: Path | None = None) -> Path:
+        """导出 JSON 报告，默认写入 DATA_DIR/startup_report.json"""
+        if path is None:
+            # constants 会导入 amrita_core，本模块需在首帧前保持轻量
+            from ..constants import DATA_DIR
+
+            path = DATA_DIR / "startup_report.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(self.report(), indent=2, ensure_ascii=False), "utf-8"
+        )
+        return path
@@ -0,0 +1,301 @@
+"""智能体模式下的并行工具调用
+
+模型在一步中返回的多个工具调用彼此独立：适配器返回工具调用后立即将它们
+全部提交并发执行，内核随后按原顺序逐个调用工具函数时直接取得对应的结果，
+因此写入上下文的结果顺序与串行执行时相同。
+
+- 协程工具在事件循环中执行；`simple_tool` 包装的同步函数放到有界线程池中，
+  避免阻塞事件循环
+- 每次调用都有超时，默认取 `AgentConfig.agent_tool_timeout`，可按工具覆盖
+- 自定义运行（custom_run）的工具依赖事件上下文，仍由内核串行执行
+- 工具函数在安装时包装一次，之后注册的工具需用 `prefetchable` 包装才会被预取
+- 只在 AgentTurn 开启的作用域内且开启并行时预取，其余调用方式的行为不变
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from amrita_core import logger
+from amrita_core.chatmanager import RESPONSE_TYPE
+from amrita_core.protocol import MessageWithMetadata, ModelAdapter
+from amrita_core.sessions import SessionsManager
+from amrita_core.tools.manager import MultiToolsManager, ToolsManager
+from amrita_core.types import ToolCall, UniResponse
+from typing_extensions import Self
+
+from ..config import get_config
+from .adapters import wrap_adapters
+from .metrics import TOOL_EXEC_SECONDS
+from .tracing import propagate, span
+
+TOOL_THREAD_WORKERS = 8  # 执行同步工具的线程数
+
+ToolFunc = Callable[[dict[str, Any]], Awaitable[str]]
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+
+def _call_key(name: str, args: dict[str, Any]) -> str:
+    return json.dumps([name, args], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _is_blocking(func: ToolFunc) -> bool:
+    """simple_tool 以协程包装同步函数，原函数可通过 __wrapped__ 取得"""
+    original = inspect.unwrap(func)
+    return original is not func and not inspect.iscoroutinefunction(original)
+
+
+def _run_blocking(func: ToolFunc, args: dict[str, Any]) -> str:
+    # 在工作线程中直接调用同步函数，参数绑定与 simple_tool 的包装协程一致
+    original = inspect.unwrap(func)
+    bound = inspect.signature(original).bind(**args)
+    bound.apply_defaults()
+    return str(original(**bound.arguments))
+
+
+@dataclass
+class _Batch:
+    """模型一步中返回的一组工具调用"""
+
+    names: list[str]
+    started: float = field(default_factory=time.perf_counter)
+    done: int = 0
+    failed: int = 0
+
+
+class ToolScope:
+    """一轮对话内预取的工具调用
+
+    `on_progress` 不为空时按批次报告进度（开始与全部完成各一次），
+    此时这些调用的逐个通知由调用方通过 `is_batched` 过滤掉。
+    """
+
+    def __init__(self, session_id: str, on_progress: ProgressCallback | None = None):
+        self.session_id = session_id
+        self.on_progress = on_progress
+        self._pending: dict[str, deque[asyncio.Task[str]]] = {}
+        self._batched_ids: set[str] = set()
+
+    @contextmanager
+    def activate(self) -> Iterator[Self]:
+        """在此期间创建的任务（即对话任务）都使用本作用域"""
+        token = _scope.set(self)
+        try:
+            yield self
+        finally:
+            _scope.reset(token)
+
+    def is_batched(self, item: RESPONSE_TYPE) -> bool:
+        """是否为已按批次报告的工具调用的通知"""
+        if self.on_progress is None or not isinstance(item, MessageWithMetadata):
+            return False
+        meta = item.get_metadata()
+        return (
+            meta.get("type") == "function_call"
+            and meta.get("tool_id") in self._batched_ids
+        )
+
+    def add(self, key: str, tool_id: str, task: asyncio.Task[str]):
+        self._pending.setdefault(key, deque()).append(task)
+        self._batched_ids.add(tool_id)
+
+    def take(self, key: str) -> asyncio.Task[str] | None:
+        tasks = self._pending.get(key)
+        if not tasks:
+            return None
+        task = tasks.popleft()
+        if not tasks:
+            del self._pending[key]
+        return task
+
+    def close(self):
+        """取消未被内核取用的调用（例如工作流中途终止）"""
+        for tasks in self._pending.values():
+            for task in tasks:
+                task.cancel()
+        self._pending.clear()
+
+    async def _report(self, text: str):
+        if self.on_progress is not None:
+            await self.on_progress(text)
+
+
+_scope: contextvars.ContextVar[ToolScope | None] = contextvars.ContextVar(
+    "amrita_tool_scope", default=None
+)
+
+
+class _ExecutorTool:
+    """包装 ToolData.func：取用预取的结果，没有预取时直接调用原函数"""
+
+    def __init__(self, name: str, func: ToolFunc):
+        functools.update_wrapper(self, func)
+        self.name = name
+        self.func = func
+
+    async def __call__(self, args: dict[str, Any]) -> str:
+        scope = _scope.get()
+        if scope is not None and (task := scope.take(_call_key(self.name, args))):
+            return await task
+        return await self.func(args)
+
+
+def prefetchable(name: str, func: ToolFunc) -> ToolFunc:
+    """包装工具函数，使内核调用时可取用预取的结果"""
+    if isinstance(func, _ExecutorTool):
+        return func
+    return _ExecutorTool(name, func)
+
+
+class ToolExecutor:
+    """并发执行同一步中的工具调用"""
+
+    _instance = None
+    _threads: ThreadPoolExecutor
+    _timeouts: dict[str, float]
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._threads = ThreadPoolExecutor(
+                TOOL_THREAD_WORKERS, thread_name_prefix="amrita-tool"
+            )
+            cls._timeouts = {}
+        return cls._instance
+
+    def set_timeout(self, name: str, seconds: float | None):
+        """为单个工具设置超时，None 表示恢复默认"""
+        if seconds is None:
+            self._timeouts.pop(name, None)
+        else:
+            self._timeouts[name] = seconds
+
+    def timeout_for(self, name: str) -> float:
+        return self._timeouts.get(name, get_config().agent_tool_timeout)
+
+    async def execute(self, name: str, func: ToolFunc, args: dict[str, Any]) -> str:
+        timeout = self.timeout_for(name)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with span("tool.exec", tool=name):
+                if _is_blocking(func):
+                    call = asyncio.get_running_loop().run_in_executor(
+                        self._threads, propagate(_run_blocking), func, args
+                    )
+                else:
+                    call = func(args)
+                result = await asyncio.wait_for(call, timeout)
+            status = "ok"
+            return result
+        except asyncio.TimeoutError:
+            status = "timeout"
+            raise TimeoutError(f"工具 {name} 执行超时（{timeout}s）") from None
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            TOOL_EXEC_SECONDS.observe(
+                time.perf_counter() - start, tool=name, status=status
+            )
+
+    async def _execute_in_batch(
+        self,
+        scope: ToolScope,
+        batch: _Batch,
+        name: str,
+        func: ToolFunc,
+        args: dict[str, Any],
+    ) -> str:
+        try:
+            result = await self.execute(name, func, args)
+        except asyncio.CancelledError:
+            raise  # 被取消时对话已结束，不再报告
+        except Exception:
+            batch.failed += 1
+            await self._finish(scope, batch)
+            raise
+        await self._finish(scope, batch)
+        return result
+
+    async def _finish(self, scope: ToolScope, batch: _Batch):
+        batch.done += 1
+        if batch.done == len(batch.names):
+            elapsed = time.perf_counter() - batch.started
+            await scope._report(
+                f"{len(batch.names)} 个工具调用完成"
+                + (f"，{batch.failed} 个失败" if batch.failed else "")
+                + f"，用时 {elapsed:.2f}s\n"
+            )
+
+    def _tools_manager(self, scope: ToolScope) -> MultiToolsManager:
+        # 与内核 agent 工作流查找工具的方式一致
+        session = SessionsManager().get_session_data(scope.session_id, None)
+        return session.tools if session else ToolsManager()
+
+    async def prefetch(self, calls: list[ToolCall]):
+        """在作用域内开始执行模型一步中返回的工具调用"""
+        scope = _scope.get()
+        if scope is None or not get_config().agent_parallel_tool_calls:
+            return
+        manager = self._tools_manager(scope)
+        prepared: list[tuple[ToolCall, _ExecutorTool, dict[str, Any]]] = []
+        for call in calls:
+            tool = manager.get_tool(call.function.name)
+            # 未包装的工具取不到预取的结果，仍由内核串行执行
+            if tool is None or not isinstance(tool.func, _ExecutorTool):
+                continue
+            try:
+                args = json.loads(call.function.arguments)
+            except ValueError:
+                continue  # 交由内核按原逻辑报错
+            prepared.append((call, tool.func, args))
+        if not prepared:
+            return
+
+        batch = _Batch([call.function.name for call, _, _ in prepared])
+        await scope._report(
+            f"并行调用 {len(batch.names)} 个工具：{', '.join(batch.names)}\n"
+        )
+        for call, tool, args in prepared:
+            name = call.function.name
+            task = asyncio.create_task(
+                self._execute_in_batch(scope, batch, name, tool.func, args)
+            )
+            scope.add(_call_key(name, args), call.id, task)
+        logger.debug(f"已并行提交 {len(prepared)} 个工具调用: {batch.names}")
+
+
+class _PrefetchMixin(ModelAdapter):
+    """适配器返回工具调用后立即提交执行，由 install_tool_executor 动态混入"""
+
+    __abstract__ = True
+    __tool_executor__ = True
+
+    async def call_tools(
+        self,
+        messages: Any,
+        tools: list,
+        tool_choice: Any = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        response = await super().call_tools(messages, tools, tool_choice)
+        if response.tool_calls:
+            await ToolExecutor().prefetch(response.tool_calls)
+        return response
+
+
+def install_tool_executor():
+    """为所有已注册的适配器加上工具调用预取，并包装已注册的工具，可重复调用"""
+    wrap_adapters(_PrefetchMixin, "Parallel", "__tool_executor__")
+    for name, tool in ToolsManager().get_tools().items():
+        if not tool.custom_run:
+            tool.func = prefetchable(name, tool.func)  # type: ignore[arg-type]
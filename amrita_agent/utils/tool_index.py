@@ -0,0 +1,245 @@
+"""RAG 工具调用模式下按查询挑选相关工具
+
+`tool_calling_mode = "rag"` 时，适配器在请求模型前用最后一条用户消息检索
+工具索引，只发送最相关的 TOOL_INDEX_TOP_K 个已注册工具，而不是全部工具描述；
+请求中不在索引里的工具（例如内核的内置工具）总是原样发送。
+
+索引由工具管理器中注册的工具构成，以工具名称、描述与参数说明的向量构成矩阵，
+检索为一次矩阵乘法。注册表变化时才同步索引，每个工具记录其描述的指纹，
+只为新增或变更的工具计算向量；索引保存在 TOOL_INDEX_PATH，重启后无需重新计算。
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from collections.abc import Collection, Iterable
+from typing import Any
+
+import numpy as np
+from amrita_core import logger
+from amrita_core.protocol import ModelAdapter
+from amrita_core.tools.manager import ToolsManager
+from amrita_core.types import ToolCall, UniResponse
+from typing_extensions import Self
+
+from ..config import get_config
+from ..constants import TOOL_INDEX_PATH
+from .adapters import wrap_adapters
+from .embedding import get_embedder, top_k
+
+TOOL_INDEX_TOP_K = 8  # 每次请求最多发送的工具数（不含非注册工具）
+
+
+def _as_dict(value: Any) -> dict[str, Any]:
+    return value if isinstance(value, dict) else value.model_dump()
+
+
+def _tool_text(tool: dict[str, Any]) -> str:
+    function = tool.get("function", {})
+    parts = [function.get("name", ""), function.get("description") or ""]
+    properties = (function.get("parameters") or {}).get("properties") or {}
+    for name, prop in properties.items():
+        parts.append(f"{name} {(prop or {}).get('description') or ''}")
+    return "\n".join(parts)
+
+
+def _tool_name(tool: Any) -> str:
+    return _as_dict(tool)["function"]["name"]
+
+
+def _fingerprint(tool: dict[str, Any]) -> str:
+    canonical = json.dumps(tool, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def _last_user_text(messages: Iterable[Any]) -> str:
+    for message in reversed(list(messages)):
+        message = _as_dict(message)
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, list):
+            return "".join(
+                part.get("text", "") for part in content if isinstance(part, dict)
+            )
+        return content or ""
+    return ""
+
+
+class ToolIndex:
+    """工具描述的向量索引"""
+
+    _instance = None
+    _names: list[str]
+    _fingerprints: list[str]
+    _matrix: np.ndarray | None
+    _embedder_name: str | None
+    _registry_key: tuple[str, frozenset[tuple[str, int]]] | None
+    _loaded: bool
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._names = []
+            cls._fingerprints = []
+            cls._matrix = None
+            cls._embedder_name = None
+            cls._registry_key = None
+            cls._loaded = False
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    def _load(self):
+        self._loaded = True
+        try:
+            with np.load(TOOL_INDEX_PATH) as data:
+                embedder = str(data["embedder"])
+                if embedder != get_embedder().name:
+                    return  # 向量化方式已变，全部重新计算
+                self._names = [str(n) for n in data["names"]]
+                self._fingerprints = [str(f) for f in data["fingerprints"]]
+                self._matrix = data["matrix"]
+                self._embedder_name = embedder
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def _save(self):
+        assert self._matrix is not None
+        TOOL_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = TOOL_INDEX_PATH.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            embedder=np.array(self._embedder_name),
+            names=np.array(self._names),
+            fingerprints=np.array(self._fingerprints),
+            matrix=self._matrix,
+        )
+        tmp.replace(TOOL_INDEX_PATH)
+
+    def sync(self, tools: list[dict[str, Any]]) -> int:
+        """使索引与给定的工具集合一致，返回重新计算向量的工具数"""
+        embedder = get_embedder()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self._embedder_name != embedder.name:
+                self._names, self._fingerprints, self._matrix = [], [], None
+                self._embedder_name = embedder.name
+
+            wanted = {_tool_name(t): _as_dict(t) for t in tools}
+            fingerprints = {name: _fingerprint(t) for name, t in wanted.items()}
+            current = dict(zip(self._names, self._fingerprints))
+            if current == fingerprints:
+                return 0
+
+            # 保留未变化的行，只为新增或变更的工具计算向量
+            keep = [
+                i
+                for i, name in enumerate(self._names)
+                if fingerprints.get(name) == self._fingerprints[i]
+            ]
+            kept_names = {self._names[i] for i in keep}
+            changed = [name for name in wanted if name not in kept_names]
+            parts = []
+            if keep and self._matrix is not None:
+                parts.append(self._matrix[keep])
+            if changed:
+                parts.append(embedder.embed([_tool_text(wanted[n]) for n in changed]))
+            self._names = [self._names[i] for i in keep] + changed
+            self._fingerprints = [fingerprints[n] for n in self._names]
+            self._matrix = (
+                np.concatenate(parts)
+                if parts
+                else np.zeros((0, embedder.dim), dtype=np.float32)
+            )
+            self._save()
+            logger.debug(
+                f"工具索引已更新：{len(self._names)} 个工具，重新计算 {len(changed)} 个"
+            )
+            return len(changed)
+
+    def refresh(self) -> int:
+        """工具注册表或向量化方式变化时同步索引，返回重新计算向量的工具数"""
+        registered = ToolsManager().get_tools()
+        # 注册表中的 ToolData 被替换时视为变化，指纹再决定是否需要重新计算
+        key = (
+            get_embedder().name,
+            frozenset((name, id(tool.data)) for name, tool in registered.items()),
+        )
+        if key == self._registry_key:
+            return 0
+        changed = self.sync([tool.data.model_dump() for tool in registered.values()])
+        self._registry_key = key
+        return changed
+
+    def search(
+        self,
+        query: str,
+        k: int = TOOL_INDEX_TOP_K,
+        names: Collection[str] | None = None,
+    ) -> list[tuple[str, float]]:
+        """检索最相关的 k 个工具，names 不为空时只在其中检索"""
+        with self._lock:
+            if self._matrix is None or not self._names:
+                return []
+            rows = [
+                i
+                for i, name in enumerate(self._names)
+                if names is None or name in names
+            ]
+            vector = get_embedder().embed([query])[0]
+            return [
+                (self._names[rows[i]], s)
+                for i, s in top_k(self._matrix[rows], vector, k)
+            ]
+
+    def select(
+        self, tools: list[Any], query: str, k: int = TOOL_INDEX_TOP_K
+    ) -> list[Any]:
+        """从 tools 的已注册工具中挑选与查询最相关的 k 个，保持原有顺序
+
+        不在索引中的工具总是保留；没有任何工具与查询相关时原样返回，避免随意截断。
+        """
+        self.refresh()
+        with self._lock:
+            indexed = {_tool_name(t) for t in tools} & set(self._names)
+        if len(indexed) <= k:
+            return tools
+        chosen = {name for name, score in self.search(query, k, indexed) if score > 0}
+        if not chosen:
+            return tools
+        return [
+            t for t in tools if (name := _tool_name(t)) not in indexed or name in chosen
+        ]
+
+
+class _ToolSelectionMixin(ModelAdapter):
+    """RAG 模式下只向模型发送相关的工具，由 install_tool_selection 动态混入"""
+
+    __abstract__ = True
+    __tool_selection__ = True
+
+    async def call_tools(
+        self,
+        messages: Iterable,
+        tools: list,
+        tool_choice: Any = None,
+    ) -> UniResponse[None, list[ToolCall] | None]:
+        # 指定了具体工具时（例如推理步骤）不做挑选
+        if (
+            get_config().tool_calling_mode == "rag"
+            and len(tools) > TOOL_INDEX_TOP_K
+            and (tool_choice is None or isinstance(tool_choice, str))
+        ):
+            messages = list(messages)
+            query = _last_user_text(messages)
+            if query:
+                tools = await asyncio.to_thread(ToolIndex().select, tools, query)
+        return await super().call_tools(messages, tools, tool_choice)
+
+
+def install_tool_selection():
+    """为所有已注册的适配器加上工具挑选，可重复调用"""
+    wrap_adapters(_ToolSelectionMixin, "Selecting", "__tool_selection__")
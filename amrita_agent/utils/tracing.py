@@ -0,0 +1,234 @@
+"""基于 span 的耗时追踪
+
+当前 span 保存在 contextvar 中：asyncio 任务与 asyncio.to_thread 会自动继承，
+其他线程可用 `propagate()` 包装函数以继承调用方的 span。
+最近的若干条追踪保存在环形缓冲区中，可导出为 Chrome trace / Perfetto
+可读取的 JSON（chrome://tracing 或 ui.perfetto.dev）。
+
+    with span("storage.save", session=sid):
+        ...
+
+    @traced("render.markdown")
+    def markdown_to_flet_controls(text): ...
+"""
+
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+from typing_extensions import ParamSpec, Self
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+TRACE_BUFFER_SIZE = 256  # 保留最近多少条追踪
+TRACE_MAX_SPANS = 2048  # 单条追踪最多记录的 span 数
+
+_ids = itertools.count(1)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: int | None
+    start_ns: int
+    end_ns: int | None = None
+    thread_id: int = 0
+    thread_name: str = ""
+    attrs: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "amrita_current_span", default=None
+)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+class Tracer:
+    """收集已结束的 span，按追踪分组保存在环形缓冲区中"""
+
+    _instance = None
+    enabled: bool
+    _traces: OrderedDict[int, list[Span]]
+    _lock: threading.Lock
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls.enabled = True
+            cls._traces = OrderedDict()
+            cls._lock = threading.Lock()
+        return cls._instance
+
+    def start(self, name: str, parent: Span | None = None, **attrs: Any) -> Span:
+        thread = threading.current_thread()
+        span_id = next(_ids)
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else span_id,
+            span_id=span_id,
+            parent_id=parent.span_id if parent is not None else None,
+            start_ns=time.perf_counter_ns(),
+            thread_id=thread.ident or 0,
+            thread_name=thread.name,
+            attrs=attrs,
+        )
+
+    def finish(self, span: Span, end_ns: int | None = None):
+        span.end_ns = end_ns if end_ns is not None else time.perf_counter_ns()
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > TRACE_BUFFER_SIZE:
+                    self._traces.popitem(last=False)
+            if len(spans) < TRACE_MAX_SPANS:
+                spans.append(span)
+
+    def record(
+        self, name: str, start_ns: int, end_ns: int | None = None, **attrs: Any
+    ) -> Span:
+        """记录一个已经发生的区间，作为当前 span 的子 span"""
+        span = self.start(name, current_span(), **attrs)
+        span.start_ns = start_ns
+        self.finish(span, end_ns)
+        return span
+
+    def traces(self) -> list[list[Span]]:
+        with self._lock:
+            return [list(spans) for spans in self._traces.values()]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        events: list[dict[str, Any]] = []
+        threads: dict[int, str] = {}
+        pid = os.getpid()
+        for spans in self.traces():
+            for span in spans:
+                threads[span.thread_id] = span.thread_name
+                events.append(
+                    {
+                        "name": span.name,
+                        "cat": span.name.split(".", 1)[0],
+                        "ph": "X",
+                        "ts": span.start_ns / 1000,
+                        "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000,
+                        "pid": pid,
+                        "tid": span.thread_id,
+                        "args": {
+                            **{k: str(v) for k, v in span.attrs.items()},
+                            "trace_id": span.trace_id,
+                            "span_id": span.span_id,
+                            "parent_id": span.parent_id,
+                            **({"error": span.error} if span.error else {}),
+                        },
+                    }
+                )
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in threads.items()
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: Path | None = None) -> Path:
+        """导出 Chrome trace JSON，默认写入 DATA_DIR/traces/"""
+        if path is None:
+            from ..constants import DATA_DIR
+
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = DATA_DIR / "traces" / f"trace-{stamp}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_chrome_trace()), "utf-8")
+        return path
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """在当前 span 之下开启子 span；没有当前 span 时开启新的追踪"""
+    tracer = Tracer()
+    if not tracer.enabled:
+        yield None
+        return
+    current = tracer.start(name, current_span(), **attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # 在异步生成器中跨任务关闭时 token 不属于当前上下文
+            _current.set(None)
+        tracer.finish(current)
+
+
+def traced(name: str | None = None) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """以 span 包装函数或协程函数，默认以函数的限定名命名"""
+
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def propagate(func: Callable[P, T]) -> Callable[P, T]:
+    """让在其他线程中执行的函数继承调用方的当前 span"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        # 同一 Context 不能被多个线程同时进入，每次调用使用副本
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
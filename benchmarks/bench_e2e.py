@@ -0,0 +1,165 @@
+"""端到端延迟基准：用模拟模型在 N 个并发会话上跑完整的对话管线
+
+    python -m benchmarks.bench_e2e [--sessions 8] [--turns 5] [--latency 0.2]
+                                   [--token-rate 200] [--tokens 200] [--no-stream] [--json]
+
+每轮依次经过：构建上下文 → 请求 → 流式输出 → 保存会话 → 渲染回复，
+与界面中的一轮对话相同。报告首字延迟（TTFT）、单轮耗时与渲染耗时的
+p50/p95/p99，以及整体吞吐量。在临时目录中运行，不会读写当前目录下的数据。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import tomli_w
+
+
+@dataclass
+class TurnSample:
+    ttft: float
+    latency: float
+    render: float
+    tokens: int
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def write_preset(presets_dir: Path, args: argparse.Namespace):
+    presets_dir.mkdir(parents=True, exist_ok=True)
+    preset = {
+        "name": "bench-mock",
+        "model": "mock",
+        "protocol": "mock",
+        "base_url": "",
+        "api_key": "",
+        "config": {"stream": not args.no_stream},
+        "extra": {
+            "mock_latency": args.latency,
+            "mock_token_rate": args.token_rate,
+            "mock_tokens": args.tokens,
+        },
+    }
+    (presets_dir / "bench-mock.toml").write_text(tomli_w.dumps(preset), "utf-8")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # constants 在导入时根据当前目录确定数据目录，需在切换目录之后导入
+    import amrita_core
+    from amrita_core.logging import logger_id
+
+    from amrita_agent.components.chat_area import markdown_to_flet_controls
+    from amrita_agent.config import init_dir
+    from amrita_agent.constants import PRESETS_DIR
+    from amrita_agent.utils.agent import AgentTurn, bootstrap, resolve_preset
+    from amrita_agent.utils.chat import DataManager
+    from amrita_agent.utils.mock_adapter import tokenize
+    from amrita_agent.utils.scheduler import TurnScheduler
+
+    amrita_core.logger.remove(logger_id)
+    amrita_core.logger.add(sys.stderr, level="WARNING")
+
+    init_dir()
+    write_preset(PRESETS_DIR, args)
+    await bootstrap()
+    preset = resolve_preset("bench-mock")
+    scheduler = TurnScheduler()
+    scheduler.set_max_concurrency(args.sessions)
+    samples: list[TurnSample] = []
+
+    async def session(index: int):
+        memory = DataManager().new_session(f"bench-{index}")
+        for turn in range(args.turns):
+            submitted = time.perf_counter()
+            first: float | None = None
+            async with scheduler.slot(memory.session_id, preset):
+                agent_turn = AgentTurn(memory, f"第 {turn} 轮问题", preset)
+                async for _ in agent_turn.stream():
+                    if first is None:
+                        first = time.perf_counter()
+            rendered = time.perf_counter()
+            markdown_to_flet_controls(agent_turn.response)
+            done = time.perf_counter()
+            samples.append(
+                TurnSample(
+                    ttft=(first or rendered) - submitted,
+                    latency=done - submitted,
+                    render=done - rendered,
+                    tokens=len(tokenize(agent_turn.response)),
+                )
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    return {
+        "sessions": args.sessions,
+        "turns": len(samples),
+        "elapsed_s": elapsed,
+        "ttft": summarize([s.ttft for s in samples]),
+        "latency": summarize([s.latency for s in samples]),
+        "render": summarize([s.render for s in samples]),
+        "turns_per_s": len(samples) / elapsed,
+        "tokens_per_s": sum(s.tokens for s in samples) / elapsed,
+    }
+
+
+def report(result: dict) -> str:
+    lines = [
+        f"{result['sessions']} 个会话共 {result['turns']} 轮，"
+        f"耗时 {result['elapsed_s']:.2f}s",
+        f"{'':<10}{'p50':>10}{'p95':>10}{'p99':>10}",
+    ]
+    for name in ("ttft", "latency", "render"):
+        stats = result[name]
+        lines.append(
+            f"{name:<10}"
+            + "".join(f"{stats[k]:>8.1f}ms" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        )
+    lines.append(
+        f"吞吐量：{result['turns_per_s']:.2f} 轮/s，{result['tokens_per_s']:.0f} 词元/s"
+    )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="bench_e2e")
+    parser.add_argument("-s", "--sessions", type=int, default=8, help="并发会话数")
+    parser.add_argument("-t", "--turns", type=int, default=5, help="每个会话的轮数")
+    parser.add_argument("--latency", type=float, default=0.2, help="首字延迟（秒）")
+    parser.add_argument("--token-rate", type=float, default=200, help="每秒词元数")
+    parser.add_argument("--tokens", type=int, default=200, help="每轮回复词元数")
+    parser.add_argument("--no-stream", action="store_true", help="关闭流式输出")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="amrita-bench-") as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+    print(json.dumps(result, indent=2) if args.json else report(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
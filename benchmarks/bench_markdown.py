@@ -0,0 +1,62 @@
+"""对比旧的 Markdown → HTML → HTMLParser 路径与单遍渲染器
+
+    python -m benchmarks.bench_markdown [--repeat N]
+
+先在语料与边界用例上校验两者生成的 ControlSpec 完全一致，再分别计时。
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections.abc import Callable
+
+from amrita_agent.components.chat_area import markdown_to_specs_legacy
+from amrita_agent.utils.markdown_spec import render_markdown
+
+from .corpus import EDGE_CASES, corpus
+
+
+def check_parity(samples: dict[str, str]) -> list[str]:
+    mismatched = []
+    for name, text in samples.items():
+        if markdown_to_specs_legacy(text) != render_markdown(text):
+            mismatched.append(name)
+    return mismatched
+
+
+def timeit(func: Callable[[str], object], text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = corpus()
+    samples.update({f"edge_{i}": text for i, text in enumerate(EDGE_CASES)})
+    mismatched = check_parity(samples)
+    if mismatched:
+        print(f"输出不一致: {', '.join(mismatched)}")
+        return 1
+    print(f"输出一致: {len(samples)} 个样本")
+
+    print(f"{'样本':<16}{'大小(KB)':>10}{'旧路径(ms)':>12}{'单遍(ms)':>12}{'加速':>8}")
+    for name, text in corpus().items():
+        legacy = timeit(markdown_to_specs_legacy, text, args.repeat)
+        single = timeit(render_markdown, text, args.repeat)
+        print(
+            f"{name:<16}{len(text.encode()) / 1024:>10.1f}"
+            f"{legacy * 1000:>12.2f}{single * 1000:>12.2f}{legacy / single:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Markdown 渲染基准与性能回归检查（无需 Flet 客户端）
+
+    python -m benchmarks.bench_render             # 与基线比较，回归时返回非零
+    python -m benchmarks.bench_render --update    # 以本次结果覆盖基线
+
+对语料中的每个样本分别测量 `markdown_to_flet_controls`、旧的
+`MarkdownHTMLParser` 路径与 `MessageBubble` 构造的耗时、控件数量与峰值内存。
+计时期间关闭追踪与后台代码高亮，同一样本的各目标逐轮交替测量。
+
+吞吐量（KB/s）与机器相关，只用于报告；回归检查比较各目标相对旧路径的
+加速比，加速比低于基线超过阈值时视为回归。基线应以默认的重复次数生成。
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import flet as ft
+
+from amrita_agent.components.chat_area import (
+    MessageBubble,
+    markdown_to_flet_controls,
+    markdown_to_flet_controls_legacy,
+)
+from amrita_agent.utils.highlight import CodeHighlighter
+from amrita_agent.utils.tracing import Tracer
+
+from .corpus import corpus
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 9
+REFERENCE_TARGET = "MarkdownHTMLParser"  # 加速比的参照
+
+TARGETS: dict[str, Callable[[str], Any]] = {
+    "markdown_to_flet_controls": markdown_to_flet_controls,
+    "MarkdownHTMLParser": markdown_to_flet_controls_legacy,
+    "MessageBubble": lambda text: MessageBubble(text, is_user=False),
+}
+
+
+def count_controls(value: Any) -> int:
+    """递归统计控件树中的控件数量"""
+    if isinstance(value, list):
+        return sum(count_controls(item) for item in value)
+    if not isinstance(value, ft.Control):
+        return 1
+    total = 1
+    for attr in ("content", "controls"):
+        child = getattr(value, attr, None)
+        if child is not None:
+            total += count_controls(child)
+    return total
+
+
+def time_once(func: Callable[[str], Any], text: str) -> float:
+    """单次调用耗时；与标准库 timeit 一样在计时期间关闭 GC"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        func(text)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def peak_memory(func: Callable[[str], Any], text: str) -> int:
+    tracemalloc.start()
+    try:
+        func(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@contextmanager
+def quiet() -> Iterator[None]:
+    """关闭追踪与代码高亮：前者记录 span，后者在工作线程中与计时争用 CPU"""
+    tracer, highlighter = Tracer(), CodeHighlighter()
+    saved = tracer.enabled, highlighter.enabled
+    tracer.enabled = highlighter.enabled = False
+    try:
+        yield
+    finally:
+        tracer.enabled, highlighter.enabled = saved
+
+
+def measure(repeat: int) -> dict[str, dict[str, dict[str, float]]]:
+    """每轮依次调用各目标一次，加速比取各轮比值的中位数
+
+    机器负载的波动通常持续数次调用，同一轮内的目标受到的影响相近。
+    """
+    results: dict[str, dict[str, dict[str, float]]] = {t: {} for t in TARGETS}
+    with quiet():
+        for name, text in corpus().items():
+            size_kb = len(text.encode("utf-8")) / 1024
+            rounds = [
+                {target: time_once(func, text) for target, func in TARGETS.items()}
+                for _ in range(repeat)
+            ]
+            for target, func in TARGETS.items():
+                seconds = statistics.median(r[target] for r in rounds)
+                results[target][name] = {
+                    "ms": seconds * 1000,
+                    "kb_per_s": size_kb / seconds,
+                    "speedup": statistics.median(
+                        r[REFERENCE_TARGET] / r[target] for r in rounds
+                    ),
+                    "controls": count_controls(func(text)),
+                    "peak_kb": peak_memory(func, text) / 1024,
+                }
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    threshold: float,
+) -> list[str]:
+    regressions = []
+    for target, samples in results.items():
+        if target == REFERENCE_TARGET:
+            continue
+        for name, metrics in samples.items():
+            base = baseline.get(target, {}).get(name)
+            if base is None or "speedup" not in base:
+                continue
+            floor = base["speedup"] * (1 - threshold)
+            if metrics["speedup"] < floor:
+                regressions.append(
+                    f"{target}/{name}: 加速比 {metrics['speedup']:.2f}x "
+                    f"< {floor:.2f}x (基线 {base['speedup']:.2f}x)"
+                )
+    return regressions
+
+
+def print_report(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+):
+    print(
+        f"{'目标':<28}{'样本':<16}{'耗时(ms)':>10}{'KB/s':>10}"
+        f"{'加速比':>8}{'基线':>8}{'控件数':>8}{'峰值内存(KB)':>14}"
+    )
+    for target, samples in results.items():
+        for name, m in samples.items():
+            base = baseline.get(target, {}).get(name, {}).get("speedup")
+            print(
+                f"{target:<28}{name:<16}{m['ms']:>10.2f}{m['kb_per_s']:>10.0f}"
+                f"{m['speedup']:>8.2f}{(f'{base:.2f}' if base else '-'):>8}"
+                f"{int(m['controls']):>8}{m['peak_kb']:>14.0f}"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update", action="store_true", help="覆盖基线")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+    baseline = (
+        json.loads(args.baseline.read_text("utf-8")) if args.baseline.exists() else {}
+    )
+    print_report(results, baseline)
+
+    if args.update or not baseline:
+        args.baseline.write_text(
+            json.dumps(results, indent=2, ensure_ascii=False) + "\n", "utf-8"
+        )
+        print(f"基线已写入 {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"相对 {REFERENCE_TARGET} 的加速比回归超过 {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("未发现性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
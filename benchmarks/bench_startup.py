@@ -0,0 +1,110 @@
+"""启动耗时基准：导入时间、首帧与可交互时间（无需 Flet 客户端）
+
+    python -m benchmarks.bench_startup [--repeat N] [--importtime]
+
+每轮在全新的解释器中运行，依次测量：
+- first_paint：导入加载页所需模块并构造 LoadingPage
+- modules：导入 amrita_core 与 AppView 相关模块
+- build：构造 AppView（首个可交互视图）
+- warm：预热构建其余视图
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from amrita_agent.pages.loading import LoadingPage
+from amrita_agent.utils.startup import StartupProfiler
+LoadingPage()
+first_paint = time.perf_counter()
+from amrita_agent.app_view import AppView
+modules = time.perf_counter()
+view = AppView(None)
+build = time.perf_counter()
+view.get_view("history")
+view.get_view("settings")
+warm = time.perf_counter()
+print(json.dumps({
+    "first_paint": first_paint - start,
+    "modules": modules - first_paint,
+    "build": build - modules,
+    "warm": warm - build,
+    "markdown_loaded": "markdown" in sys.modules,
+}))
+"""
+
+PHASES = ("first_paint", "modules", "build", "warm")
+
+
+def _run(args: list[str], cwd: str) -> subprocess.CompletedProcess[str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT), env.get("PYTHONPATH")])
+    )
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure(repeat: int, cwd: str) -> list[dict]:
+    return [json.loads(_run(["-c", _SNIPPET], cwd).stdout) for _ in range(repeat)]
+
+
+def top_imports(module: str, cwd: str, limit: int = 15) -> list[tuple[int, str]]:
+    """以 -X importtime 统计导入 module 时累计耗时最高的模块（微秒）"""
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"], cwd).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--importtime", action="store_true", help="列出导入耗时最高的模块"
+    )
+    args = parser.parse_args()
+
+    # 构造视图会读写 .amrita，放在临时目录中进行
+    with tempfile.TemporaryDirectory() as cwd:
+        runs = measure(args.repeat, cwd)
+        imports = top_imports("amrita_agent.app_view", cwd) if args.importtime else []
+
+    print(f"{'阶段':<16}{'中位数(ms)':>12}{'最小(ms)':>12}")
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<16}{statistics.median(values):>12.1f}{min(values):>12.1f}")
+    interactive = [sum(run[p] for p in PHASES[:3]) * 1000 for run in runs]
+    print(
+        f"{'interactive':<16}{statistics.median(interactive):>12.1f}{min(interactive):>12.1f}"
+    )
+    print(f"markdown 在启动时被导入: {any(run['markdown_loaded'] for run in runs)}")
+
+    if imports:
+        print("\n导入耗时最高的模块（累计 ms）:")
+        for cumulative, name in imports:
+            print(f"{cumulative / 1000:>10.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""基准测试使用的代表性 Agent 输出语料"""
+
+import random
+
+CODE_SNIPPET = '''def fibonacci(n: int) -> list[int]:
+    """Return the first n Fibonacci numbers."""
+    result = [0, 1]
+    while len(result) < n:
+        result.append(result[-1] + result[-2])  # next value
+    return result[:n]
+
+
+class Cache:
+    def __init__(self, size=128):
+        self.size = size
+        self._data: dict[str, bytes] = {}
+'''
+
+
+def long_code(blocks: int = 20) -> str:
+    parts = ["下面是完整的实现：", ""]
+    for index in range(blocks):
+        parts += [
+            f"### 第 {index + 1} 部分",
+            "",
+            f"这一部分处理 **步骤 {index}**，注意 `Cache` 的大小。",
+            "",
+            "```python",
+            CODE_SNIPPET.strip("\n"),
+            "```",
+            "",
+        ]
+    return "\n".join(parts)
+
+
+def nested_lists(groups: int = 30) -> str:
+    parts = []
+    for index in range(groups):
+        parts += [
+            f"## 分组 {index}",
+            "",
+            f"- 第 {index} 项，包含 *强调* 与 [链接](https://example.com/{index})",
+            "- 第二项",
+            "  延续的一行",
+            "    - 嵌套项 A",
+            "    - 嵌套项 B",
+            "        - 更深一层",
+            "- 第三项",
+            "",
+            "1. 有序一",
+            "2. 有序二",
+            "",
+        ]
+    return "\n".join(parts)
+
+
+def table(rows: int = 500, columns: int = 5) -> str:
+    rng = random.Random(rows * 31 + columns)
+    header = "| " + " | ".join(f"列{i}" for i in range(columns)) + " |"
+    separator = "|" + "|".join("---" for _ in range(columns)) + "|"
+    lines = ["查询结果如下：", "", header, separator]
+    for row in range(rows):
+        cells = [str(row)] + [
+            f"`v{rng.randint(0, 9999)}`" if i % 2 else f"**{rng.random():.4f}**"
+            for i in range(1, columns)
+        ]
+        lines.append("| " + " | ".join(cells) + " |")
+    lines += ["", f"共 {rows} 行。"]
+    return "\n".join(lines)
+
+
+def cjk_text(paragraphs: int = 60) -> str:
+    sentence = (
+        "人工智能代理在执行任务时需要在上下文窗口中保留关键信息，"
+        "同时通过工具调用获取外部数据，并将结果整理为结构化的回答。"
+    )
+    parts = []
+    for index in range(paragraphs):
+        parts += [
+            f"{sentence}第{index}段落包含**重点内容**和`内联代码`。",
+            "这一行由单个换行分隔，会被渲染为换行。",
+            "",
+        ]
+        if index % 10 == 0:
+            parts += [f"> 引用：{sentence}", "", "---", ""]
+    return "\n".join(parts)
+
+
+def large_response(size: int = 100 * 1024) -> str:
+    """拼接多种内容直到达到指定字节数（约 100KB）"""
+    pieces = [long_code(2), nested_lists(3), table(40), cjk_text(8)]
+    parts: list[str] = []
+    total = 0
+    index = 0
+    while total < size:
+        piece = pieces[index % len(pieces)]
+        parts.append(piece)
+        total += len(piece.encode("utf-8"))
+        index += 1
+    return "\n\n".join(parts)
+
+
+EDGE_CASES = [
+    "# Title\npara line1\nline2\n\n## Sub\n\n- a\n- b\n  cont\n    - nested\n- c",
+    "intro:\n- not a list without blank line\n\n```py\nx = '<a>' & 1\n```\nafter",
+    "```python\nunterminated fence\n    indented",
+    "#hashtag heading\n\nText with **bold**, *em*, _u_, __s__ and ***both***",
+    "5 * 3 * 2 = 30 and snake_case_name and __init__",
+    "Escape \\*not em\\* and \\_x\\_ and `a|b` and &amp; &copy; 5 < 6",
+    "<http://example.com> and <me@example.com> ![img](x.png) [link](http://x)",
+    "| code | desc |\n|:--|--:|\n| `a|b` | pipe in code |\n| x \\| y | escaped |\n| short |",
+    "a | b\n--|--\n1 | 2",
+    "> q1\n> more\n\n> q2",
+    "text\n\n    indented code\n    more\n\nSetext\n======",
+    "- loose\n\n- loose2\n\n    continued\n\n1. one\n- two",
+    "- item\n    1. nested ordered\n    2. two\n        - deep",
+    "***\n\n___\n\n---",
+    "<div>x</div>",
+    "intro\n<div>\n**raw** &amp; <b>kept</b>\n\n<p>inner</p>\n</div> tail\nnext",
+    "<details><summary>more</summary>body</details>\n\n<hr>after",
+    "a  \nb\nc   \nd and `code  \nspan` and **bold  \nbreak**",
+    "[ref][1]\n\n[1]: http://x",
+    "[Google][] and [g], ![img][g], [missing][nope]\ntext\n[G]: <http://g> \"T\"",
+    "",
+    "   ",
+]
+
+
+def corpus() -> dict[str, str]:
+    """基准语料：名称 -> Markdown 文本"""
+    return {
+        "long_code": long_code(),
+        "nested_lists": nested_lists(),
+        "table_500": table(500),
+        "cjk_text": cjk_text(),
+        "response_100kb": large_response(),
+    }
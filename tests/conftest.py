@@ -0,0 +1,58 @@
+"""测试共用的环境
+
+constants 在导入时根据当前目录确定数据目录，因此在收集测试（导入 amrita_agent）
+之前切换到临时目录，测试不会读写仓库中的数据。所有异步测试共用同一个事件循环，
+与 bootstrap 创建的单例保持在同一个循环上。
+"""
+
+import asyncio
+import os
+import tempfile
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any, TypeVar
+
+import pytest
+import tomli_w
+
+T = TypeVar("T")
+
+MOCK_PRESET = "test-mock"
+
+
+def pytest_sessionstart(session: pytest.Session):
+    os.chdir(tempfile.mkdtemp(prefix="amrita-test-"))
+
+
+@pytest.fixture(scope="session")
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def run(loop: asyncio.AbstractEventLoop) -> Callable[[Awaitable[T]], T]:
+    return loop.run_until_complete
+
+
+@pytest.fixture(scope="session")
+def agent(run: Callable[[Awaitable[Any]], Any]) -> str:
+    """初始化 Core 与会话，并写入不访问网络的模拟模型预设，返回预设名"""
+    from amrita_agent.config import init_dir
+    from amrita_agent.constants import PRESETS_DIR
+    from amrita_agent.utils.agent import bootstrap
+
+    init_dir()
+    preset = {
+        "name": MOCK_PRESET,
+        "model": "mock",
+        "protocol": "mock",
+        "base_url": "",
+        "api_key": "",
+        "config": {"stream": True},
+        "extra": {"mock_latency": 0, "mock_token_rate": 0},
+    }
+    (PRESETS_DIR / f"{MOCK_PRESET}.toml").write_text(tomli_w.dumps(preset), "utf-8")
+    run(bootstrap())
+    return MOCK_PRESET
@@ -0,0 +1,86 @@
+"""会话存储在并发重命名、保存与读取时保持一致"""
+
+import json
+import threading
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from amrita_core import PresetManager
+
+from amrita_agent.constants import MEMORY_SESSIONS_DIR
+from amrita_agent.utils.agent import AgentTurn
+from amrita_agent.utils.chat import DataManager
+
+Run = Callable[[Awaitable[Any]], Any]
+
+
+def _on_disk(session_id: str) -> dict[str, Any]:
+    return json.loads((MEMORY_SESSIONS_DIR / f"{session_id}.json").read_text("u8"))
+
+
+def test_rename_publishes_copy(agent: str):
+    dm = DataManager()
+    memory = dm.new_session("copy-a")
+    before = dm.snapshot()
+    dm.rename("copy-a", "copy-b")
+    assert memory.name == "copy-a"
+    assert before.sessionid2memory[memory.session_id].name == "copy-a"
+    assert dm.get_memory_by_session_id(memory.session_id).name == "copy-b"
+    assert _on_disk(memory.session_id)["name"] == "copy-b"
+
+
+def test_concurrent_rename_save_and_list(agent: str):
+    dm = DataManager()
+    sid = dm.new_session("race-0").session_id
+    errors: list[BaseException] = []
+
+    def worker(fn: Callable[[int], None]):
+        def target():
+            try:
+                for i in range(50):
+                    fn(i)
+            except BaseException as e:
+                errors.append(e)
+
+        return threading.Thread(target=target)
+
+    def rename(i: int):
+        dm.rename(dm.get_name(sid), f"race-{i + 1}")
+
+    def save(i: int):
+        dm.update(sid, abstract=f"abstract-{i}")
+        dm.save(sid)
+
+    def list_(i: int):
+        snapshot = dm.snapshot()
+        for memory in snapshot.memories():
+            assert snapshot.sessionid2name[memory.session_id] == memory.name
+            assert snapshot.name2sessionid[memory.name] == memory.session_id
+
+    threads = [worker(rename), worker(save), worker(save), worker(list_)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    latest = dm.get_memory_by_session_id(sid)
+    assert latest.name == "race-50"
+    assert latest.abstract == "abstract-49"
+    data = _on_disk(sid)
+    assert (data["name"], data["abstract"]) == ("race-50", "abstract-49")
+    assert list(MEMORY_SESSIONS_DIR.glob(f"{sid}.*.tmp")) == []
+
+
+def test_turn_keeps_rename(run: Run, agent: str):
+    dm = DataManager()
+    memory = dm.new_session("turn-a")
+    dm.rename("turn-a", "turn-b")
+    preset = PresetManager().get_preset(agent)
+    run(AgentTurn(memory, "你好", preset).run())
+    latest = dm.get_memory_by_session_id(memory.session_id)
+    assert latest.name == "turn-b"
+    assert latest.messages
+    data = _on_disk(memory.session_id)
+    assert data["name"] == "turn-b"
+    assert len(data["messages"]) == len(latest.messages)
@@ -0,0 +1,151 @@
+"""连接池在本地模拟的 OpenAI 兼容服务上复用连接"""
+
+import json
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from amrita_core.protocol import AdapterManager
+from amrita_core.types import ModelPreset, UniResponse
+
+from amrita_agent.utils.connection_pool import (
+    ConnectionPool,
+    PooledOpenAIAdapter,
+    endpoint_of,
+)
+
+Run = Callable[[Awaitable[Any]], Any]
+
+PREWARM_HEADERS = web.AppKey("prewarm_headers", list[dict[str, str]])
+
+
+def _chunk(content: str | None, usage: dict[str, int] | None = None) -> str:
+    choices = [] if content is None else [{"index": 0, "delta": {"content": content}}]
+    chunk = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "stub",
+        "choices": choices,
+        "usage": usage,
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def _models(request: web.Request) -> web.Response:
+    request.app[PREWARM_HEADERS].append(dict(request.headers))
+    return web.json_response({"object": "list", "data": []})
+
+
+async def _completions(request: web.Request) -> web.StreamResponse:
+    body = await request.json()
+    reply = f"echo:{body['messages'][-1]['content']}"
+    usage = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    if not body.get("stream"):
+        return web.json_response(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "stub",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": reply},
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for part in (reply[:5], reply[5:]):
+        await response.write(_chunk(part).encode())
+    await response.write(_chunk(None, usage).encode())
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+@pytest.fixture
+def server(run: Run, agent: str) -> Iterator[TestServer]:
+    async def start() -> TestServer:
+        app = web.Application()
+        app[PREWARM_HEADERS] = []
+        app.router.add_get("/v1/models", _models)
+        app.router.add_post("/v1/chat/completions", _completions)
+        server = TestServer(app, host="127.0.0.1")
+        await server.start_server()
+        return server
+
+    server = run(start())
+    yield server
+    run(ConnectionPool().aclose())
+    run(server.close())
+
+
+def _preset(server: TestServer, stream: bool, **extra: Any) -> ModelPreset:
+    return ModelPreset.model_validate(
+        {
+            "name": "stub",
+            "model": "stub",
+            "protocol": "openai",
+            "base_url": str(server.make_url("/v1")),
+            "api_key": "sk-stub",
+            "config": {"stream": stream},
+            "extra": extra,
+        }
+    )
+
+
+async def _reply(preset: ModelPreset, prompt: str) -> str:
+    adapter = PooledOpenAIAdapter(preset)
+    final = None
+    async for item in adapter.call_api([{"role": "user", "content": prompt}]):
+        if isinstance(item, UniResponse):
+            final = item
+    assert final is not None
+    return final.content
+
+
+def test_openai_protocol_is_pooled(agent: str):
+    assert issubclass(AdapterManager().get_adapter("openai"), PooledOpenAIAdapter)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_requests_reuse_connection(run: Run, server: TestServer, stream: bool):
+    preset = _preset(server, stream)
+
+    async def scenario():
+        for i in range(3):
+            assert await _reply(preset, f"m{i}") == f"echo:m{i}"
+
+    run(scenario())
+    stats = ConnectionPool().stats()[endpoint_of(preset.base_url)]
+    assert stats["requests"] == 3
+    assert stats["connections"] == 1
+    assert stats["reused"] == 2
+
+
+def test_prewarm_opens_reusable_connection(run: Run, server: TestServer):
+    preset = _preset(server, stream=False, prewarm=True)
+
+    async def scenario():
+        await ConnectionPool().prewarm(preset)
+        assert await _reply(preset, "after") == "echo:after"
+
+    run(scenario())
+    stats = ConnectionPool().stats()[endpoint_of(preset.base_url)]
+    assert stats["prewarms"] == 1
+    assert stats["connections"] == 1
+    assert stats["reused"] == 1
+    # 预热请求不携带 API Key
+    assert [h.get("Authorization") for h in server.app[PREWARM_HEADERS]] == [None]
+
+
+def test_prewarm_is_opt_in(run: Run, server: TestServer):
+    run(ConnectionPool().prewarm(_preset(server, stream=False)))
+    assert server.app[PREWARM_HEADERS] == []
@@ -0,0 +1,120 @@
+"""调度器的会话内顺序、预设并发上限与优先级"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+import pytest
+from amrita_core import ModelPreset
+
+from amrita_agent.utils.scheduler import (
+    SCHEDULER_MAX_CONCURRENCY,
+    Priority,
+    TurnScheduler,
+)
+
+Run = Callable[[Awaitable[Any]], Any]
+
+
+@pytest.fixture
+def scheduler() -> Iterator[TurnScheduler]:
+    scheduler = TurnScheduler()
+    yield scheduler
+    scheduler.set_foreground(None)
+    scheduler.set_max_concurrency(SCHEDULER_MAX_CONCURRENCY)
+    assert scheduler.queue_depth == 0
+
+
+def _preset(name: str, **extra: Any) -> ModelPreset:
+    return ModelPreset.model_validate(
+        {"name": name, "model": "mock", "protocol": "mock", "extra": extra}
+    )
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_session_turns_run_in_order(run: Run, scheduler: TurnScheduler):
+    scheduler.set_max_concurrency(4)
+    preset = _preset("order")
+    started: list[int] = []
+    running = 0
+    peak = 0
+
+    async def turn(index: int):
+        nonlocal running, peak
+        async with scheduler.slot("order-session", preset):
+            started.append(index)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(turn(i) for i in range(5)))
+
+    run(scenario())
+    assert started == list(range(5))
+    assert peak == 1
+
+
+def test_preset_concurrency_limit(run: Run, scheduler: TurnScheduler):
+    scheduler.set_max_concurrency(8)
+    limited = _preset("limited", max_concurrency=2)
+    free = _preset("free")
+    running: dict[str, int] = {"limited": 0, "free": 0}
+    peak: dict[str, int] = {"limited": 0, "free": 0}
+
+    async def turn(session_id: str, preset: ModelPreset):
+        async with scheduler.slot(session_id, preset):
+            running[preset.name] += 1
+            peak[preset.name] = max(peak[preset.name], running[preset.name])
+            await asyncio.sleep(0.02)
+            running[preset.name] -= 1
+
+    async def scenario():
+        await asyncio.gather(
+            *(turn(f"limited-{i}", limited) for i in range(6)),
+            *(turn(f"free-{i}", free) for i in range(3)),
+        )
+
+    run(scenario())
+    assert peak == {"limited": 2, "free": 3}
+
+
+def test_priority_and_foreground(run: Run, scheduler: TurnScheduler):
+    scheduler.set_max_concurrency(1)
+    preset = _preset("priority")
+    order: list[str] = []
+
+    async def turn(session_id: str, priority: Priority):
+        async with scheduler.slot(session_id, preset, priority):
+            order.append(session_id)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("blocker", preset):
+                await release.wait()
+
+        tasks = [asyncio.create_task(blocker())]
+        await _settle()
+        for session_id, priority in [
+            ("background", Priority.BACKGROUND),
+            ("normal", Priority.NORMAL),
+            ("promoted", Priority.NORMAL),
+            ("foreground", Priority.FOREGROUND),
+        ]:
+            tasks.append(asyncio.create_task(turn(session_id, priority)))
+            await _settle()
+        assert scheduler.queue_depth == 4
+        # 排队中的轮次在其会话成为前台会话后立即提升
+        scheduler.set_foreground("promoted")
+        release.set()
+        await asyncio.gather(*tasks)
+
+    run(scenario())
+    assert order == ["promoted", "foreground", "normal", "background"]
@@ -0,0 +1,208 @@
+"""在 localhost 上通过 aiohttp 测试客户端调用 API 服务，模型为模拟模型"""
+
+import asyncio
+import json
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from amrita_agent.server import ApiServer
+from amrita_agent.utils.agent import AgentTurn
+
+Run = Callable[[Awaitable[Any]], Any]
+
+
+@pytest.fixture
+def client(run: Run, agent: str) -> Iterator[TestClient]:
+    async def start() -> TestClient:
+        # aiohttp 的应用与测试服务需要在运行中的事件循环里创建
+        client = TestClient(TestServer(ApiServer(workers=2, max_pending=8).app))
+        await client.start_server()
+        return client
+
+    client = run(start())
+    yield client
+    run(client.close())
+
+
+def _sse_events(body: str) -> list[tuple[str, dict[str, Any]]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_sessions_crud(run: Run, client: TestClient):
+    async def scenario():
+        response = await client.post("/sessions", json={"name": "crud"})
+        assert response.status == 201
+        sid = (await response.json())["session_id"]
+
+        response = await client.post("/sessions", json={"name": "crud"})
+        assert response.status == 409
+
+        sessions = await (await client.get("/sessions")).json()
+        assert sid in {s["session_id"] for s in sessions}
+
+        response = await client.patch(f"/sessions/{sid}", json={"name": "renamed"})
+        assert response.status == 200
+        assert (await response.json())["name"] == "renamed"
+
+        detail = await (await client.get(f"/sessions/{sid}")).json()
+        assert detail["name"] == "renamed"
+        assert detail["messages"] == []
+
+        assert (await client.delete(f"/sessions/{sid}")).status == 204
+        assert (await client.get(f"/sessions/{sid}")).status == 404
+
+    run(scenario())
+
+
+def test_rename_conflict(run: Run, client: TestClient):
+    async def scenario():
+        first = await (await client.post("/sessions", json={"name": "a"})).json()
+        await client.post("/sessions", json={"name": "b"})
+        response = await client.patch(
+            f"/sessions/{first['session_id']}", json={"name": "b"}
+        )
+        assert response.status == 409
+        detail = await (await client.get(f"/sessions/{first['session_id']}")).json()
+        assert detail["name"] == "a"
+
+    run(scenario())
+
+
+def test_rename_races(run: Run, client: TestClient):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        url = f"/sessions/{session['session_id']}"
+        responses = await asyncio.gather(
+            *(client.patch(url, json={"name": f"race-{i}"}) for i in range(8)),
+            client.delete(url),
+        )
+        assert {r.status for r in responses} <= {200, 204, 404}
+        assert (await client.patch(url, json={"name": "gone"})).status == 404
+        assert (await client.delete(url)).status == 404
+
+    run(scenario())
+
+
+def test_chat_json(run: Run, client: TestClient, agent: str):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        response = await client.post(
+            f"/sessions/{session['session_id']}/chat",
+            json={"prompt": "你好，服务", "preset": agent},
+        )
+        assert response.status == 200
+        assert "你好，服务" in (await response.json())["response"]
+
+        detail = await (await client.get(f"/sessions/{session['session_id']}")).json()
+        assert [m["role"] for m in detail["messages"]][-2:] == ["user", "assistant"]
+
+    run(scenario())
+
+
+def test_chat_sse(run: Run, client: TestClient, agent: str):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        response = await client.post(
+            f"/sessions/{session['session_id']}/chat",
+            json={"prompt": "流式输出", "preset": agent},
+            headers={"Accept": "text/event-stream"},
+        )
+        assert response.status == 200
+        assert response.headers["Content-Type"] == "text/event-stream"
+        events = _sse_events(await response.text())
+        assert {name for name, _ in events[:-1]} == {"chunk"}
+        name, done = events[-1]
+        assert name == "done"
+        assert "流式输出" in done["response"]
+
+    run(scenario())
+
+
+def test_chat_sse_reports_turn_errors(
+    run: Run, client: TestClient, agent: str, monkeypatch: pytest.MonkeyPatch
+):
+    async def failing(self: AgentTurn):
+        yield "部分"
+        raise ConnectionResetError("upstream reset")
+
+    # 对话本身抛出的 ConnectionResetError 不是客户端断开
+    monkeypatch.setattr(AgentTurn, "stream", failing)
+
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        response = await client.post(
+            f"/sessions/{session['session_id']}/chat",
+            json={"prompt": "x", "preset": agent},
+            headers={"Accept": "text/event-stream"},
+        )
+        events = _sse_events(await response.text())
+        assert events[0] == ("chunk", {"text": "部分"})
+        assert events[-1] == (
+            "error",
+            {"error": "ConnectionResetError: upstream reset"},
+        )
+
+    run(scenario())
+
+
+def test_chat_websocket(run: Run, client: TestClient, agent: str):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        async with client.ws_connect(f"/sessions/{session['session_id']}/ws") as ws:
+            await ws.send_json({"prompt": "websocket", "preset": agent})
+            while (message := await ws.receive_json())["type"] == "chunk":
+                pass
+            assert message["type"] == "done"
+            assert "websocket" in message["response"]
+
+            await ws.send_json({"preset": agent})
+            error = await ws.receive_json()
+            assert error["type"] == "error"
+            assert error["status"] == 400
+
+    run(scenario())
+
+
+def test_chat_bad_requests(run: Run, client: TestClient, agent: str):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        url = f"/sessions/{session['session_id']}/chat"
+        assert (await client.post(url, json={"preset": agent})).status == 400
+        response = await client.post(url, json={"prompt": "x", "preset": "missing"})
+        assert response.status == 400
+        response = await client.post(
+            url, json={"prompt": "x", "preset": agent, "images": ["not base64!"]}
+        )
+        assert response.status == 400
+        response = await client.post("/sessions/missing/chat", json={"prompt": "x"})
+        assert response.status == 404
+
+    run(scenario())
+
+
+def test_metrics(run: Run, client: TestClient, agent: str):
+    async def scenario():
+        session = await (await client.post("/sessions")).json()
+        await client.post(
+            f"/sessions/{session['session_id']}/chat",
+            json={"prompt": "指标", "preset": agent},
+        )
+        metrics = await (await client.get("/metrics")).json()
+        chat = metrics["requests"]["POST /sessions/{sid}/chat"]
+        assert chat["count"] == 1
+        assert chat["errors"] == 0
+        assert {"turns", "response_cache", "connections", "mcp"} <= metrics.keys()
+
+        response = await client.get("/metrics/prometheus")
+        assert response.status == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "amrita_llm_turns_total" in await response.text()
+
+    run(scenario())
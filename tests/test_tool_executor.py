@@ -0,0 +1,160 @@
+"""同一步中的工具调用并行执行，结果按调用顺序交给内核"""
+
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+from amrita_core.tools.manager import ToolsManager, simple_tool
+from amrita_core.types import Function, ToolCall
+
+from amrita_agent.config import get_config
+from amrita_agent.utils.tool_executor import (
+    ToolExecutor,
+    ToolScope,
+    _call_key,
+    install_tool_executor,
+)
+
+Run = Callable[[Awaitable[Any]], Any]
+
+_cancelled: list[str] = []
+
+
+@simple_tool
+async def exec_sleep(label: str, delay: float) -> str:
+    """Sleep, then return the label.
+
+    Args:
+        label (str): Text to return.
+        delay (float): Seconds to sleep.
+
+    Returns:
+        str: The label.
+    """
+    await asyncio.sleep(delay)
+    return label
+
+
+@simple_tool
+def exec_blocking(label: str) -> str:
+    """Return the label with the name of the calling thread.
+
+    Args:
+        label (str): Text to return.
+
+    Returns:
+        str: The label and thread name.
+    """
+    return f"{label}@{threading.current_thread().name}"
+
+
+@simple_tool
+async def exec_hang(label: str) -> str:
+    """Wait until cancelled.
+
+    Args:
+        label (str): Recorded when cancelled.
+
+    Returns:
+        str: The label.
+    """
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        _cancelled.append(label)
+        raise
+    return label
+
+
+def _call(index: int, name: str, **args: Any) -> ToolCall:
+    return ToolCall(
+        id=f"call-{index}", function=Function(name=name, arguments=json.dumps(args))
+    )
+
+
+async def _invoke(call: ToolCall) -> str:
+    """按内核的方式取出工具函数并调用"""
+    tool = ToolsManager().get_tool(call.function.name)
+    assert tool is not None
+    return await tool.func(json.loads(call.function.arguments))  # type: ignore[arg-type]
+
+
+@pytest.fixture(autouse=True)
+def executor(agent: str) -> ToolExecutor:
+    install_tool_executor()
+    return ToolExecutor()
+
+
+def test_results_follow_call_order(run: Run, executor: ToolExecutor):
+    calls = [
+        _call(0, "exec_sleep", label="a", delay=0.2),
+        _call(1, "exec_sleep", label="b", delay=0.2),
+        _call(2, "exec_sleep", label="c", delay=0),
+        _call(3, "exec_blocking", label="d"),
+    ]
+
+    async def scenario() -> tuple[list[str], float]:
+        scope = ToolScope("exec-order")
+        with scope.activate():
+            start = time.perf_counter()
+            await executor.prefetch(calls)
+            results = [await _invoke(call) for call in calls]
+            elapsed = time.perf_counter() - start
+        scope.close()
+        return results, elapsed
+
+    results, elapsed = run(scenario())
+    assert results[:3] == ["a", "b", "c"]
+    assert results[3].startswith("d@amrita-tool")
+    assert elapsed < 0.35
+
+
+def test_serial_when_disabled(
+    run: Run, executor: ToolExecutor, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(get_config(), "agent_parallel_tool_calls", False)
+    call = _call(0, "exec_blocking", label="x")
+
+    async def scenario() -> str:
+        scope = ToolScope("exec-serial")
+        with scope.activate():
+            await executor.prefetch([call])
+            assert scope.take(_call_key("exec_blocking", {"label": "x"})) is None
+            return await _invoke(call)
+
+    # 未预取时由内核在事件循环中直接调用原函数
+    assert run(scenario()) == f"x@{threading.current_thread().name}"
+
+
+def test_timeout(run: Run, executor: ToolExecutor):
+    executor.set_timeout("exec_sleep", 0.05)
+    call = _call(0, "exec_sleep", label="late", delay=1)
+
+    async def scenario():
+        scope = ToolScope("exec-timeout")
+        with scope.activate():
+            await executor.prefetch([call])
+            with pytest.raises(TimeoutError):
+                await _invoke(call)
+
+    try:
+        run(scenario())
+    finally:
+        executor.set_timeout("exec_sleep", None)
+
+
+def test_close_cancels_unclaimed_calls(run: Run, executor: ToolExecutor):
+    async def scenario():
+        scope = ToolScope("exec-close")
+        with scope.activate():
+            await executor.prefetch([_call(0, "exec_hang", label="orphan")])
+        await asyncio.sleep(0.01)
+        scope.close()
+        await asyncio.sleep(0.01)
+
+    run(scenario())
+    assert _cancelled == ["orphan"]
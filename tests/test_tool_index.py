@@ -0,0 +1,92 @@
+"""RAG 模式的工具挑选：只对已注册的工具排序，注册表不变时不重建索引"""
+
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from amrita_core.tools.manager import ToolsManager
+from amrita_core.tools.models import (
+    FunctionDefinitionSchema,
+    FunctionParametersSchema,
+    ToolData,
+    ToolFunctionSchema,
+)
+
+from amrita_agent.utils.tool_index import ToolIndex
+
+TOPICS = [
+    ("weather", "Get the weather forecast for a city"),
+    ("stock", "Look up the latest stock price of a company"),
+    ("translate", "Translate text into another language"),
+    ("calendar", "Create an event in the user's calendar"),
+    ("email", "Send an email message to a recipient"),
+    ("timer", "Start a countdown timer"),
+    ("wiki", "Search encyclopedia articles"),
+    ("math", "Evaluate an arithmetic expression"),
+    ("music", "Play a song by an artist"),
+    ("map", "Find directions between two places"),
+]
+
+BUILTIN = {
+    "type": "function",
+    "function": {
+        "name": "builtin_stop",
+        "description": "Stop the agent and report the result",
+        "parameters": {"type": "object", "properties": {}},
+    },
+}
+
+
+def _tool(name: str, description: str) -> ToolData:
+    async def run(args: dict[str, Any]) -> str:
+        return name
+
+    return ToolData(
+        func=run,
+        data=ToolFunctionSchema(
+            function=FunctionDefinitionSchema(
+                name=name,
+                description=description,
+                parameters=FunctionParametersSchema(type="object", properties={}),
+            )
+        ),
+    )
+
+
+@pytest.fixture
+def registered(agent: str) -> Iterator[list[str]]:
+    manager = ToolsManager()
+    names = [f"index_{topic}" for topic, _ in TOPICS]
+    for name, (_, description) in zip(names, TOPICS):
+        manager.register_tool(_tool(name, description))
+    yield names
+    for name in [*names, "index_extra"]:
+        manager.remove_tool(name)
+
+
+def _request(names: list[str]) -> list[dict[str, Any]]:
+    manager = ToolsManager()
+    return [BUILTIN, *(manager.tools_meta_dict()[name] for name in names)]
+
+
+def test_select_ranks_only_indexed_tools(registered: list[str]):
+    tools = _request(registered)
+    selected = ToolIndex().select(tools, "what is the weather forecast", k=3)
+    names = [tool["function"]["name"] for tool in selected]
+    assert names[0] == "builtin_stop"
+    assert "index_weather" in names
+    assert 1 < len(names) <= 4
+    assert names == [t["function"]["name"] for t in tools if t in selected]
+
+
+def test_sync_only_when_registry_changes(registered: list[str]):
+    index = ToolIndex()
+    index.refresh()
+    # 请求中只带部分工具时不改动索引
+    index.select(_request(registered[:5]), "stock price", k=2)
+    assert index.refresh() == 0
+    assert set(registered) <= {name for name, _ in index.search("x", k=100)}
+
+    ToolsManager().register_tool(_tool("index_extra", "Order a pizza delivery"))
+    assert index.refresh() == 1
+    assert index.refresh() == 0